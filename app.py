@@ -1,38 +1,66 @@
+import time
+
+# Script runs are timed from here to check the login page against its startup budget
+SCRIPT_START = time.perf_counter()
+
 import streamlit as st
-import pandas as pd
+import importlib
+import importlib.util
+import logging
 import os
 from pathlib import Path
-import time
 from datetime import datetime
 import json
-import plotly.graph_objects as go
-import plotly.express as px
-from plotly.subplots import make_subplots
-
-# Check for required dependencies
-try:
-    import openpyxl
-    OPENPYXL_AVAILABLE = True
-except ImportError:
-    OPENPYXL_AVAILABLE = False
-
-try:
-    import xlrd
-    XLRD_AVAILABLE = True
-except ImportError:
-    XLRD_AVAILABLE = False
-
-try:
-    import PyPDF2
-    PYPDF2_AVAILABLE = True
-except ImportError:
-    PYPDF2_AVAILABLE = False
-
-try:
-    from pdf2image import convert_from_path
-    PDF2IMAGE_AVAILABLE = True
-except ImportError:
-    PDF2IMAGE_AVAILABLE = False
+import re
+import threading
+from functools import partial
+
+from telemetry import METRICS_PORT, SPAN_LOG_PATH, recorder, span, start_metrics_server
+
+# Check for required dependencies without importing them
+OPENPYXL_AVAILABLE = importlib.util.find_spec('openpyxl') is not None
+XLRD_AVAILABLE = importlib.util.find_spec('xlrd') is not None
+PYPDF2_AVAILABLE = importlib.util.find_spec('PyPDF2') is not None
+PDF2IMAGE_AVAILABLE = importlib.util.find_spec('pdf2image') is not None
+
+# Modules only pages past the login need; together they cost most of a cold
+# start, so they are imported once a user is signed in and warmed on a
+# background thread while the login page is shown
+DEFERRED_MODULES = [
+    'pandas', 'plotly.graph_objects', 'chart_export', 'data_export', 'data_loader',
+    'downsample', 'library_catalog', 'pdf_library', 'pdf_tables', 'profiler',
+]
+
+# A script run that renders the login page should finish within this budget
+STARTUP_BUDGET_MS = float(os.environ.get('RESEARCH_PORTAL_STARTUP_BUDGET_MS', 250))
+
+logger = logging.getLogger('research_portal')
+
+# Signed-in users who see the stage timings panel, comma separated
+ADMIN_EMAILS = frozenset(
+    email.strip().lower() for email in os.environ.get('RESEARCH_PORTAL_ADMINS', '').split(',') if email.strip()
+)
+
+# Tables longer than this are paginated by default, sending one page of rows at a time
+PAGINATE_ROWS = int(os.environ.get('RESEARCH_PORTAL_PAGINATE_ROWS', 5000))
+PAGE_SIZES = [50, 100, 250, 500, 1000]
+
+# Charts plotting more points than this use WebGL (Scattergl) line and scatter traces
+WEBGL_POINTS = int(os.environ.get('RESEARCH_PORTAL_WEBGL_POINTS', 5000))
+
+# Long traces are downsampled to about two points per horizontal pixel of the chart
+CHART_WIDTH_PX = int(os.environ.get('RESEARCH_PORTAL_CHART_WIDTH_PX', 1200))
+CHART_POINT_BUDGET = 2 * CHART_WIDTH_PX
+
+# Built chart figures kept for reuse, least recently viewed evicted first
+FIGURE_CACHE_SIZE = int(os.environ.get('RESEARCH_PORTAL_FIGURE_CACHE_SIZE', 32))
+
+# Extracted PDF text is shown this many pages at a time
+PDF_TEXT_PAGES_PER_VIEW = 10
+
+# Page image resolutions offered by the PDF viewer, and neighbours rendered ahead
+PAGE_IMAGE_DPIS = [72, 100, 150, 200]
+PAGE_IMAGE_PREFETCH = [1, -1, 2]
 
 # Page configuration
 st.set_page_config(
@@ -298,6 +326,8 @@ if 'file_type' not in st.session_state:
     st.session_state.file_type = None
 if 'pdf_page' not in st.session_state:
     st.session_state.pdf_page = 1
+if 'session_charts' not in st.session_state:
+    st.session_state.session_charts = {}
 
 def authenticate(email):
     """Authenticate user with @in.ey.com email"""
@@ -305,25 +335,39 @@ def authenticate(email):
         return False
     return email.strip().lower().endswith('@in.ey.com')
 
+def is_admin(email):
+    """Whether a signed-in user is listed in RESEARCH_PORTAL_ADMINS"""
+    return bool(email) and email.strip().lower() in ADMIN_EMAILS
+
+def stage_span(stage, sheet=None):
+    """Time a stage of this rerun, tagged with the selected file and a sheet"""
+    return span(stage, file=st.session_state.selected_file, sheet=sheet)
+
+def toggle_profiling():
+    """Arm or disarm profiling of this session's next rerun"""
+    st.session_state.profile_armed = not st.session_state.get('profile_armed', False)
+
+@st.cache_resource(show_spinner=False)
+def get_metrics_server():
+    """Serve stage timings at /metrics on RESEARCH_PORTAL_METRICS_PORT, once per process"""
+    try:
+        return start_metrics_server(METRICS_PORT)
+    except OSError as e:
+        logger.warning("Could not serve metrics on port %s: %s", METRICS_PORT, e)
+        return None
+
+@st.cache_resource(show_spinner=False)
+def get_catalog():
+    """Start the library catalog and its file watcher once per process"""
+    catalog = LibraryCatalog('.')
+    catalog.start()
+    return catalog
+
 def get_files():
-    """Get all Excel and PDF files in the current directory"""
+    """Get all Excel and PDF files in the library, including subfolders, from the catalog"""
     files = []
     try:
-        # Check for Excel files
-        if OPENPYXL_AVAILABLE:
-            for file in Path('.').glob('*.xlsx'):
-                if not file.name.startswith('~') and not file.name.startswith('.'):
-                    files.append(file.name)
-        
-        if XLRD_AVAILABLE:
-            for file in Path('.').glob('*.xls'):
-                if not file.name.startswith('~') and not file.name.startswith('.'):
-                    files.append(file.name)
-        
-        # Check for PDF files
-        for file in Path('.').glob('*.pdf'):
-            if not file.name.startswith('~') and not file.name.startswith('.'):
-                files.append(file.name)
+        files = get_catalog().files()
         
         if not OPENPYXL_AVAILABLE and not XLRD_AVAILABLE:
             st.error("⚠️ No Excel libraries found. Please install 'openpyxl' for .xlsx files or 'xlrd' for .xls files.")
@@ -333,10 +377,27 @@ def get_files():
         st.error(f"Error scanning for files: {str(e)}")
     return sorted(files)
 
+def refresh_pdf_search():
+    """Bring the PDF search index up to date in the background with the catalog's PDFs.
+
+    Runs once per catalog version; returns the future of that update.
+    """
+    catalog = get_catalog()
+    version = catalog.version
+    pdfs = []
+    for name in catalog.files():
+        entry = catalog.entry(name)
+        if entry is not None and name.lower().endswith('.pdf'):
+            pdfs.append((str(catalog.root / name), entry['size'], entry['mtime']))
+    return refresh_search_index(catalog.root, pdfs, version)
+
 def load_excel_file(filename):
-    """Load Excel file with all sheets"""
+    """Open Excel file, reading sheet metadata now and sheet bodies on first use"""
     file_ext = Path(filename).suffix.lower()
     
+    if file_ext == '.pdf':
+        return load_pdf_tables(filename)
+    
     if file_ext == '.xlsx' and not OPENPYXL_AVAILABLE:
         st.error("⚠️ Missing dependency: 'openpyxl' is required to read .xlsx files.")
         st.info("📦 Install it using: `pip install openpyxl`")
@@ -348,42 +409,103 @@ def load_excel_file(filename):
         return None
     
     try:
-        engine = 'openpyxl' if file_ext == '.xlsx' else 'xlrd'
-        excel_file = pd.ExcelFile(filename, engine=engine)
-        data = {}
-        
-        for sheet_name in excel_file.sheet_names:
-            try:
-                df = pd.read_excel(filename, sheet_name=sheet_name, engine=engine)
-                if df.empty:
-                    st.warning(f"Sheet '{sheet_name}' is empty")
-                    continue
-                data[sheet_name] = df
-            except Exception as e:
-                st.warning(f"Could not load sheet '{sheet_name}': {str(e)}")
-                continue
+        # Usually already opened while the file was selected; otherwise sheets come
+        # from the memory-mapped Arrow sidecar when the file is unchanged
+        workbook = get_prefetcher().take(filename) or Workbook(filename)
+        for message in workbook.skipped:
+            st.warning(message)
         
-        if not data:
+        if not workbook.sheets:
             st.error("No valid sheets found in the Excel file")
             return None
-        return data
+        return workbook
+    except Exception as e:
+        st.error(f"⚠️ Error loading file: {str(e)}")
+        return None
+
+def load_pdf_tables(filename):
+    """Open the tables found in a PDF as sheets, waiting for the background scan if needed"""
+    if not TABLE_EXTRACTION_AVAILABLE:
+        st.error("⚠️ Missing dependency: 'pyarrow' and 'pdfplumber' or 'PyPDF2' are required to explore PDF tables.")
+        st.info("📦 Install them using: `pip install pyarrow pdfplumber`")
+        return None
+    
+    try:
+        tables = PdfTables(filename)
+        for message in tables.skipped:
+            st.warning(message)
+        
+        if not tables.sheets:
+            st.error("No tables found in the PDF")
+            return None
+        return tables
     except Exception as e:
+        st.error(f"⚠️ Error extracting tables: {str(e)}")
+        return None
+
+@st.cache_resource
+def get_prefetcher():
+    """Process-wide prefetcher that opens the workbook a session has selected"""
+    return WorkbookPrefetcher()
+
+def prefetch_owner():
+    """This session's prefetch owner; its prefetch is withdrawn when the session is dropped"""
+    if 'prefetch_owner' not in st.session_state:
+        st.session_state.prefetch_owner = PrefetchOwner()
+    return st.session_state.prefetch_owner
+
+class WorkbookLoadError(Exception):
+    """Raised inside the shared cache so failed loads are not cached"""
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def _load_excel_file_shared(path, size, mtime):
+    """Open a workbook once per (path, size, mtime) for every session in the process.
+
+    Streamlit holds a per-key lock while computing, so concurrent sessions
+    requesting the same file wait on the single in-flight load. A changed
+    size or mtime produces a new key, and the stale entry ages out through
+    ``max_entries``.
+    """
+    result = load_excel_file(path)
+    if result is None:
+        raise WorkbookLoadError(path)
+    get_prefetcher().opened(result)
+    return result
+
+def get_excel_data(filename):
+    """Load Excel file through the process-wide cache shared across sessions.
+
+    Returns the Workbook or None. Its DataFrames are shared, so callers
+    must copy before mutating.
+    """
+    try:
+        path, size, mtime = file_signature(filename)
+    except OSError as e:
         st.error(f"⚠️ Error loading file: {str(e)}")
         return None
+    try:
+        with span('workbook_load', file=filename):
+            return _load_excel_file_shared(path, size, mtime)
+    except WorkbookLoadError:
+        return None
+    finally:
+        # A cache hit never takes the session's prefetch, so drop it here
+        get_prefetcher().release(prefetch_owner())
 
 def calculate_insights(data):
     """Calculate data insights for visualization"""
     insights = {}
     for sheet_name, df in data.items():
         try:
-            insights[sheet_name] = {
-                'total_rows': len(df),
-                'total_columns': len(df.columns),
-                'numeric_columns': len(df.select_dtypes(include=['number']).columns),
-                'text_columns': len(df.select_dtypes(include=['object']).columns),
-                'missing_values': int(df.isnull().sum().sum()),
-                'memory_usage': df.memory_usage(deep=True).sum() / 1024 / 1024
-            }
+            with stage_span('insights', sheet_name):
+                insights[sheet_name] = {
+                    'total_rows': len(df),
+                    'total_columns': len(df.columns),
+                    'numeric_columns': len(df.select_dtypes(include=['number']).columns),
+                    'text_columns': len(df.select_dtypes(include=['object']).columns),
+                    'missing_values': int(df.isnull().sum().sum()),
+                    'memory_usage': df.memory_usage(deep=True).sum() / 1024 / 1024
+                }
         except Exception as e:
             st.warning(f"Could not calculate insights for '{sheet_name}': {str(e)}")
             insights[sheet_name] = {
@@ -396,6 +518,34 @@ def calculate_insights(data):
             }
     return insights
 
+def calculate_sheet_metadata_insights(workbook):
+    """Describe sheets that have not been parsed yet from their metadata"""
+    insights = {}
+    for sheet_name, sheet in workbook.sheets.items():
+        insights[sheet_name] = {
+            'total_rows': sheet['rows'] or 0,
+            'total_columns': len(sheet['columns']),
+            'numeric_columns': 0,
+            'text_columns': 0,
+            'missing_values': 0,
+            'memory_usage': 0,
+            'loaded': False,
+            'rows_estimated': sheet['rows_estimated']
+        }
+    return insights
+
+def get_sheet(sheet_name):
+    """Return a sheet of the selected workbook, parsing it the first time it is used"""
+    workbook = st.session_state.excel_data
+    if workbook.is_loaded(sheet_name):
+        df = workbook.sheet(sheet_name)
+    else:
+        with st.spinner(f"🔄 Loading sheet '{sheet_name}'..."), stage_span('sheet_load', sheet_name):
+            df = workbook.sheet(sheet_name)
+    if st.session_state.data_insights.get(sheet_name, {}).get('loaded') is False:
+        st.session_state.data_insights.update(calculate_insights({sheet_name: df}))
+    return df
+
 def create_overview_summary(insights):
     """Create an overview summary of all sheets"""
     if not insights:
@@ -407,19 +557,98 @@ def create_overview_summary(insights):
     
     summary_parts = []
     for i, sheet in enumerate(sheet_names):
-        summary_parts.append(f"**{sheet}**: {rows[i]:,} rows × {cols[i]} columns")
+        approx = "≤" if insights[sheet].get('rows_estimated') else ""
+        summary_parts.append(f"**{sheet}**: {approx}{rows[i]:,} rows × {cols[i]} columns")
     
     return " | ".join(summary_parts)
 
-def apply_filter(df, column, filter_values):
-    """Apply filter to dataframe"""
-    if not filter_values or len(filter_values) == 0:
-        return df
-    try:
-        return df[df[column].isin(filter_values)]
-    except Exception as e:
-        st.warning(f"Could not apply filter on column '{column}': {str(e)}")
-        return df
+def filter_sheet(sheet_name, filters):
+    """Apply column filters to a sheet through its value index.
+
+    Returns the matching rows and their positions (None when unfiltered).
+    """
+    df = get_sheet(sheet_name)
+    sheet_index = st.session_state.excel_data.index(sheet_name)
+    valid_filters = {}
+    for column, filter_values in filters.items():
+        if column in df.columns:
+            valid_filters[column] = filter_values
+        elif filter_values:
+            st.warning(f"Could not apply filter on column '{column}': column not found")
+    with stage_span('filter', sheet_name):
+        positions = sheet_index.rows(valid_filters)
+        return sheet_index.take(positions), positions
+
+def filtered_sheets(workbook, active_filters):
+    """Yield (sheet name, filtered rows) for every sheet, loading each as it is reached.
+
+    Runs outside the script run (from a download), so filters on columns a
+    sheet lacks are dropped silently rather than warned about.
+    """
+    for sheet_name in workbook.sheet_names:
+        df = workbook.sheet(sheet_name)
+        sheet_index = workbook.index(sheet_name)
+        filters = {
+            col: values
+            for col, values in active_filters.get(sheet_name, {}).items()
+            if values and col in df.columns
+        }
+        yield sheet_name, sheet_index.take(sheet_index.rows(filters))
+
+def export_filtered_workbook(workbook, active_filters):
+    """Build the multi-sheet XLSX download of every filtered sheet"""
+    return xlsx_export(filtered_sheets(workbook, active_filters))
+
+def format_value_count(counts):
+    """Build a widget format_func that shows each value's row count"""
+    return lambda value: f"{value} ({counts.get(value, 0):,})"
+
+@st.fragment
+def render_table(display_df, key):
+    """Show a table, paginated when it is long so only the visible rows are sent.
+
+    Runs as a fragment: changing page or page size reruns only the table.
+    """
+    total_rows = len(display_df)
+    paginate = st.toggle(
+        "Paginate table",
+        value=total_rows > PAGINATE_ROWS,
+        key=f"paginate_{key}",
+        help=f"On by default for tables over {PAGINATE_ROWS:,} rows"
+    )
+    
+    if not paginate:
+        try:
+            with stage_span('table_render', key):
+                st.dataframe(display_df, use_container_width=True, height=500)
+            return
+        except Exception as e:
+            st.error(f"Error displaying data: {str(e)}")
+            st.write("Showing one page of rows instead...")
+    
+    col1, col2, col3 = st.columns([1, 1, 2])
+    with col1:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, index=1, key=f"page_size_{key}")
+    page_count = max(1, -(-total_rows // page_size))
+    # Results shrink when filters or search change; start over rather than show an empty page
+    if st.session_state.get(f"page_{key}", 1) > page_count:
+        st.session_state[f"page_{key}"] = 1
+    with col2:
+        page = st.number_input("Page", min_value=1, max_value=page_count, step=1, key=f"page_{key}")
+    
+    start = (page - 1) * page_size
+    end = min(start + page_size, total_rows)
+    with col3:
+        st.markdown("<br>", unsafe_allow_html=True)
+        st.caption(f"Rows {start + 1 if total_rows else 0:,}–{end:,} of {total_rows:,} · page {page:,} of {page_count:,}")
+    
+    with stage_span('table_render', key):
+        st.dataframe(display_df.iloc[start:end], use_container_width=True, height=500)
+
+def format_snippet(snippet):
+    """Render a PDF search snippet as Markdown, with the matched words in bold"""
+    text = re.sub(r'([\\`*_{}\[\]()#+\-.!|$~<>])', r'\\\1', snippet)
+    return text.replace(MATCH_START, '**').replace(MATCH_END, '**')
 
 def get_color_palette(n):
     """Generate distinct colors for graphs"""
@@ -432,37 +661,58 @@ def get_color_palette(n):
     ]
     return colors[:n] if n <= len(colors) else colors * (n // len(colors) + 1)
 
-def create_visualization(df, time_col, category_col, value_cols, chart_type, selected_categories=None):
-    """Create visualization based on user selections"""
+def create_visualization(df, time_col, category_col, value_cols, chart_type, selected_categories=None,
+                         downsample_method='lttb', max_points=None):
+    """Create visualization based on user selections.
+
+    Traces longer than max_points (default CHART_POINT_BUDGET) are reduced
+    with downsample_method, 'lttb' or 'minmax'; None plots every point.
+    """
     try:
-        # Filter by selected categories if specified
+        # Only the plotted columns are copied, then split by category in one groupby pass
+        columns = list(dict.fromkeys([time_col, category_col, *value_cols]))
         if selected_categories and len(selected_categories) > 0:
-            df_filtered = df[df[category_col].isin(selected_categories)].copy()
+            df_filtered = df.loc[df[category_col].isin(selected_categories), columns]
         else:
-            df_filtered = df.copy()
+            df_filtered = df[columns]
         
         if df_filtered.empty:
             st.warning("No data available for selected categories")
             return None
         
-        # Sort by time column
-        df_filtered = df_filtered.sort_values(time_col)
+        # Sort by time column; the sort is stable so each category keeps its row order on ties
+        df_filtered = df_filtered.sort_values(time_col, kind='stable')
+        groups = list(df_filtered.groupby(category_col, sort=False, observed=True))
         
-        # Create figure
-        fig = go.Figure()
+        # WebGL keeps large line and scatter charts responsive
+        scatter = go.Scattergl if len(df_filtered) * len(value_cols) > WEBGL_POINTS else go.Scatter
+        
+        # Get colors, in order of first appearance over time
+        colors = get_color_palette(len(groups))
+        color_map = {category: colors[i] for i, (category, _) in enumerate(groups)}
         
-        # Get colors
-        categories = df_filtered[category_col].unique()
-        colors = get_color_palette(len(categories))
-        color_map = dict(zip(categories, colors))
+        if max_points is None:
+            max_points = CHART_POINT_BUDGET
+        downsampled = []
         
+        def series(cat_data, value_col):
+            """Return the x and y arrays of one trace, downsampled when over budget"""
+            x = cat_data[time_col].to_numpy()
+            y = cat_data[value_col].to_numpy()
+            if downsample_method and len(y) > max_points:
+                keep = downsample(x, y, max_points, downsample_method)
+                downsampled.append((len(y), len(keep)))
+                x, y = x[keep], y[keep]
+            return x, y
+        
+        traces = []
         if chart_type == "Line Chart":
-            for category in categories:
-                cat_data = df_filtered[df_filtered[category_col] == category]
+            for category, cat_data in groups:
                 for value_col in value_cols:
-                    fig.add_trace(go.Scatter(
-                        x=cat_data[time_col],
-                        y=cat_data[value_col],
+                    x, y = series(cat_data, value_col)
+                    traces.append(scatter(
+                        x=x,
+                        y=y,
                         mode='lines+markers',
                         name=f"{category} - {value_col}",
                         line=dict(color=color_map[category], width=2),
@@ -471,22 +721,22 @@ def create_visualization(df, time_col, category_col, value_cols, chart_type, sel
         
         elif chart_type == "Bar Chart":
             for i, value_col in enumerate(value_cols):
-                for category in categories:
-                    cat_data = df_filtered[df_filtered[category_col] == category]
-                    fig.add_trace(go.Bar(
-                        x=cat_data[time_col],
-                        y=cat_data[value_col],
+                for category, cat_data in groups:
+                    x, y = series(cat_data, value_col)
+                    traces.append(go.Bar(
+                        x=x,
+                        y=y,
                         name=f"{category} - {value_col}",
                         marker_color=color_map[category]
                     ))
         
         elif chart_type == "Area Chart":
-            for category in categories:
-                cat_data = df_filtered[df_filtered[category_col] == category]
+            for category, cat_data in groups:
                 for value_col in value_cols:
-                    fig.add_trace(go.Scatter(
-                        x=cat_data[time_col],
-                        y=cat_data[value_col],
+                    x, y = series(cat_data, value_col)
+                    traces.append(scatter(
+                        x=x,
+                        y=y,
                         mode='lines',
                         name=f"{category} - {value_col}",
                         fill='tonexty',
@@ -494,12 +744,12 @@ def create_visualization(df, time_col, category_col, value_cols, chart_type, sel
                     ))
         
         elif chart_type == "Scatter Plot":
-            for category in categories:
-                cat_data = df_filtered[df_filtered[category_col] == category]
+            for category, cat_data in groups:
                 for value_col in value_cols:
-                    fig.add_trace(go.Scatter(
-                        x=cat_data[time_col],
-                        y=cat_data[value_col],
+                    x, y = series(cat_data, value_col)
+                    traces.append(scatter(
+                        x=x,
+                        y=y,
                         mode='markers',
                         name=f"{category} - {value_col}",
                         marker=dict(
@@ -509,6 +759,22 @@ def create_visualization(df, time_col, category_col, value_cols, chart_type, sel
                         )
                     ))
         
+        # Adding traces one at a time revalidates the figure each time
+        fig = go.Figure()
+        fig.add_traces(traces)
+        
+        if downsampled:
+            total_in = sum(n for n, _ in downsampled)
+            total_out = sum(n for _, n in downsampled)
+            method_name = 'LTTB' if downsample_method == 'lttb' else 'min/max'
+            fig.add_annotation(
+                text=f"⚡ Downsampled ({method_name}): {len(downsampled)} of {len(traces)} traces, "
+                     f"{total_in:,} → {total_out:,} points",
+                xref='paper', yref='paper', x=1, y=1.02,
+                xanchor='right', yanchor='bottom', showarrow=False,
+                font=dict(size=11, color='#fee140')
+            )
+        
         # Update layout for dark theme
         fig.update_layout(
             plot_bgcolor='#0f1117',
@@ -540,6 +806,108 @@ def create_visualization(df, time_col, category_col, value_cols, chart_type, sel
         st.error(f"Error creating visualization: {str(e)}")
         return None
 
+@st.cache_resource
+def get_figure_cache():
+    """Return the figure cache shared by every session in the process"""
+    return FigureCache(FIGURE_CACHE_SIZE)
+
+def get_visualization(df, workbook, sheet_name, filters, time_col, category_col, value_cols, chart_type,
+                      selected_categories=None, downsample_method='lttb'):
+    """Return (key, figure) for these settings, building the figure on a cache miss.
+
+    df must be sheet_name of workbook with filters applied. Figures are keyed
+    by the workbook version, sheet, filters and every chart setting, and are
+    never mutated after being built, so sessions share them. The key also
+    identifies the figure's rendered images.
+    """
+    key = figure_key(
+        workbook, sheet_name, filters, time_col, category_col, value_cols, chart_type,
+        selected_categories, downsample_method, CHART_POINT_BUDGET
+    )
+    cache = get_figure_cache()
+    fig = cache.get(key)
+    if fig is None:
+        with stage_span('chart_build', sheet_name):
+            fig = create_visualization(
+                df, time_col, category_col, value_cols, chart_type, selected_categories,
+                downsample_method=downsample_method
+            )
+        if fig is not None:
+            cache.put(key, fig)
+    return key, fig
+
+@st.cache_resource
+def get_image_exporter():
+    """Return the chart image renderer shared by every session in the process"""
+    return ImageExporter()
+
+def remember_chart(key, title, fig):
+    """Keep a viewed chart for this session's "export all" download, newest last"""
+    charts = st.session_state.session_charts
+    charts.pop(key, None)
+    charts[key] = (title, fig)
+    while len(charts) > FIGURE_CACHE_SIZE:
+        del charts[next(iter(charts))]
+
+@st.cache_resource(show_spinner=False)
+def warm_deferred_imports():
+    """Import DEFERRED_MODULES on a background thread, once per process"""
+    def warm():
+        for module in DEFERRED_MODULES:
+            try:
+                importlib.import_module(module)
+            except ImportError:
+                pass
+    thread = threading.Thread(target=warm, name='warm-imports', daemon=True)
+    thread.start()
+    return thread
+
+# Stage timings are served for scraping when RESEARCH_PORTAL_METRICS_PORT is set
+get_metrics_server()
+
+# ============================================================================
+# DEFERRED IMPORTS
+# ============================================================================
+if st.session_state.authenticated:
+    import pandas as pd
+    import plotly.graph_objects as go
+    
+    from chart_export import (
+        IMAGE_FORMATS, KALEIDO_AVAILABLE, FigureCache, ImageExporter, figure_key, image_file_name
+    )
+    from data_export import (
+        PYARROW_AVAILABLE, XLSX_MIME, csv_export, export_file_name, parquet_export, xlsx_export
+    )
+    from data_loader import PrefetchOwner, Workbook, WorkbookPrefetcher, excel_engine, file_signature
+    from downsample import METHODS as DOWNSAMPLE_METHODS, downsample
+    from library_catalog import LibraryCatalog
+    from pdf_library import (
+        MATCH_END, MATCH_START, cached_pages, document_text, extract_text, page_count, page_image,
+        prefetch_page_images, publish_pdf, refresh_search_index, search_pdfs, start_text_extraction
+    )
+    from pdf_tables import TABLE_EXTRACTION_AVAILABLE, PdfTables, start_table_extraction, table_metadata
+    from profiler import RunProfiler
+
+# ============================================================================
+# PROFILING (admins only)
+# ============================================================================
+if st.session_state.authenticated:
+    run_profiler = st.session_state.pop('profile_run', None)
+    if run_profiler is not None:
+        # The profiled run ended early, through st.rerun(); keep what it recorded
+        st.session_state.profile_report = (st.session_state.profile_page, run_profiler.stop())
+    
+    # Armed from the admin panel; the run the arming click starts is not the one wanted
+    if (st.session_state.get('profile_armed') and not st.session_state.get('profile_arm')
+            and is_admin(st.session_state.user_email)):
+        st.session_state.profile_armed = False
+        run_profiler = RunProfiler()
+        if run_profiler.start():
+            st.session_state.profile_run = run_profiler
+            st.session_state.profile_page = st.session_state.stage
+        else:
+            st.session_state.profile_busy = True
+
 # ============================================================================
 # LOGIN PAGE
 # ============================================================================
@@ -588,6 +956,15 @@ if not st.session_state.authenticated:
         )
     
     st.markdown("</div>", unsafe_allow_html=True)
+    
+    login_ms = (time.perf_counter() - SCRIPT_START) * 1000
+    if login_ms > STARTUP_BUDGET_MS:
+        logger.warning("Login page took %.0f ms to render, over its %.0f ms budget", login_ms, STARTUP_BUDGET_MS)
+    else:
+        logger.debug("Login page rendered in %.0f ms", login_ms)
+    
+    # The user is reading the login form; load what the next pages need meanwhile
+    warm_deferred_imports()
 
 # ============================================================================
 # FILE SELECTION PAGE
@@ -627,20 +1004,43 @@ elif st.session_state.stage == 'file_selection':
             key="file_selector"
         )
         
-        if selected_file:
+        # File details come from the catalog, which the watcher keeps current
+        entry = get_catalog().entry(selected_file) if selected_file else None
+        
+        # Start parsing the selected workbook now, so it is ready by the time it is
+        # explored; picking another file cancels this session's earlier prefetch
+        if entry and excel_engine(selected_file):
+            try:
+                get_prefetcher().prefetch(selected_file, owner=prefetch_owner())
+            except OSError:
+                pass
+        if entry:
             try:
-                file_path = Path(selected_file)
-                file_size = file_path.stat().st_size / 1024 / 1024
-                file_modified = datetime.fromtimestamp(file_path.stat().st_mtime)
+                file_size = entry['size'] / 1024 / 1024
+                file_modified = datetime.fromtimestamp(entry['mtime'] / 1e9)
                 
-                col1, col2, col3 = st.columns(3)
+                col1, col2, col3, col4 = st.columns(4)
                 with col1:
                     st.metric("FILE SIZE", f"{file_size:.2f} MB")
                 with col2:
                     st.metric("LAST MODIFIED", file_modified.strftime('%d %b'))
                 with col3:
-                    file_ext = file_path.suffix.upper().replace('.', '')
+                    file_ext = Path(selected_file).suffix.upper().replace('.', '')
                     st.metric("FORMAT", file_ext)
+                with col4:
+                    if entry['sheets'] is not None:
+                        st.metric("SHEETS", len(entry['sheets']))
+                    elif entry['pages'] is not None:
+                        st.metric("PAGES", entry['pages'])
+                    else:
+                        st.metric("CONTENTS", "…")
+                
+                if entry['sheets']:
+                    st.caption(" · ".join(f"{name}: ≤{rows:,} rows" for name, rows in entry['sheets'].items()))
+                elif entry['error']:
+                    st.caption(f"⚠️ Could not read this file: {entry['error']}")
+                elif entry['sha1'] is None:
+                    st.caption("⏳ Reading file details...")
             except Exception as e:
                 st.error(f"Error reading file information: {str(e)}")
         
@@ -658,8 +1058,51 @@ elif st.session_state.stage == 'file_selection':
                 else:
                     st.session_state.stage = 'filter_setup'
                 
-                time.sleep(0.3)
                 st.rerun()
+        
+        # Library-wide search over the text of every PDF
+        if PYPDF2_AVAILABLE and any(Path(f).suffix.lower() == '.pdf' for f in files):
+            st.markdown("<br>", unsafe_allow_html=True)
+            st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
+            st.markdown("### 🔎 Search Inside PDFs")
+            
+            pdf_query = st.text_input(
+                "Search all PDFs",
+                key="pdf_library_search",
+                placeholder='Words to find, or "an exact phrase"...',
+                label_visibility="collapsed"
+            )
+            
+            # Only PDFs the catalog has seen added or changed are (re)indexed, off the script thread
+            index_update = refresh_pdf_search()
+            
+            if pdf_query:
+                try:
+                    if not index_update.done():
+                        st.caption("⏳ Indexing new or changed PDFs in the background; their matches will appear shortly")
+                    elif not index_update.cancelled() and index_update.exception() is not None:
+                        st.warning(f"⚠️ Could not update the search index: {index_update.exception()}")
+                    
+                    search_start = time.perf_counter()
+                    hits = search_pdfs(pdf_query)
+                    st.caption(f"{len(hits)} matches in {(time.perf_counter() - search_start) * 1000:.0f} ms")
+                    
+                    for hit_number, hit in enumerate(hits):
+                        col1, col2 = st.columns([5, 1])
+                        with col1:
+                            st.markdown(f"**📄 {hit['name']}** · page {hit['page']}")
+                            st.markdown(format_snippet(hit['snippet']))
+                        with col2:
+                            if st.button("Open", key=f"open_pdf_hit_{hit_number}", use_container_width=True):
+                                st.session_state.selected_file = os.path.relpath(hit['path'])
+                                st.session_state.file_type = '.pdf'
+                                st.session_state.pdf_page = hit['page']
+                                st.session_state.stage = 'pdf_view'
+                                st.rerun()
+                except Exception as e:
+                    st.error(f"Search error: {str(e)}")
+            
+            st.markdown("</div>", unsafe_allow_html=True)
     
     st.markdown("</div>", unsafe_allow_html=True)
 
@@ -681,12 +1124,9 @@ elif st.session_state.stage == 'pdf_view':
             st.rerun()
     
     try:
-        import base64
-        
-        # Read PDF file
-        with open(st.session_state.selected_file, "rb") as pdf_file:
-            pdf_bytes = pdf_file.read()
-            base64_pdf = base64.b64encode(pdf_bytes).decode('utf-8')
+        # Served by URL from the static folder so the browser fetches byte ranges
+        # as it shows pages, instead of receiving the whole file in the page
+        pdf_url = publish_pdf(st.session_state.selected_file) if st.get_option("server.enableStaticServing") else None
         
         # Show file info
         file_path = Path(st.session_state.selected_file)
@@ -701,24 +1141,126 @@ elif st.session_state.stage == 'pdf_view':
             file_modified = datetime.fromtimestamp(file_path.stat().st_mtime)
             st.metric("LAST MODIFIED", file_modified.strftime('%d %b %Y'))
         
+        # Tables are scanned once per version of the file, in the background,
+        # and then open in the data explorer like the sheets of a workbook
+        if TABLE_EXTRACTION_AVAILABLE:
+            tables = table_metadata(st.session_state.selected_file)
+            if tables is None:
+                table_scan = start_table_extraction(st.session_state.selected_file)
+                if table_scan is not None and table_scan.done():
+                    tables = table_scan.result()
+            
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                if tables is None:
+                    st.caption("⏳ Looking for tables in this PDF in the background...")
+                elif tables.get('error'):
+                    st.caption(f"⚠️ Could not read tables from this PDF: {tables['error']}")
+                elif tables['sheets']:
+                    table_count = len(tables['sheets'])
+                    st.caption(f"📊 {table_count} table{'s' if table_count != 1 else ''} found in this PDF, ready to filter, search and chart.")
+                else:
+                    st.caption("No tables found in this PDF.")
+            with col2:
+                if tables is not None and tables.get('error'):
+                    if st.button("🔄 Retry Table Scan", use_container_width=True, key="retry_pdf_tables"):
+                        start_table_extraction(st.session_state.selected_file, retry=True)
+                        st.rerun()
+                elif st.button(
+                    "📊 Explore Tables",
+                    use_container_width=True,
+                    disabled=tables is not None and not tables['sheets'],
+                    key="explore_pdf_tables"
+                ):
+                    st.session_state.stage = 'filter_setup'
+                    st.session_state.excel_data = None
+                    st.session_state.filters_config = {}
+                    st.session_state.active_filters = {}
+                    st.rerun()
+        
         st.markdown("<br>", unsafe_allow_html=True)
         
-        # PDF viewer using embedded iframe with base64
+        # PDF viewer embedding the served file
         st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
         st.markdown("### 📄 PDF Document")
         st.markdown("<p style='color: #a3a3a3; font-size: 0.9rem;'>If the PDF doesn't display properly, use the download button below</p>", unsafe_allow_html=True)
         
-        # Standard PDF viewer (no flipbook)
-        pdf_display = f"""
+        view_modes = ["📄 Embedded PDF"] + (["🖼️ Page Images"] if PDF2IMAGE_AVAILABLE else [])
+        if len(view_modes) > 1:
+            view_mode = st.radio("View as", view_modes, horizontal=True, key="pdf_view_mode", label_visibility="collapsed")
+        else:
+            view_mode = view_modes[0]
+        
+        if view_mode == "🖼️ Page Images":
+            # Pages rasterized on demand and cached on disk, for browsers without a PDF viewer
+            total_pages = page_count(st.session_state.selected_file)
+            st.session_state.pdf_page = min(max(1, st.session_state.pdf_page), total_pages)
+            
+            col1, col2, col3, col4 = st.columns([1, 1, 1, 1])
+            with col1:
+                dpi = st.selectbox(
+                    "Resolution",
+                    PAGE_IMAGE_DPIS,
+                    index=1,
+                    key="pdf_page_dpi",
+                    format_func=lambda d: f"{d} DPI",
+                    label_visibility="collapsed"
+                )
+            with col2:
+                if st.button("◀ Previous", use_container_width=True, disabled=st.session_state.pdf_page <= 1):
+                    st.session_state.pdf_page -= 1
+                    st.rerun()
+            with col3:
+                st.session_state.pdf_page_input = st.session_state.pdf_page
+                st.number_input(
+                    "Page",
+                    min_value=1,
+                    max_value=total_pages,
+                    step=1,
+                    key="pdf_page_input",
+                    on_change=lambda: st.session_state.update(pdf_page=st.session_state.pdf_page_input),
+                    label_visibility="collapsed"
+                )
+            with col4:
+                if st.button("Next ▶", use_container_width=True, disabled=st.session_state.pdf_page >= total_pages):
+                    st.session_state.pdf_page += 1
+                    st.rerun()
+            
+            page = st.session_state.pdf_page
+            with st.spinner(f"Rendering page {page}..."):
+                image_path, image_url = page_image(st.session_state.selected_file, page, dpi)
+            # Neighbours render in the background so the next page turn is a cache hit
+            prefetch_page_images(
+                st.session_state.selected_file,
+                [page + offset for offset in PAGE_IMAGE_PREFETCH if 1 <= page + offset <= total_pages],
+                dpi
+            )
+            
+            if st.get_option("server.enableStaticServing"):
+                st.markdown(
+                    f"<div class='pdf-container'><img class='pdf-page' src='{image_url}' alt='Page {page}'></div>",
+                    unsafe_allow_html=True
+                )
+            else:
+                st.image(str(image_path), use_container_width=True)
+            st.caption(f"Page {page} of {total_pages}")
+        
+        elif pdf_url:
+            # Standard PDF viewer (no flipbook)
+            pdf_display = f"""
             <div style="width: 100%; height: 800px; border: 1px solid #2d3347; border-radius: 8px; overflow: hidden;">
-                <embed src="data:application/pdf;base64,{base64_pdf}" 
+                <embed src="{pdf_url}#page={st.session_state.pdf_page}" 
                        type="application/pdf" 
                        width="100%" 
                        height="100%"
                        style="border: none;">
             </div>
         """
-        st.markdown(pdf_display, unsafe_allow_html=True)
+            st.markdown(pdf_display, unsafe_allow_html=True)
+        elif not st.get_option("server.enableStaticServing"):
+            st.warning("⚠️ Inline viewing needs static file serving. Set `enableStaticServing = true` under `[server]` in `.streamlit/config.toml`.")
+        else:
+            st.warning("⚠️ This PDF is too large to view inline. Please download it instead.")
         
         st.markdown("</div>", unsafe_allow_html=True)
         
@@ -730,8 +1272,9 @@ elif st.session_state.stage == 'pdf_view':
             # Download button
             st.download_button(
                 label="📥 Download PDF",
-                data=pdf_bytes,
-                file_name=st.session_state.selected_file,
+                data=partial(Path(st.session_state.selected_file).read_bytes),
+                on_click="ignore",
+                file_name=Path(st.session_state.selected_file).name,
                 mime="application/pdf",
                 use_container_width=True,
                 key="download_pdf"
@@ -739,10 +1282,10 @@ elif st.session_state.stage == 'pdf_view':
         
         with col2:
             # Open in new tab button
-            st.markdown(
-                f"""
-                <a href="data:application/pdf;base64,{base64_pdf}" 
-                   download="{st.session_state.selected_file}" 
+            if pdf_url:
+                st.markdown(
+                    f"""
+                <a href="{pdf_url}" 
                    target="_blank"
                    style="text-decoration: none;">
                     <button style="width: 100%; background: #3b5bdb; color: white; border: none; 
@@ -752,8 +1295,8 @@ elif st.session_state.stage == 'pdf_view':
                     </button>
                 </a>
                 """,
-                unsafe_allow_html=True
-            )
+                    unsafe_allow_html=True
+                )
         
         with col3:
             # View as text (if PyPDF2 available)
@@ -766,50 +1309,60 @@ elif st.session_state.stage == 'pdf_view':
         if hasattr(st.session_state, 'show_text') and st.session_state.show_text:
             if PYPDF2_AVAILABLE:
                 try:
-                    import PyPDF2
                     st.markdown("<br>", unsafe_allow_html=True)
                     st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
                     st.markdown("### 📝 Extracted Text")
                     
-                    with st.spinner("Extracting text from PDF..."):
-                        pdf_reader = PyPDF2.PdfReader(st.session_state.selected_file)
-                        
-                        # Extract text from all pages or first 10
-                        text_content = ""
-                        max_pages = min(10, len(pdf_reader.pages))
-                        
-                        for page_num in range(max_pages):
-                            page = pdf_reader.pages[page_num]
-                            text_content += f"\n{'='*60}\n"
-                            text_content += f"PAGE {page_num + 1}\n"
-                            text_content += f"{'='*60}\n\n"
-                            text_content += page.extract_text()
-                            text_content += "\n"
-                        
-                        if len(pdf_reader.pages) > 10:
-                            text_content += f"\n\n... ({len(pdf_reader.pages) - 10} more pages not shown)"
-                        
-                        st.text_area(
-                            "Text Content (First 10 pages)",
-                            text_content,
-                            height=500,
-                            key="pdf_text_content"
+                    total_pages = page_count(st.session_state.selected_file)
+                    window_starts = list(range(1, total_pages + 1, PDF_TEXT_PAGES_PER_VIEW))
+                    col1, col2 = st.columns([1, 3])
+                    with col1:
+                        window_start = st.selectbox(
+                            "Pages",
+                            window_starts,
+                            key="pdf_text_window",
+                            format_func=lambda start: f"Pages {start}–{min(start + PDF_TEXT_PAGES_PER_VIEW - 1, total_pages)} of {total_pages}"
                         )
-                        
-                        # Download text button
+                    window = list(range(window_start, min(window_start + PDF_TEXT_PAGES_PER_VIEW, total_pages + 1)))
+                    
+                    # Controls come before the text so they stay usable while extraction runs
+                    col3, col4 = st.columns(2)
+                    with col3:
                         st.download_button(
                             label="📥 Download Full Text",
-                            data=text_content.encode('utf-8'),
+                            data=partial(document_text, st.session_state.selected_file),
                             file_name=f"{Path(st.session_state.selected_file).stem}.txt",
                             mime="text/plain",
+                            on_click="ignore",
                             use_container_width=True
                         )
-                        
-                        # Button to hide text
+                    with col4:
                         if st.button("❌ Hide Text", use_container_width=True):
                             st.session_state.show_text = False
                             st.rerun()
                     
+                    # Text is cached on disk per page. Only the pages shown here are extracted
+                    # now; the rest of the document is extracted once in the background
+                    text_job = start_text_extraction(st.session_state.selected_file)
+                    with col2:
+                        progress = st.empty()
+                    placeholders = {page: st.empty() for page in window}
+                    for page in window:
+                        placeholders[page].caption(f"⏳ Extracting page {page}...")
+                    for page, text in extract_text(st.session_state.selected_file, pages=window):
+                        placeholders[page].text_area(f"Page {page}", text, height=300)
+                    
+                    extracted = cached_pages(st.session_state.selected_file)
+                    if text_job is None or extracted >= total_pages:
+                        progress.caption(f"✅ All {total_pages} pages extracted")
+                    elif text_job.done() and text_job.exception() is not None:
+                        progress.caption(f"⚠️ Could not extract the rest of the text: {text_job.exception()}")
+                    else:
+                        progress.progress(
+                            extracted / total_pages,
+                            text=f"⏳ Extracted {extracted} of {total_pages} pages in the background"
+                        )
+                    
                     st.markdown("</div>", unsafe_allow_html=True)
                     
                 except Exception as e:
@@ -830,15 +1383,15 @@ elif st.session_state.stage == 'pdf_view':
         st.warning("⚠️ Unable to display PDF in browser. Please download the file to view it.")
         
         try:
-            with open(st.session_state.selected_file, "rb") as pdf_file:
-                st.download_button(
-                    label="📥 Download PDF to View",
-                    data=pdf_file,
-                    file_name=st.session_state.selected_file,
-                    mime="application/pdf",
-                    use_container_width=True,
-                    key="download_pdf_fallback"
-                )
+            st.download_button(
+                label="📥 Download PDF to View",
+                data=partial(Path(st.session_state.selected_file).read_bytes),
+                file_name=Path(st.session_state.selected_file).name,
+                mime="application/pdf",
+                on_click="ignore",
+                use_container_width=True,
+                key="download_pdf_fallback"
+            )
         except Exception as download_error:
             st.error(f"Error preparing download: {str(download_error)}")
         
@@ -860,9 +1413,15 @@ elif st.session_state.stage == 'filter_setup':
     
     if st.session_state.excel_data is None:
         with st.spinner("🔄 Loading data..."):
-            st.session_state.excel_data = load_excel_file(st.session_state.selected_file)
-            if st.session_state.excel_data:
-                st.session_state.data_insights = calculate_insights(st.session_state.excel_data)
+            workbook = get_excel_data(st.session_state.selected_file)
+            if workbook:
+                st.session_state.excel_data = workbook
+                st.session_state.data_insights = calculate_sheet_metadata_insights(workbook)
+                loaded_sheets = {
+                    sheet_name: workbook.sheet(sheet_name)
+                    for sheet_name in workbook.sheet_names if workbook.is_loaded(sheet_name)
+                }
+                st.session_state.data_insights.update(calculate_insights(loaded_sheets))
             else:
                 st.error("Failed to load Excel file. Please go back and try again.")
                 if st.button("◀ Back to File Selection"):
@@ -881,7 +1440,7 @@ elif st.session_state.stage == 'filter_setup':
         st.markdown("<br>", unsafe_allow_html=True)
         
         total_rows = sum(insight['total_rows'] for insight in st.session_state.data_insights.values())
-        total_sheets = len(st.session_state.excel_data)
+        total_sheets = len(st.session_state.excel_data.sheets)
         
         col1, col2, col3, col4 = st.columns(4)
         with col1:
@@ -895,6 +1454,58 @@ elif st.session_state.stage == 'filter_setup':
             total_memory = sum(insight['memory_usage'] for insight in st.session_state.data_insights.values())
             st.metric("MB in Memory", f"{total_memory:.1f}")
         
+        workbook = st.session_state.excel_data
+        loaded_count = sum(1 for sheet_name in workbook.sheet_names if workbook.is_loaded(sheet_name))
+        st.caption(
+            f"{loaded_count} of {total_sheets} sheets loaded. Other sheets are parsed when first "
+            f"viewed, so row counts marked ≤ come from the sheet dimensions."
+        )
+        
+        if loaded_count < total_sheets:
+            # Large workbooks are parsed across worker processes (RESEARCH_PORTAL_PARSE_WORKERS)
+            if st.button("⚡ Load All Sheets", key="load_all_sheets"):
+                with st.spinner("🔄 Loading all sheets..."):
+                    try:
+                        workbook.load_all()
+                    except Exception as e:
+                        st.error(f"⚠️ Error loading sheets: {str(e)}")
+                    for sheet_name in workbook.sheet_names:
+                        if workbook.is_loaded(sheet_name):
+                            get_sheet(sheet_name)
+                st.rerun()
+        
+        if workbook.timings:
+            with st.expander("⏱️ Parse Timings", expanded=False):
+                st.caption("Sheets served from the columnar cache show the time of their original parse.")
+                timing_rows = [
+                    {
+                        'Sheet': sheet_name,
+                        'Rows': st.session_state.data_insights.get(sheet_name, {}).get('total_rows', 0),
+                        'Source': workbook.sources.get(sheet_name, ''),
+                        'Parse Time (s)': round(seconds, 3)
+                    }
+                    for sheet_name, seconds in workbook.timings.items()
+                ]
+                st.dataframe(pd.DataFrame(timing_rows), use_container_width=True, hide_index=True)
+        
+        if workbook.compaction:
+            with st.expander("🗜️ Memory Optimization", expanded=False):
+                st.caption("Repetitive text is stored as categories, numbers use the smallest lossless type and date-like text is parsed once.")
+                memory_rows = []
+                for sheet_name, report in workbook.compaction.items():
+                    before_mb = report['memory_before'] / 1024 / 1024
+                    after_mb = report['memory_after'] / 1024 / 1024
+                    memory_rows.append({
+                        'Sheet': sheet_name,
+                        'Before (MB)': round(before_mb, 2),
+                        'After (MB)': round(after_mb, 2),
+                        'Saved': f"{(1 - after_mb / before_mb) * 100:.0f}%" if before_mb else "0%",
+                        'Columns Changed': ", ".join(
+                            f"{column}: {change}" for column, change in report['changes'].items()
+                        ) or "—"
+                    })
+                st.dataframe(pd.DataFrame(memory_rows), use_container_width=True, hide_index=True)
+        
         st.markdown("</div>", unsafe_allow_html=True)
         
         st.markdown("<br>", unsafe_allow_html=True)
@@ -914,9 +1525,16 @@ elif st.session_state.stage == 'filter_setup':
             
             filters_config = {}
             
-            for sheet_name, df in st.session_state.excel_data.items():
-                with st.expander(f"📄 {sheet_name} ({len(df):,} rows)", expanded=False):
-                    columns = df.columns.tolist()
+            workbook = st.session_state.excel_data
+            for sheet_name in workbook.sheet_names:
+                # Column choices come from the header row, so no sheet body is parsed here
+                sheet_rows = st.session_state.data_insights[sheet_name]['total_rows']
+                approx = "≤" if st.session_state.data_insights[sheet_name].get('rows_estimated') else ""
+                with st.expander(f"📄 {sheet_name} ({approx}{sheet_rows:,} rows)", expanded=False):
+                    if workbook.is_loaded(sheet_name):
+                        columns = workbook.sheet(sheet_name).columns.tolist()
+                    else:
+                        columns = workbook.sheets[sheet_name]['columns']
                     if not columns:
                         st.warning(f"No columns found in {sheet_name}")
                         continue
@@ -939,7 +1557,6 @@ elif st.session_state.stage == 'filter_setup':
         with col2:
             if st.button("📈 VIEW DATA", use_container_width=True):
                 st.session_state.stage = 'data_view'
-                time.sleep(0.3)
                 st.rerun()
         
         st.markdown("</div>", unsafe_allow_html=True)
@@ -967,18 +1584,40 @@ elif st.session_state.stage == 'data_view':
             st.rerun()
     
     if st.session_state.excel_data:
-        sheet_names = list(st.session_state.excel_data.keys())
+        sheet_names = st.session_state.excel_data.sheet_names
+        
+        # One workbook of every sheet with its active filters applied (search is per-table)
+        st.download_button(
+            label="📥 Download All Filtered Sheets (XLSX)",
+            data=partial(
+                export_filtered_workbook,
+                st.session_state.excel_data,
+                {name: dict(filters) for name, filters in st.session_state.active_filters.items()}
+            ),
+            file_name=export_file_name(Path(st.session_state.selected_file).stem, 'xlsx'),
+            mime=XLSX_MIME,
+            on_click="ignore",
+            key="download_all_sheets"
+        )
         
-        # Create tabs - add Visualizations tab
+        # Create tabs - add Visualizations tab. Rerunning on tab change lets only
+        # the open tab execute, so sheets are parsed when first viewed.
         tab_labels = [f"📄 {name}" for name in sheet_names] + ["📈 Visualizations"]
-        tabs = st.tabs(tab_labels)
+        tabs = st.tabs(tab_labels, key="data_view_tabs", on_change="rerun")
         
         # Data tabs
         for idx, sheet_name in enumerate(sheet_names):
+            if not tabs[idx].open:
+                continue
             with tabs[idx]:
-                df = st.session_state.excel_data[sheet_name].copy()
+                # The sheet is shared across sessions; filtering takes rows into a new frame
+                df = get_sheet(sheet_name)
+                sheet_index = st.session_state.excel_data.index(sheet_name)
                 original_count = len(df)
                 
+                # Row positions still matching the filters; None means every row
+                positions = None
+                
                 if sheet_name in st.session_state.filters_config:
                     st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
                     st.markdown("### 🔍 Active Filters")
@@ -994,7 +1633,9 @@ elif st.session_state.stage == 'data_view':
                     for col_idx, filter_col in enumerate(filter_columns):
                         with filter_cols[col_idx % 3]:
                             try:
-                                unique_values = sorted(df[filter_col].dropna().unique().tolist())
+                                # Cached catalog when unfiltered, counted within matching rows otherwise
+                                with stage_span('filter_values', sheet_name):
+                                    unique_values, value_counts = sheet_index.column(filter_col).value_counts(positions)
                                 
                                 if len(unique_values) > 1000:
                                     st.warning(f"⚠️ Column '{filter_col}' has {len(unique_values)} unique values. Filter may be slow.")
@@ -1003,16 +1644,21 @@ elif st.session_state.stage == 'data_view':
                                     filter_col,
                                     unique_values,
                                     key=f"active_filter_{sheet_name}_{filter_col}",
-                                    default=st.session_state.active_filters[sheet_name].get(filter_col, [])
+                                    default=st.session_state.active_filters[sheet_name].get(filter_col, []),
+                                    format_func=format_value_count(value_counts)
                                 )
                                 
                                 st.session_state.active_filters[sheet_name][filter_col] = selected_values
                                 
                                 if selected_values:
-                                    df = apply_filter(df, filter_col, selected_values)
+                                    with stage_span('filter', sheet_name):
+                                        positions = sheet_index.rows({filter_col: selected_values}, within=positions)
                             except Exception as e:
                                 st.error(f"Error creating filter for '{filter_col}': {str(e)}")
                     
+                    with stage_span('take', sheet_name):
+                        df = sheet_index.take(positions)
+                    
                     if any(st.session_state.active_filters[sheet_name].values()):
                         if st.button("🔄 Clear All Filters", key=f"clear_{sheet_name}"):
                             st.session_state.active_filters[sheet_name] = {}
@@ -1049,225 +1695,261 @@ elif st.session_state.stage == 'data_view':
                 search_term = st.text_input(
                     "🔍 Search in table",
                     key=f"search_{sheet_name}",
-                    placeholder="Type to search..."
+                    placeholder="Type to search, or column:value (e.g. company:infosys)...",
+                    help='Matches text anywhere in a row. Use column:value to search one column, '
+                         'and quotes for spaces, e.g. "Company Name":"tata steel".'
                 )
                 
-                display_df = df.copy()
+                display_df = df
                 
                 if search_term:
                     try:
-                        mask = display_df.astype(str).apply(
-                            lambda x: x.str.contains(search_term, case=False, na=False, regex=False)
-                        ).any(axis=1)
-                        display_df = display_df[mask]
+                        # Indexed once per sheet; searches only the rows left by the filters
+                        with stage_span('search', sheet_name):
+                            display_df = sheet_index.take(sheet_index.search(search_term, within=positions))
                         st.info(f"Found {len(display_df):,} matching rows")
                     except Exception as e:
                         st.error(f"Search error: {str(e)}")
-                        display_df = df.copy()
+                        display_df = df
                 
-                try:
-                    st.dataframe(
-                        display_df,
-                        use_container_width=True,
-                        height=500
-                    )
-                except Exception as e:
-                    st.error(f"Error displaying data: {str(e)}")
-                    st.write("Attempting to display first 1000 rows...")
-                    st.dataframe(
-                        display_df.head(1000),
-                        use_container_width=True,
-                        height=500
-                    )
+                render_table(display_df, sheet_name)
                 
                 st.markdown("<br>", unsafe_allow_html=True)
                 
-                col1, col2, col3 = st.columns([2, 1, 2])
+                # Exports are generated only when a download button is clicked
+                col1, col2, col3, col4 = st.columns([1, 1, 1, 1])
                 with col2:
-                    try:
-                        csv = display_df.to_csv(index=False).encode('utf-8')
-                        st.download_button(
-                            label="📥 Download Filtered Data",
-                            data=csv,
-                            file_name=f"{sheet_name}_filtered_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                            mime="text/csv",
-                            use_container_width=True,
-                            key=f"download_{sheet_name}"
-                        )
-                    except Exception as e:
-                        st.error(f"Error preparing download: {str(e)}")
+                    st.download_button(
+                        label="📥 Download CSV",
+                        data=partial(csv_export, display_df),
+                        file_name=export_file_name(sheet_name, 'csv'),
+                        mime="text/csv",
+                        on_click="ignore",
+                        use_container_width=True,
+                        key=f"download_{sheet_name}"
+                    )
+                with col3:
+                    st.download_button(
+                        label="📥 Download Parquet",
+                        data=partial(parquet_export, display_df),
+                        file_name=export_file_name(sheet_name, 'parquet'),
+                        mime="application/vnd.apache.parquet",
+                        on_click="ignore",
+                        disabled=not PYARROW_AVAILABLE,
+                        help=None if PYARROW_AVAILABLE else "Install 'pyarrow' to export Parquet",
+                        use_container_width=True,
+                        key=f"download_parquet_{sheet_name}"
+                    )
                 
                 st.markdown("</div>", unsafe_allow_html=True)
         
         # Visualizations tab
-        with tabs[-1]:
-            st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
-            st.markdown("### 📊 Trend-Based Analysis")
-            st.markdown("Create custom visualizations to analyze trends across your data")
-            st.markdown("</div>", unsafe_allow_html=True)
+        if tabs[-1].open:
+            with tabs[-1]:
+                st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
+                st.markdown("### 📊 Trend-Based Analysis")
+                st.markdown("Create custom visualizations to analyze trends across your data")
+                st.markdown("</div>", unsafe_allow_html=True)
             
-            st.markdown("<br>", unsafe_allow_html=True)
+                st.markdown("<br>", unsafe_allow_html=True)
             
-            # Sheet selection for visualization
-            st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
-            st.markdown("#### 1️⃣ Select Data Source")
+                # Sheet selection for visualization
+                st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
+                st.markdown("#### 1️⃣ Select Data Source")
             
-            viz_sheet = st.selectbox(
-                "Choose sheet for visualization",
-                sheet_names,
-                key="viz_sheet_select"
-            )
+                viz_sheet = st.selectbox(
+                    "Choose sheet for visualization",
+                    sheet_names,
+                    key="viz_sheet_select"
+                )
             
-            if viz_sheet:
-                df_viz = st.session_state.excel_data[viz_sheet].copy()
-                
-                # Apply active filters if any
-                if viz_sheet in st.session_state.active_filters:
-                    for filter_col, filter_vals in st.session_state.active_filters[viz_sheet].items():
-                        if filter_vals:
-                            df_viz = apply_filter(df_viz, filter_col, filter_vals)
+                if viz_sheet:
+                    # Apply active filters if any
+                    df_viz, viz_positions = filter_sheet(viz_sheet, st.session_state.active_filters.get(viz_sheet, {}))
+                    viz_index = st.session_state.excel_data.index(viz_sheet)
                 
-                st.info(f"📊 Working with {len(df_viz):,} rows from '{viz_sheet}'")
+                    st.info(f"📊 Working with {len(df_viz):,} rows from '{viz_sheet}'")
                 
-                st.markdown("</div>", unsafe_allow_html=True)
-                st.markdown("<br>", unsafe_allow_html=True)
+                    st.markdown("</div>", unsafe_allow_html=True)
+                    st.markdown("<br>", unsafe_allow_html=True)
                 
-                # Column configuration
-                st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
-                st.markdown("#### 2️⃣ Configure Chart Parameters")
+                    # Column configuration
+                    st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
+                    st.markdown("#### 2️⃣ Configure Chart Parameters")
                 
-                col1, col2 = st.columns(2)
+                    col1, col2 = st.columns(2)
                 
-                with col1:
-                    # Time/X-axis column
-                    all_columns = df_viz.columns.tolist()
-                    time_col = st.selectbox(
-                        "📅 Select Time/X-axis Column",
-                        all_columns,
-                        key="time_column",
-                        help="Select the column to use for the X-axis (usually time, date, or sequence)"
-                    )
+                    with col1:
+                        # Time/X-axis column
+                        all_columns = df_viz.columns.tolist()
+                        time_col = st.selectbox(
+                            "📅 Select Time/X-axis Column",
+                            all_columns,
+                            key="time_column",
+                            help="Select the column to use for the X-axis (usually time, date, or sequence)"
+                        )
                 
-                with col2:
-                    # Category column
-                    category_col = st.selectbox(
-                        "🏷️ Select Category Column",
-                        all_columns,
-                        key="category_column",
-                        help="Select the column to group data by (e.g., product, region, type)"
-                    )
+                    with col2:
+                        # Category column
+                        category_col = st.selectbox(
+                            "🏷️ Select Category Column",
+                            all_columns,
+                            key="category_column",
+                            help="Select the column to group data by (e.g., product, region, type)"
+                        )
                 
-                st.markdown("</div>", unsafe_allow_html=True)
-                st.markdown("<br>", unsafe_allow_html=True)
+                    st.markdown("</div>", unsafe_allow_html=True)
+                    st.markdown("<br>", unsafe_allow_html=True)
                 
-                if time_col and category_col:
-                    # Category selection
-                    st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
-                    st.markdown("#### 3️⃣ Select Categories to Display")
+                    if time_col and category_col:
+                        # Category selection
+                        st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
+                        st.markdown("#### 3️⃣ Select Categories to Display")
                     
-                    try:
-                        available_categories = sorted(df_viz[category_col].dropna().unique().tolist())
+                        try:
+                            available_categories, category_counts = viz_index.column(category_col).value_counts(viz_positions)
                         
-                        if len(available_categories) > 50:
-                            st.warning(f"⚠️ {len(available_categories)} categories available. Consider selecting a subset for better visualization.")
+                            if len(available_categories) > 50:
+                                st.warning(f"⚠️ {len(available_categories)} categories available. Consider selecting a subset for better visualization.")
                         
-                        selected_categories = st.multiselect(
-                            f"Choose categories from '{category_col}'",
-                            available_categories,
-                            default=available_categories[:min(5, len(available_categories))],
-                            key="selected_categories",
-                            help="Select which categories you want to see in the chart"
-                        )
+                            selected_categories = st.multiselect(
+                                f"Choose categories from '{category_col}'",
+                                available_categories,
+                                default=available_categories[:min(5, len(available_categories))],
+                                key="selected_categories",
+                                help="Select which categories you want to see in the chart",
+                                format_func=format_value_count(category_counts)
+                            )
                         
-                        st.markdown("</div>", unsafe_allow_html=True)
-                        st.markdown("<br>", unsafe_allow_html=True)
+                            st.markdown("</div>", unsafe_allow_html=True)
+                            st.markdown("<br>", unsafe_allow_html=True)
                         
-                        if selected_categories:
-                            # Value columns selection
-                            st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
-                            st.markdown("#### 4️⃣ Select Values to Plot")
+                            if selected_categories:
+                                # Value columns selection
+                                st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
+                                st.markdown("#### 4️⃣ Select Values to Plot")
                             
-                            # Get numeric columns
-                            numeric_columns = df_viz.select_dtypes(include=['number']).columns.tolist()
+                                # Get numeric columns
+                                numeric_columns = df_viz.select_dtypes(include=['number']).columns.tolist()
                             
-                            if not numeric_columns:
-                                st.warning("⚠️ No numeric columns found for plotting. Please select a different sheet.")
-                            else:
-                                value_cols = st.multiselect(
-                                    "📈 Select value columns to plot",
-                                    numeric_columns,
-                                    default=[numeric_columns[0]] if numeric_columns else [],
-                                    key="value_columns",
-                                    help="Select one or more numeric columns to visualize"
-                                )
+                                if not numeric_columns:
+                                    st.warning("⚠️ No numeric columns found for plotting. Please select a different sheet.")
+                                else:
+                                    value_cols = st.multiselect(
+                                        "📈 Select value columns to plot",
+                                        numeric_columns,
+                                        default=[numeric_columns[0]] if numeric_columns else [],
+                                        key="value_columns",
+                                        help="Select one or more numeric columns to visualize"
+                                    )
                                 
-                                st.markdown("</div>", unsafe_allow_html=True)
-                                st.markdown("<br>", unsafe_allow_html=True)
+                                    st.markdown("</div>", unsafe_allow_html=True)
+                                    st.markdown("<br>", unsafe_allow_html=True)
                                 
-                                if value_cols:
-                                    # Chart type selection
-                                    st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
-                                    st.markdown("#### 5️⃣ Select Chart Type")
+                                    if value_cols:
+                                        # Chart type selection
+                                        st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
+                                        st.markdown("#### 5️⃣ Select Chart Type")
                                     
-                                    col1, col2, col3, col4 = st.columns(4)
+                                        col1, col2, col3, col4 = st.columns(4)
                                     
-                                    with col1:
-                                        if st.button("📈 Line Chart", use_container_width=True):
-                                            st.session_state.chart_type = "Line Chart"
+                                        with col1:
+                                            if st.button("📈 Line Chart", use_container_width=True):
+                                                st.session_state.chart_type = "Line Chart"
                                     
-                                    with col2:
-                                        if st.button("📊 Bar Chart", use_container_width=True):
-                                            st.session_state.chart_type = "Bar Chart"
+                                        with col2:
+                                            if st.button("📊 Bar Chart", use_container_width=True):
+                                                st.session_state.chart_type = "Bar Chart"
                                     
-                                    with col3:
-                                        if st.button("📉 Area Chart", use_container_width=True):
-                                            st.session_state.chart_type = "Area Chart"
+                                        with col3:
+                                            if st.button("📉 Area Chart", use_container_width=True):
+                                                st.session_state.chart_type = "Area Chart"
                                     
-                                    with col4:
-                                        if st.button("⚫ Scatter Plot", use_container_width=True):
-                                            st.session_state.chart_type = "Scatter Plot"
+                                        with col4:
+                                            if st.button("⚫ Scatter Plot", use_container_width=True):
+                                                st.session_state.chart_type = "Scatter Plot"
                                     
-                                    st.markdown("</div>", unsafe_allow_html=True)
-                                    st.markdown("<br>", unsafe_allow_html=True)
+                                        downsample_choice = st.selectbox(
+                                            "Downsampling",
+                                            list(DOWNSAMPLE_METHODS) + ["Off"],
+                                            key="downsample_method",
+                                            help=f"Traces over {CHART_POINT_BUDGET:,} points are reduced server-side. "
+                                                 "LTTB keeps the shape of the series; Min/Max keeps every peak and trough."
+                                        )
                                     
-                                    # Display chart
-                                    if 'chart_type' in st.session_state:
-                                        st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
-                                        st.markdown(f"### {st.session_state.chart_type}")
+                                        st.markdown("</div>", unsafe_allow_html=True)
+                                        st.markdown("<br>", unsafe_allow_html=True)
+                                    
+                                        # Display chart
+                                        if 'chart_type' in st.session_state:
+                                            st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
+                                            st.markdown(f"### {st.session_state.chart_type}")
                                         
-                                        with st.spinner("🎨 Creating visualization..."):
-                                            fig = create_visualization(
-                                                df_viz,
-                                                time_col,
-                                                category_col,
-                                                value_cols,
-                                                st.session_state.chart_type,
-                                                selected_categories
-                                            )
+                                            with st.spinner("🎨 Creating visualization..."):
+                                                chart_key, fig = get_visualization(
+                                                    df_viz,
+                                                    st.session_state.excel_data,
+                                                    viz_sheet,
+                                                    st.session_state.active_filters.get(viz_sheet, {}),
+                                                    time_col,
+                                                    category_col,
+                                                    value_cols,
+                                                    st.session_state.chart_type,
+                                                    selected_categories,
+                                                    downsample_method=DOWNSAMPLE_METHODS.get(downsample_choice)
+                                                )
                                             
-                                            if fig:
-                                                st.plotly_chart(fig, use_container_width=True)
+                                                if fig:
+                                                    st.plotly_chart(fig, use_container_width=True)
+                                                    chart_title = f"{viz_sheet} {st.session_state.chart_type} by {category_col}"
+                                                    remember_chart(chart_key, chart_title, fig)
                                                 
-                                                # Download chart
-                                                st.markdown("<br>", unsafe_allow_html=True)
-                                                col1, col2, col3 = st.columns([2, 1, 2])
-                                                with col2:
-                                                    try:
-                                                        img_bytes = fig.to_image(format="png")
-                                                        st.download_button(
-                                                            label="📥 Download Chart",
-                                                            data=img_bytes,
-                                                            file_name=f"chart_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png",
-                                                            mime="image/png",
-                                                            use_container_width=True
-                                                        )
-                                                    except:
+                                                    # Download chart; images are rendered in the background only when requested
+                                                    st.markdown("<br>", unsafe_allow_html=True)
+                                                    if KALEIDO_AVAILABLE:
+                                                        exporter = get_image_exporter()
+                                                        col1, col2, col3, col4 = st.columns([1, 1, 1, 1])
+                                                        with col2:
+                                                            image_format = st.selectbox(
+                                                                "Image format",
+                                                                list(IMAGE_FORMATS),
+                                                                key="chart_image_format",
+                                                                label_visibility="collapsed"
+                                                            )
+                                                            ext, mime = IMAGE_FORMATS[image_format]
+                                                        with col3:
+                                                            st.download_button(
+                                                                label="📥 Download Chart",
+                                                                data=partial(
+                                                                    exporter.render, chart_key, fig, ext,
+                                                                    tags={'file': st.session_state.selected_file, 'sheet': viz_sheet}
+                                                                ),
+                                                                file_name=image_file_name(f"{chart_title} {datetime.now().strftime('%Y%m%d_%H%M%S')}", ext),
+                                                                mime=mime,
+                                                                on_click="ignore",
+                                                                use_container_width=True
+                                                            )
+                                                        with col4:
+                                                            session_charts = [
+                                                                (key, title, chart)
+                                                                for key, (title, chart) in st.session_state.session_charts.items()
+                                                            ]
+                                                            st.download_button(
+                                                                label=f"📦 Export All Charts ({len(session_charts)})",
+                                                                data=partial(exporter.render_zip, session_charts, ext),
+                                                                file_name=f"charts_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
+                                                                mime="application/zip",
+                                                                on_click="ignore",
+                                                                help="Every chart viewed this session, in the selected format",
+                                                                use_container_width=True
+                                                            )
+                                                    else:
                                                         st.info("💡 Tip: Right-click on the chart to download it")
                                         
-                                        st.markdown("</div>", unsafe_allow_html=True)
+                                            st.markdown("</div>", unsafe_allow_html=True)
                     
-                    except Exception as e:
-                        st.error(f"Error in visualization setup: {str(e)}")
+                        except Exception as e:
+                            st.error(f"Error in visualization setup: {str(e)}")
     
     st.markdown("</div>", unsafe_allow_html=True)
     
@@ -1280,3 +1962,104 @@ elif st.session_state.stage == 'data_view':
         f"</div>",
         unsafe_allow_html=True
     )
+
+# ============================================================================
+# STAGE TIMINGS (admins only)
+# ============================================================================
+run_profiler = st.session_state.pop('profile_run', None)
+if run_profiler is not None:
+    st.session_state.profile_report = (st.session_state.profile_page, run_profiler.stop())
+
+if st.session_state.authenticated and is_admin(st.session_state.user_email):
+    with st.expander("🛠️ Stage Timings", expanded=False):
+        summary = recorder.summary()
+        if summary:
+            st.dataframe(
+                pd.DataFrame(summary).round(1), use_container_width=True, hide_index=True
+            )
+        else:
+            st.caption("No stages timed yet")
+        
+        recent = pd.DataFrame(recorder.recent(50))
+        if not recent.empty:
+            st.markdown("**Latest spans**")
+            recent['ts'] = pd.to_datetime(recent['ts'], unit='s').dt.strftime('%H:%M:%S.%f').str[:-3]
+            st.dataframe(recent, use_container_width=True, hide_index=True, height=300)
+        
+        col1, col2 = st.columns([1, 3])
+        with col1:
+            st.download_button(
+                label="📥 Prometheus Metrics",
+                data=recorder.prometheus,
+                file_name="metrics.txt",
+                mime="text/plain",
+                on_click="ignore",
+                use_container_width=True
+            )
+        with col2:
+            endpoint = f" · served at :{METRICS_PORT}/metrics" if get_metrics_server() else ""
+            st.caption(f"Percentiles over the last spans of each stage, for every session · log: `{SPAN_LOG_PATH}`{endpoint}")
+        
+        st.markdown("**🔬 Profiler**")
+        if st.session_state.pop('profile_busy', False):
+            st.warning("⚠️ Another session was being profiled, so this run was not. Try again shortly.")
+        
+        armed = st.session_state.get('profile_armed', False)
+        col1, col2 = st.columns([1, 3])
+        with col1:
+            st.button(
+                "✖️ Cancel Profiling" if armed else "🔬 Profile Next Rerun",
+                key="profile_arm",
+                on_click=toggle_profiling,
+                use_container_width=True
+            )
+        with col2:
+            if armed:
+                st.caption("The next rerun of this page is profiled: change a filter, search or build a chart. "
+                           "Sampling and allocation tracing slow that run down.")
+            else:
+                st.caption("Samples the CPU stack and traces memory allocations for one rerun")
+        
+        if st.session_state.get('profile_report'):
+            page, report = st.session_state.profile_report
+            st.caption(
+                f"Last profile: {page.replace('_', ' ')} · {report.seconds:.2f} s · {report.samples:,} samples · "
+                f"peak traced memory {report.peak_bytes / 1024 / 1024:.1f} MB"
+            )
+            allocations = pd.DataFrame(report.allocation_rows(10))
+            if not allocations.empty:
+                st.dataframe(allocations.round(1), use_container_width=True, hide_index=True)
+            
+            stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.download_button(
+                    label="🔥 Flame Graph (HTML)",
+                    data=partial(report.flamegraph_html, f"{page.replace('_', ' ').title()} · {st.session_state.selected_file or ''}"),
+                    file_name=f"profile_{page}_{stamp}.html",
+                    mime="text/html",
+                    on_click="ignore",
+                    use_container_width=True
+                )
+            with col2:
+                st.download_button(
+                    label="📥 Collapsed Stacks",
+                    data=report.collapsed,
+                    file_name=f"profile_{page}_{stamp}.folded",
+                    mime="text/plain",
+                    on_click="ignore",
+                    help="For flamegraph.pl or speedscope",
+                    use_container_width=True
+                )
+            with col3:
+                st.download_button(
+                    label="📥 Top Allocations",
+                    data=report.allocations_text,
+                    file_name=f"allocations_{page}_{stamp}.txt",
+                    mime="text/plain",
+                    on_click="ignore",
+                    use_container_width=True
+                )
+
+# Time the whole run, for every page; runs ended early by st.rerun() are not counted
+recorder.record('rerun', time.perf_counter() - SCRIPT_START, {'page': st.session_state.stage})
@@ -0,0 +1,125 @@
+"""Chart figure caching and background rendering of chart images for the Research Portal.
+
+Built figures are kept in an LRU ``FigureCache`` under a ``figure_key``
+naming the workbook version, sheet, filters and every chart setting, so
+sessions drawing the same chart share one figure.
+
+Plotly renders static images through Kaleido, which starts a headless
+browser and can take seconds per figure. Images are therefore rendered
+only when a download is requested, on a small thread pool off the script
+run, and kept by (figure key, format) so a chart is rendered at most once
+per format while it stays in the cache.
+"""
+import importlib.util
+import io
+import os
+import re
+import threading
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from telemetry import span
+
+KALEIDO_AVAILABLE = importlib.util.find_spec('kaleido') is not None
+
+# Label -> (plotly format / file extension, MIME type)
+IMAGE_FORMATS = {
+    'PNG': ('png', 'image/png'),
+    'SVG': ('svg', 'image/svg+xml'),
+    'PDF': ('pdf', 'application/pdf'),
+}
+
+EXPORT_WORKERS = int(os.environ.get('RESEARCH_PORTAL_EXPORT_WORKERS', 1))
+IMAGE_CACHE_SIZE = int(os.environ.get('RESEARCH_PORTAL_IMAGE_CACHE_SIZE', 64))
+
+def image_file_name(title, ext):
+    """Return a file-system safe name for a chart image"""
+    return f"{re.sub(r'[^A-Za-z0-9._-]+', '_', title).strip('_') or 'chart'}.{ext}"
+
+def figure_key(workbook, sheet_name, filters, time_col, category_col, value_cols, chart_type,
+               selected_categories, downsample_method, point_budget):
+    """Return the key of a chart: the workbook version, sheet, non-empty filters and chart settings"""
+    return (
+        workbook.path, workbook.size, workbook.mtime, sheet_name,
+        tuple((col, tuple(values)) for col, values in sorted(filters.items()) if values),
+        time_col, category_col, tuple(value_cols), chart_type,
+        tuple(selected_categories or ()), downsample_method, point_budget
+    )
+
+class FigureCache:
+    """Least-recently-used store of built chart figures, safe to share between threads"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the figure for key, marking it most recently used, or None"""
+        with self._lock:
+            fig = self._figures.get(key)
+            if fig is not None:
+                self._figures.move_to_end(key)
+            return fig
+
+    def put(self, key, fig):
+        """Store a figure, evicting the least recently used beyond max_entries"""
+        with self._lock:
+            self._figures[key] = fig
+            self._figures.move_to_end(key)
+            while len(self._figures) > self.max_entries:
+                self._figures.popitem(last=False)
+
+class ImageExporter:
+    """Render figures to image bytes on a thread pool, caching results by (figure key, format).
+
+    A render requested while the same one is in flight waits on it rather
+    than starting another. Failed renders are not kept, so they are retried
+    on the next request.
+    """
+
+    def __init__(self, workers=EXPORT_WORKERS, max_entries=IMAGE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='chart-export')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, key, fig, fmt, tags=None):
+        """Start rendering fig as fmt unless it is cached or running; return its future.
+
+        The render is timed as a 'chart_image' span with tags, e.g. file and sheet.
+        """
+        with self._lock:
+            job = self._jobs.get((key, fmt))
+            if job is not None and not (job.done() and job.exception() is not None):
+                self._jobs.move_to_end((key, fmt))
+                return job
+            job = self._executor.submit(self._to_image, fig, fmt, tags or {})
+            self._jobs[(key, fmt)] = job
+            # Evict finished renders only; running ones are still awaited
+            for old_key in list(self._jobs):
+                if len(self._jobs) <= self.max_entries:
+                    break
+                if self._jobs[old_key].done():
+                    del self._jobs[old_key]
+            return job
+
+    @staticmethod
+    def _to_image(fig, fmt, tags):
+        with span('chart_image', format=fmt, **tags):
+            return fig.to_image(format=fmt)
+
+    def render(self, key, fig, fmt, tags=None):
+        """Return fig rendered as fmt, waiting for the background render"""
+        return self.submit(key, fig, fmt, tags).result()
+
+    def render_zip(self, charts, fmt):
+        """Return a ZIP of (key, title, fig) charts rendered as fmt, rendered concurrently"""
+        jobs = [(title, self.submit(key, fig, fmt)) for key, title, fig in charts]
+        out = io.BytesIO()
+        with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for number, (title, job) in enumerate(jobs, start=1):
+                archive.writestr(image_file_name(f"{number:02d}_{title}", fmt), job.result())
+        out.seek(0)
+        return out
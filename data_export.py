@@ -0,0 +1,109 @@
+"""On-demand exports of filtered sheets for the Research Portal.
+
+Exports are only built when a download is requested, and are written in
+row chunks, so at most one chunk is held as text alongside the output
+rather than a full second copy of the sheet. The functions return a
+``BytesIO`` that ``st.download_button`` can send as it is.
+"""
+import importlib.util
+import io
+import math
+from datetime import datetime
+
+import pandas as pd
+
+OPENPYXL_AVAILABLE = importlib.util.find_spec('openpyxl') is not None
+PYARROW_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+
+CHUNK_ROWS = 50_000
+
+XLSX_MIME = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+def export_file_name(name, ext):
+    """Return a timestamped download name like 'Raw_Data_filtered_20250101_120000.csv'"""
+    return f"{name}_filtered_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{ext}"
+
+def _chunks(df):
+    for start in range(0, len(df), CHUNK_ROWS):
+        yield df.iloc[start:start + CHUNK_ROWS]
+
+def csv_export(df):
+    """Write df as UTF-8 CSV, chunk by chunk"""
+    out = io.BytesIO()
+    out.write(df.iloc[:0].to_csv(index=False).encode('utf-8'))
+    for chunk in _chunks(df):
+        out.write(chunk.to_csv(index=False, header=False).encode('utf-8'))
+    out.seek(0)
+    return out
+
+def parquet_export(df):
+    """Write df as Parquet, one row group per chunk"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    out = io.BytesIO()
+    schema = _parquet_schema(df)
+    with pq.ParquetWriter(out, schema) as writer:
+        for chunk in _chunks(df):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+    out.seek(0)
+    return out
+
+def _parquet_schema(df):
+    """Return the Arrow schema for df, inferred from its first chunk.
+
+    A column with no values in the first chunk takes its type from its
+    first values further down, so later chunks still match the schema.
+    """
+    import pyarrow as pa
+
+    schema = pa.Schema.from_pandas(df.iloc[:CHUNK_ROWS], preserve_index=False)
+    for i, field in enumerate(schema):
+        if pa.types.is_null(field.type):
+            values = df.iloc[:, i].dropna()
+            if not values.empty:
+                schema = schema.set(i, field.with_type(pa.infer_type(values.iloc[:CHUNK_ROWS].tolist())))
+    return schema
+
+def xlsx_export(frames):
+    """Write (sheet name, df) pairs to one workbook in openpyxl's write-only mode.
+
+    Write-only worksheets stream rows to disk as they are appended, so
+    memory stays flat however many sheets and rows are exported. Frames may
+    be a generator, letting callers build each sheet only when it is written.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+    def cell(value):
+        if value is None or value is pd.NaT or value is pd.NA:
+            return None
+        if isinstance(value, float) and math.isnan(value):
+            return None
+        if isinstance(value, pd.Timestamp):
+            return value.to_pydatetime()
+        if isinstance(value, str):
+            return ILLEGAL_CHARACTERS_RE.sub('', value)
+        return value
+
+    workbook = Workbook(write_only=True)
+    titles = set()
+    for name, df in frames:
+        # Excel caps sheet titles at 31 characters and forbids a few symbols
+        title = ''.join('_' if c in '[]:*?/\\' else c for c in str(name))[:31] or 'Sheet'
+        base, n = title, 1
+        while title.lower() in titles:
+            n += 1
+            title = f"{base[:31 - len(str(n)) - 1]}_{n}"
+        titles.add(title.lower())
+
+        worksheet = workbook.create_sheet(title)
+        worksheet.append([str(column) for column in df.columns])
+        for chunk in _chunks(df):
+            for row in chunk.astype(object).itertuples(index=False, name=None):
+                worksheet.append([cell(value) for value in row])
+
+    out = io.BytesIO()
+    workbook.save(out)
+    out.seek(0)
+    return out
@@ -0,0 +1,979 @@
+"""Workbook parsing and the on-disk columnar cache used by the Research Portal.
+
+This module has no Streamlit dependency so it can run inside worker
+processes and from the command line:
+
+    python data_loader.py ingest [--root .] [--workers N]
+
+warms the sidecar cache for every workbook the Research Library lists, and
+
+    python data_loader.py benchmark <workbook.xlsx>
+
+compares the pandas and streaming parsers sheet by sheet.
+"""
+import argparse
+import hashlib
+import importlib.util
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+import tracemalloc
+import warnings
+import weakref
+from collections import deque, namedtuple
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+import pandas as pd
+
+from sheet_index import SheetIndex
+
+OPENPYXL_AVAILABLE = importlib.util.find_spec('openpyxl') is not None
+XLRD_AVAILABLE = importlib.util.find_spec('xlrd') is not None
+PYARROW_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+
+CACHE_DIR = Path(os.environ.get('RESEARCH_PORTAL_CACHE_DIR', '.research_cache'))
+SIDECAR_VERSION = 3
+# Sidecars record whether they were compacted and are rebuilt when this changes
+COMPACT_DTYPES = os.environ.get('RESEARCH_PORTAL_COMPACT_DTYPES', '1') != '0'
+
+# Sheets are parsed in worker processes only for workbooks at least this
+# large; below it, process start-up costs more than the parse itself.
+PARSE_WORKERS = int(os.environ.get('RESEARCH_PORTAL_PARSE_WORKERS', '0')) or os.cpu_count() or 1
+PARALLEL_MIN_BYTES = int(float(os.environ.get('RESEARCH_PORTAL_PARALLEL_MIN_MB', '5')) * 1024 * 1024)
+
+# Sheets parsed ahead of time when a workbook is selected; the rest load
+# when opened, so a prefetch holds little more than the metadata
+PREFETCH_SHEETS = int(os.environ.get('RESEARCH_PORTAL_PREFETCH_SHEETS', '1'))
+
+# Folders never searched for library files; static/ holds the app's published PDF copies
+SKIPPED_DIRS = frozenset(['static', '__pycache__', 'venv', 'env', 'node_modules'])
+
+# Strings pandas reads as missing by default, plus Excel error values
+NA_STRINGS = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan',
+    '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a',
+    'nan', 'null', '#DIV/0!', '#VALUE!', '#REF!', '#NAME?', '#NUM!', '#NULL!',
+])
+
+# data: sheet name -> DataFrame, skipped: messages for sheets left out,
+# timings: sheet name -> parse seconds, source: 'streamed', 'pandas' or 'sidecar'
+LoadResult = namedtuple('LoadResult', ['data', 'skipped', 'timings', 'source'])
+
+def library_extensions():
+    """Return the file extensions the library can open with installed readers"""
+    extensions = []
+    if OPENPYXL_AVAILABLE:
+        extensions.append('.xlsx')
+    if XLRD_AVAILABLE:
+        extensions.append('.xls')
+    extensions.append('.pdf')
+    return extensions
+
+def is_visible(name):
+    """Return whether a file or folder name is shown in the library (not hidden or a lock file)"""
+    return not name.startswith('~') and not name.startswith('.')
+
+def walk_library(root='.', extensions=None):
+    """Yield (relative path, stat) for visible library files under root and its subfolders.
+
+    Paths use '/' separators. Hidden folders and SKIPPED_DIRS are not entered.
+    """
+    if extensions is None:
+        extensions = library_extensions()
+    extensions = tuple(ext.lower() for ext in extensions)
+    stack = ['']
+    while stack:
+        relative = stack.pop()
+        try:
+            entries = list(os.scandir(os.path.join(root, relative)))
+        except OSError:
+            continue
+        for entry in entries:
+            if not is_visible(entry.name):
+                continue
+            name = f"{relative}/{entry.name}" if relative else entry.name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in SKIPPED_DIRS:
+                        stack.append(name)
+                elif entry.name.lower().endswith(extensions):
+                    yield name, entry.stat()
+            except OSError:
+                continue
+
+def list_library_files(root='.', extensions=None):
+    """List visible library files under root and its subfolders, sorted by relative path"""
+    return sorted(name for name, _ in walk_library(root, extensions))
+
+def file_signature(filename):
+    """Return the (path, size, mtime) key identifying a file's current contents"""
+    file_path = Path(filename).resolve()
+    stat = file_path.stat()
+    return str(file_path), stat.st_size, stat.st_mtime_ns
+
+def excel_engine(filename):
+    """Return the pandas engine for a workbook, or None if it is not Excel"""
+    file_ext = Path(filename).suffix.lower()
+    if file_ext == '.xlsx':
+        return 'openpyxl'
+    if file_ext == '.xls':
+        return 'xlrd'
+    return None
+
+def parse_workbook(filename):
+    """Parse every sheet of a workbook through ``pd.read_excel``.
+
+    Returns a ``LoadResult`` whose ``data`` maps sheet name to DataFrame in
+    workbook order and whose ``skipped`` holds a message for each empty or
+    unreadable sheet. Errors opening the workbook itself propagate.
+    """
+    engine = excel_engine(filename)
+    excel_file = pd.ExcelFile(filename, engine=engine)
+    data = {}
+    skipped = []
+    timings = {}
+
+    for sheet_name in excel_file.sheet_names:
+        start = time.perf_counter()
+        try:
+            df = excel_file.parse(sheet_name)
+            if df.empty:
+                skipped.append(f"Sheet '{sheet_name}' is empty")
+                continue
+            data[sheet_name] = arrow_compatible(df)
+        except Exception as e:
+            skipped.append(f"Could not load sheet '{sheet_name}': {str(e)}")
+            continue
+        finally:
+            timings[sheet_name] = time.perf_counter() - start
+
+    return LoadResult(data, skipped, timings, 'pandas')
+
+def stream_workbook(filename):
+    """Parse an .xlsx archive in one read-only pass.
+
+    The archive is opened once and each sheet's rows are streamed with
+    ``iter_rows(values_only=True)`` straight into per-column lists, so no
+    cell objects or intermediate row lists are kept. Missing-value strings,
+    blank rows and header naming follow ``pd.read_excel`` so both paths
+    produce the same frames for typed cells.
+    """
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(filename, read_only=True, data_only=True)
+    data = {}
+    skipped = []
+    timings = {}
+
+    try:
+        for worksheet in workbook.worksheets:
+            sheet_name = worksheet.title
+            start = time.perf_counter()
+            try:
+                df = _stream_sheet(worksheet)
+                if df.empty:
+                    skipped.append(f"Sheet '{sheet_name}' is empty")
+                    continue
+                data[sheet_name] = arrow_compatible(df)
+            except Exception as e:
+                skipped.append(f"Could not load sheet '{sheet_name}': {str(e)}")
+                continue
+            finally:
+                timings[sheet_name] = time.perf_counter() - start
+    finally:
+        workbook.close()
+
+    return LoadResult(data, skipped, timings, 'streamed')
+
+def _stream_sheet(worksheet):
+    """Build a DataFrame from a read-only worksheet using its first row as header"""
+    worksheet.reset_dimensions()
+    rows = worksheet.iter_rows(values_only=True)
+    header = next(rows, None)
+    header = [None if value == '' else value for value in header] if header is not None else None
+    while header and header[-1] is None:
+        header.pop()
+    buffers = []
+    row_count = 0
+    pending_blank = 0
+
+    for row in rows:
+        values = [_clean_value(value) for value in row]
+        while values and values[-1] is None:
+            values.pop()
+        if not values:
+            # Blank rows inside the data are kept, trailing ones are dropped
+            pending_blank += 1
+            continue
+        if pending_blank:
+            for buffer in buffers:
+                buffer.extend([None] * pending_blank)
+            row_count += pending_blank
+            pending_blank = 0
+        if len(values) > len(buffers):
+            buffers.extend([None] * row_count for _ in range(len(values) - len(buffers)))
+        for buffer, value in zip(buffers, values):
+            buffer.append(value)
+        for buffer in buffers[len(values):]:
+            buffer.append(None)
+        row_count += 1
+
+    if not header and not buffers:
+        return pd.DataFrame()
+    width = max(len(header), len(buffers))
+    buffers.extend([None] * row_count for _ in range(width - len(buffers)))
+    df = pd.DataFrame(dict(enumerate(buffers)))
+    # pandas reads empty columns, and booleans with gaps, as float
+    for i in df.columns[df.dtypes == object]:
+        values = df[i].dropna()
+        if values.empty or values.map(type).eq(bool).all():
+            df[i] = df[i].astype('float64')
+    df.columns = _column_names(header + [None] * (width - len(header)))
+    return df
+
+def _clean_value(value):
+    """Map a raw cell value the way pandas' Excel reader does"""
+    if isinstance(value, str):
+        return None if value in NA_STRINGS else value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+def _column_names(header):
+    """Name blank header cells 'Unnamed: i', label the rest as strings and suffix duplicates '.1', '.2'"""
+    names = []
+    seen = {}
+    for i, value in enumerate(header):
+        name = f"Unnamed: {i}" if value is None else str(value)
+        if name in seen:
+            base = name
+            while name in seen:
+                seen[base] += 1
+                name = f"{base}.{seen[base]}"
+        seen[name] = 0
+        names.append(name)
+    return names
+
+def string_columns(df):
+    """Label every column with a string, as Arrow stores them, keeping labels unique.
+
+    Excel headers can be numbers or dates; without this a sheet read back
+    from its sidecar would have different labels than the same sheet parsed.
+    """
+    if not all(isinstance(column, str) for column in df.columns):
+        df.columns = _column_names([str(column) for column in df.columns])
+    return df
+
+def arrow_compatible(df):
+    """Convert object columns holding mixed value types to strings.
+
+    Columns such as company names that mix numbers and text cannot be
+    stored in Arrow (or sorted for filter widgets), so they are normalised
+    on every load rather than only when a sidecar is written.
+    """
+    for column in df.columns[df.dtypes == object]:
+        values = df[column].dropna()
+        if values.map(type).nunique() > 1:
+            df[column] = df[column].where(df[column].isna(), df[column].astype(str)).infer_objects()
+    return df
+
+# Text that looks like a calendar date rather than a bare number or code
+DATE_LIKE = re.compile(
+    r'^\s*(\d{4}-\d{1,2}-\d{1,2}|\d{1,2}[-/.]\d{1,2}[-/.]\d{2,4}'
+    r'|\d{1,2}[-\s][A-Za-z]{3,9}[-\s]\d{2,4}|[A-Za-z]{3,9}[-\s]\d{1,2},?[-\s]\d{2,4})'
+    r'([T\s]\d{1,2}:\d{2}(:\d{2})?)?\s*$'
+)
+# Share of distinct values below which a text column becomes a category
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+def compact_dtypes(df):
+    """Shrink a freshly parsed sheet without changing any value.
+
+    Date-like text columns are parsed to datetimes once, repetitive text
+    columns become categories, integers are downcast and floats move to
+    float32 only where every value survives the round trip. Returns the
+    frame and a report of memory before and after and of each change.
+    """
+    memory_before = int(df.memory_usage(deep=True).sum())
+    changes = {}
+
+    for column in df.columns:
+        series = df[column]
+        before = str(series.dtype)
+        if pd.api.types.is_bool_dtype(series):
+            continue
+        if pd.api.types.is_integer_dtype(series):
+            converted = pd.to_numeric(series, downcast='integer')
+        elif pd.api.types.is_float_dtype(series):
+            converted = _downcast_float(series)
+        elif pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+            converted = _compact_text(series)
+        else:
+            continue
+        if converted is not series and str(converted.dtype) != before:
+            df[column] = converted
+            changes[str(column)] = f"{before} → {converted.dtype}"
+
+    return df, {
+        'memory_before': memory_before,
+        'memory_after': int(df.memory_usage(deep=True).sum()),
+        'changes': changes,
+    }
+
+def _downcast_float(series):
+    """Use float32, or the smallest integer type, when no value changes"""
+    values = series.dropna()
+    if values.empty:
+        return series
+    if len(values) == len(series) and (values % 1 == 0).all():
+        return pd.to_numeric(series, downcast='integer')
+    as_float32 = series.astype('float32')
+    if as_float32.astype('float64').equals(series):
+        return as_float32
+    return series
+
+def _compact_text(series):
+    """Parse date-like text once, or store repetitive text as a category"""
+    values = series.dropna()
+    if values.empty or not values.map(type).eq(str).all():
+        return series
+
+    sample = values.head(100)
+    if sample.str.match(DATE_LIKE).all():
+        parsed = _parse_dates(series, values)
+        if parsed is not None:
+            return parsed
+
+    if values.nunique() <= len(values) * CATEGORY_MAX_UNIQUE_RATIO:
+        as_category = series.astype('category')
+        if as_category.memory_usage(deep=True) < series.memory_usage(deep=True):
+            return as_category
+    return series
+
+def _parse_dates(series, values):
+    """Parse date text with the one format every value fits, or return None.
+
+    Candidate formats are guessed from the first value, month-first and
+    day-first. A column is only converted when exactly one of them parses
+    every value: '05/07/2025' alone is ambiguous and stays text, while a
+    '13/07/2025' elsewhere in the column settles it as day-first.
+    """
+    from pandas.tseries.api import guess_datetime_format
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', UserWarning)
+        formats = {
+            guess_datetime_format(values.iloc[0], dayfirst=dayfirst) for dayfirst in (False, True)
+        } - {None}
+        matches = []
+        for date_format in formats:
+            parsed = pd.to_datetime(series, format=date_format, errors='coerce')
+            if parsed.notna().sum() == len(values):
+                matches.append(parsed)
+    return matches[0] if len(matches) == 1 else None
+
+def prepare_sheet(df, seconds):
+    """Normalise a parsed sheet and return it with the info kept in its sidecar"""
+    df = arrow_compatible(string_columns(df))
+    info = {'parse_seconds': seconds, 'compact_dtypes': COMPACT_DTYPES}
+    if COMPACT_DTYPES:
+        df, info['compaction'] = compact_dtypes(df)
+    return df, info
+
+# ============================================================================
+# COLUMNAR SIDECAR CACHE
+# ============================================================================
+
+def sidecar_dir(path, size, mtime):
+    """Return the cache directory for one version of a workbook"""
+    path_key = hashlib.sha1(str(path).encode('utf-8')).hexdigest()[:16]
+    return CACHE_DIR / path_key / f"v{SIDECAR_VERSION}-{size}-{mtime}"
+
+def _replace_atomically(target, write):
+    """Call write(tmp_path) and move the result over target in one step"""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = target.with_name(f"{target.name}.tmp-{os.getpid()}-{threading.get_ident()}")
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, target)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+def read_sidecar_metadata(entry):
+    """Return the sheet metadata stored for a workbook version, or None"""
+    try:
+        metadata = json.loads((entry / 'metadata.json').read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+    if metadata.get('version') != SIDECAR_VERSION or metadata.get('compact_dtypes') != COMPACT_DTYPES:
+        return None
+    return metadata
+
+def write_sidecar_metadata(entry, metadata):
+    """Store sheet metadata and drop cache entries for older versions of the file"""
+    _replace_atomically(
+        entry / 'metadata.json',
+        lambda tmp: tmp.write_text(json.dumps(metadata), encoding='utf-8')
+    )
+    for stale in entry.parent.iterdir():
+        if stale.is_dir() and stale != entry:
+            shutil.rmtree(stale, ignore_errors=True)
+
+def read_sidecar_sheet(entry, index):
+    """Memory-map a cached sheet, returning (DataFrame, info) or None.
+
+    Sheets written with dtype compaction set differently count as missing.
+    """
+    sheet_file = entry / f"sheet_{index}.arrow"
+    if not sheet_file.exists():
+        return None
+
+    from pyarrow import feather
+
+    try:
+        table = feather.read_table(sheet_file, memory_map=True)
+        info = json.loads((table.schema.metadata or {}).get(b'research_portal', b'{}'))
+        if info.get('compact_dtypes') != COMPACT_DTYPES:
+            return None
+        return table.to_pandas(), info
+    except Exception:
+        return None
+
+def write_sidecar_sheet(entry, index, df, info):
+    """Write a sheet as an uncompressed Arrow IPC file so it can be memory-mapped"""
+    import pyarrow as pa
+    from pyarrow import feather
+
+    table = pa.Table.from_pandas(string_columns(df))
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        b'research_portal': json.dumps(info).encode('utf-8'),
+    })
+    _replace_atomically(
+        entry / f"sheet_{index}.arrow",
+        lambda tmp: feather.write_feather(table, tmp, compression='uncompressed')
+    )
+
+# ============================================================================
+# LAZY WORKBOOK
+# ============================================================================
+
+class Workbook:
+    """A workbook whose sheet metadata is read up front and bodies on demand.
+
+    Opening reads only sheet names, dimensions and header rows. Each sheet
+    body is parsed the first time ``sheet()`` asks for it, from the Arrow
+    sidecar when one exists and otherwise by streaming that worksheet, and
+    then kept for the lifetime of the object. Instances are shared between
+    sessions, so loads are serialised and returned frames must not be
+    mutated.
+    """
+
+    def __init__(self, filename):
+        self.path, self.size, self.mtime = file_signature(filename)
+        self.sheets = {}
+        self.skipped = []
+        self.timings = {}
+        self.sources = {}
+        self.compaction = {}
+        self._frames = {}
+        self._indexes = {}
+        self._reader = None
+        self._lock = threading.Lock()
+        self._entry = sidecar_dir(self.path, self.size, self.mtime) if PYARROW_AVAILABLE else None
+
+        metadata = read_sidecar_metadata(self._entry) if self._entry else None
+        if metadata is None:
+            metadata = self._read_metadata()
+            if self._entry:
+                try:
+                    write_sidecar_metadata(self._entry, metadata)
+                except OSError:
+                    pass
+        self.sheets = metadata['sheets']
+        self.skipped = metadata['skipped']
+
+    @property
+    def sheet_names(self):
+        return list(self.sheets)
+
+    def is_loaded(self, sheet_name):
+        return sheet_name in self._frames
+
+    def sheet(self, sheet_name):
+        """Return a sheet's DataFrame, parsing it on first access"""
+        if sheet_name in self._frames:
+            return self._frames[sheet_name]
+        if sheet_name not in self.sheets:
+            raise KeyError(sheet_name)
+        with self._lock:
+            if sheet_name not in self._frames:
+                self._load_sheet(sheet_name)
+            return self._frames[sheet_name]
+
+    def index(self, sheet_name):
+        """Return the shared SheetIndex over a sheet, loading the sheet if needed"""
+        df = self.sheet(sheet_name)
+        index = self._indexes.get(sheet_name)
+        if index is None:
+            index = self._indexes.setdefault(sheet_name, SheetIndex(df))
+        return index
+
+    def load_all(self, workers=None):
+        """Parse every sheet that has not been loaded yet.
+
+        Large .xlsx workbooks are parsed in the shared pool of
+        ``PARSE_WORKERS`` processes unless ``workers`` is 1; small ones, and
+        any sheet a worker failed on, are parsed serially.
+        """
+        workers = workers or PARSE_WORKERS
+        pending = [sheet_name for sheet_name in self.sheet_names if sheet_name not in self._frames]
+        if (workers > 1 and len(pending) > 1 and self.size >= PARALLEL_MIN_BYTES
+                and excel_engine(self.path) == 'openpyxl'):
+            self._load_parallel(pending, workers)
+        for sheet_name in pending:
+            self.sheet(sheet_name)
+        self.close()
+
+    def close(self):
+        """Release the open archive; later loads reopen it if needed"""
+        with self._lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+
+    def _open_reader(self):
+        if self._reader is None:
+            import openpyxl
+            self._reader = openpyxl.load_workbook(self.path, read_only=True, data_only=True)
+        return self._reader
+
+    def _read_metadata(self):
+        """Collect sheet names, dimensions and header rows without reading bodies"""
+        sheets = {}
+        skipped = []
+
+        if excel_engine(self.path) != 'openpyxl':
+            # xlrd reads the whole file on open, so bodies are parsed right away
+            result = parse_workbook(self.path)
+            for index, (sheet_name, df) in enumerate(result.data.items()):
+                df, info = prepare_sheet(df, result.timings[sheet_name])
+                sheets[sheet_name] = {
+                    'index': index,
+                    'rows': len(df),
+                    'rows_estimated': False,
+                    'columns': [str(column) for column in df.columns],
+                }
+                self._frames[sheet_name] = df
+                self.sources[sheet_name] = 'pandas'
+                self.timings[sheet_name] = info['parse_seconds']
+                if 'compaction' in info:
+                    self.compaction[sheet_name] = info['compaction']
+                if self._entry:
+                    try:
+                        write_sidecar_sheet(self._entry, index, df, info)
+                    except Exception:
+                        pass
+            return {
+                'version': SIDECAR_VERSION, 'compact_dtypes': COMPACT_DTYPES,
+                'sheets': sheets, 'skipped': result.skipped,
+            }
+
+        reader = self._open_reader()
+        for index, worksheet in enumerate(reader.worksheets):
+            sheet_name = worksheet.title
+            try:
+                # The stored dimension can be missing or wrong, so rows are counted
+                worksheet.reset_dimensions()
+                rows = worksheet.iter_rows(values_only=True)
+                header = [None if value == '' else value for value in next(rows, ())]
+                while header and header[-1] is None:
+                    header.pop()
+                # Trailing blank rows are dropped, as _stream_sheet does
+                row_count = 0
+                for number, row in enumerate(rows, start=1):
+                    if any(_clean_value(value) is not None for value in row):
+                        row_count = number
+                if not row_count:
+                    skipped.append(f"Sheet '{sheet_name}' is empty")
+                    continue
+                sheets[sheet_name] = {
+                    'index': index,
+                    'rows': row_count,
+                    'rows_estimated': False,
+                    'columns': _column_names(header),
+                }
+            except Exception as e:
+                skipped.append(f"Could not load sheet '{sheet_name}': {str(e)}")
+        return {
+            'version': SIDECAR_VERSION, 'compact_dtypes': COMPACT_DTYPES,
+            'sheets': sheets, 'skipped': skipped,
+        }
+
+    def _load_parallel(self, sheet_names, workers):
+        """Parse sheets in worker processes that hand frames back through Arrow files.
+
+        Each worker writes its sheet as the sidecar IPC file and the parent
+        memory-maps it, so frames are not pickled across the process
+        boundary. Without pyarrow, workers return pickled frames instead.
+        """
+        with self._lock:
+            to_parse = []
+            for sheet_name in sheet_names:
+                index = self.sheets[sheet_name]['index']
+                cached = read_sidecar_sheet(self._entry, index) if self._entry else None
+                if cached is not None:
+                    self._store_sheet(sheet_name, cached[0], cached[1], 'sidecar')
+                else:
+                    to_parse.append(sheet_name)
+            if len(to_parse) < 2:
+                return
+
+            executor = parse_pool()
+            try:
+                futures = {
+                    executor.submit(
+                        _parse_sheet_worker, self.path, self._entry, sheet_name,
+                        self.sheets[sheet_name]['index']
+                    ): sheet_name
+                    for sheet_name in to_parse
+                }
+            except BrokenProcessPool:
+                discard_parse_pool(executor)
+                return
+            for future in as_completed(futures):
+                sheet_name = futures[future]
+                try:
+                    df, info = future.result()
+                    if df is None:
+                        df, _ = read_sidecar_sheet(self._entry, self.sheets[sheet_name]['index'])
+                except BrokenProcessPool:
+                    discard_parse_pool(executor)
+                    continue
+                except Exception:
+                    # Left for the serial pass, which reports the error
+                    continue
+                self._store_sheet(sheet_name, df, info, 'parallel')
+
+    def _load_sheet(self, sheet_name):
+        index = self.sheets[sheet_name]['index']
+        cached = read_sidecar_sheet(self._entry, index) if self._entry else None
+        if cached is not None:
+            df, info = cached
+            source = 'sidecar'
+        else:
+            start = time.perf_counter()
+            if excel_engine(self.path) == 'openpyxl':
+                df = _stream_sheet(self._open_reader()[sheet_name])
+                source = 'streamed'
+            else:
+                df = pd.read_excel(self.path, sheet_name=sheet_name, engine=excel_engine(self.path))
+                source = 'pandas'
+            df, info = prepare_sheet(df, time.perf_counter() - start)
+            if self._entry:
+                try:
+                    write_sidecar_sheet(self._entry, index, df, info)
+                except Exception:
+                    pass
+        self._store_sheet(sheet_name, df, info, source)
+
+    def _store_sheet(self, sheet_name, df, info, source):
+        self.sheets[sheet_name] = {
+            **self.sheets[sheet_name],
+            'rows': len(df),
+            'rows_estimated': False,
+            'columns': [str(column) for column in df.columns],
+        }
+        self.timings[sheet_name] = info.get('parse_seconds', 0.0)
+        if 'compaction' in info:
+            self.compaction[sheet_name] = info['compaction']
+        self.sources[sheet_name] = source
+        self._frames[sheet_name] = df
+        if len(self._frames) == len(self.sheets) and self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+# ============================================================================
+# PARALLEL PARSING
+# ============================================================================
+
+_parse_pool = None
+_parse_pool_lock = threading.Lock()
+
+def parse_pool():
+    """Return the shared parsing process pool of ``PARSE_WORKERS`` processes.
+
+    Workers are spawned rather than forked because the Streamlit server is
+    multi-threaded. The pool is kept so later loads skip start-up, and is
+    never resized: shutting it down would fail submits from other threads.
+    """
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            _parse_pool = ProcessPoolExecutor(
+                max_workers=PARSE_WORKERS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _parse_pool
+
+def discard_parse_pool(broken):
+    """Drop a broken pool so the next parallel load starts a fresh one.
+
+    Only the pool the caller saw break is dropped, not a fresh one another
+    thread has already started.
+    """
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is broken:
+            _parse_pool = None
+    broken.shutdown(wait=False)
+
+def _parse_sheet_worker(path, entry, sheet_name, index):
+    """Parse one sheet in a worker process.
+
+    Returns ``(None, info)`` once the sheet is written to the sidecar, or
+    ``(DataFrame, info)`` when there is no sidecar to write to.
+    """
+    import openpyxl
+
+    start = time.perf_counter()
+    reader = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        df = _stream_sheet(reader[sheet_name])
+    finally:
+        reader.close()
+    df, info = prepare_sheet(df, time.perf_counter() - start)
+    if entry is None:
+        return df, info
+    write_sidecar_sheet(entry, index, df, info)
+    return None, info
+
+# ============================================================================
+# SPECULATIVE PREFETCH
+# ============================================================================
+
+class PrefetchOwner:
+    """Stands for one browser session; its prefetch is withdrawn once it is garbage collected"""
+    __slots__ = ('__weakref__',)
+
+class WorkbookPrefetcher:
+    """Open workbooks and parse their first sheets on a background thread before they are asked for.
+
+    Each owner (a ``PrefetchOwner``) wants at most one workbook at a time;
+    wanting another, ``release`` or the owner being garbage collected
+    withdraws it, and a prefetch nobody wants is cancelled and dropped.
+    Workbooks already open, as reported with ``opened``, are not prefetched
+    again. ``take`` hands over a workbook, waiting only for its metadata if
+    the prefetch is running and not at all if it has not started; other
+    sheets load on demand as usual.
+    """
+
+    def __init__(self, workers=1, sheets=PREFETCH_SHEETS):
+        self.sheets = sheets
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='prefetch')
+        self._jobs = {}
+        self._wanted = {}
+        self._owners = {}
+        self._open = weakref.WeakValueDictionary()
+        # Owners collected since the last call; the finalizer may run while
+        # _lock is held, so it only queues them
+        self._expired = deque()
+        self._lock = threading.Lock()
+
+    def prefetch(self, filename, owner):
+        """Start opening filename for owner, withdrawing owner's previous prefetch"""
+        signature = file_signature(filename)
+        key = id(owner)
+        with self._lock:
+            self._expire()
+            if key not in self._owners:
+                self._owners[key] = weakref.finalize(owner, self._expired.append, key)
+            previous = self._wanted.get(key)
+            if previous == signature:
+                return
+            self._wanted[key] = signature
+            self._withdraw(previous, key)
+            if signature in self._open:
+                # Already held by the shared cache
+                return
+
+            job = self._jobs.get(signature)
+            if job is None:
+                job = {'workbook': Future(), 'cancel': threading.Event(), 'owners': set()}
+                job['task'] = self._executor.submit(self._run, filename, job)
+                self._jobs[signature] = job
+            job['owners'].add(key)
+
+    def release(self, owner):
+        """Withdraw owner's prefetch, e.g. once its workbook came from the shared cache"""
+        with self._lock:
+            self._expire()
+            key = id(owner)
+            self._withdraw(self._wanted.pop(key, None), key)
+
+    def opened(self, workbook):
+        """Note that workbook is open elsewhere, so its file is not prefetched while it is alive"""
+        with self._lock:
+            self._open[(workbook.path, workbook.size, workbook.mtime)] = workbook
+
+    def take(self, filename):
+        """Return the prefetched Workbook for filename's current version, or None"""
+        signature = file_signature(filename)
+        with self._lock:
+            self._expire()
+            job = self._jobs.pop(signature, None)
+            for key, wanted in list(self._wanted.items()):
+                if wanted == signature:
+                    del self._wanted[key]
+        if job is None:
+            return None
+        if job['task'].cancel():
+            # Still queued behind another prefetch; opening it directly is quicker
+            return None
+        try:
+            return job['workbook'].result()
+        except Exception:
+            # Reopened by the caller, which reports the error
+            return None
+
+    def pending(self):
+        """Return the signatures of the prefetches not yet taken"""
+        with self._lock:
+            self._expire()
+            return list(self._jobs)
+
+    def _expire(self):
+        while self._expired:
+            key = self._expired.popleft()
+            self._owners.pop(key, None)
+            self._withdraw(self._wanted.pop(key, None), key)
+
+    def _withdraw(self, signature, key):
+        job = self._jobs.get(signature)
+        if job is None:
+            return
+        job['owners'].discard(key)
+        if not job['owners']:
+            job['cancel'].set()
+            job['task'].cancel()
+            del self._jobs[signature]
+
+    def _run(self, filename, job):
+        cancel = job['cancel']
+        if cancel.is_set():
+            return
+        try:
+            workbook = Workbook(filename)
+        except Exception as e:
+            job['workbook'].set_exception(e)
+            return
+        job['workbook'].set_result(workbook)
+        for sheet_name in workbook.sheet_names[:self.sheets]:
+            if cancel.is_set():
+                break
+            try:
+                workbook.sheet(sheet_name)
+            except Exception:
+                # Reported when the sheet is opened for real
+                continue
+        workbook.close()
+
+# ============================================================================
+# INGEST COMMAND
+# ============================================================================
+
+def _ingest_one(filename):
+    """Warm the sidecar for one workbook and report what happened"""
+    start = time.perf_counter()
+    workbook = Workbook(filename)
+    # Files are already spread across processes, so sheets load serially
+    workbook.load_all(workers=1)
+    sources = set(workbook.sources.values())
+    return {
+        'file': filename,
+        'source': sources.pop() if len(sources) == 1 else 'mixed',
+        'sheets': len(workbook.sheets),
+        'skipped': len(workbook.skipped),
+        'seconds': time.perf_counter() - start,
+    }
+
+def ingest(root='.', workers=None):
+    """Warm the sidecar cache for every workbook under root in parallel"""
+    root = Path(root)
+    workbooks = [
+        str(root / name) for name in list_library_files(root)
+        if excel_engine(name) is not None
+    ]
+    results = []
+    if not workbooks:
+        return results
+    workers = workers or min(len(workbooks), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_ingest_one, name): name for name in workbooks}
+        for future in as_completed(futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append({'file': futures[future], 'error': str(e)})
+    return results
+
+def benchmark(filename):
+    """Time and trace peak Python memory of the pandas and streaming parsers"""
+    report = {}
+    for label, parser in (('pandas', parse_workbook), ('streamed', stream_workbook)):
+        tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            result = parser(filename)
+        finally:
+            seconds = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        report[label] = {
+            'seconds': seconds,
+            'peak_mb': peak / 1024 / 1024,
+            'timings': result.timings,
+        }
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    ingest_parser = subparsers.add_parser('ingest', help='Warm the sidecar cache for all workbooks')
+    ingest_parser.add_argument('--root', default='.', help='Library directory to scan')
+    ingest_parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    benchmark_parser = subparsers.add_parser('benchmark', help='Compare the pandas and streaming parsers on an .xlsx file')
+    benchmark_parser.add_argument('file', help='Workbook to parse')
+    args = parser.parse_args(argv)
+
+    if args.command == 'benchmark':
+        for label, stats in benchmark(args.file).items():
+            print(f"{label:<9}{stats['seconds']:.2f}s total, {stats['peak_mb']:.1f} MB peak")
+            for sheet_name, seconds in stats['timings'].items():
+                print(f"    {sheet_name}: {seconds:.3f}s")
+        return 0
+
+    if not PYARROW_AVAILABLE:
+        print("pyarrow is required for the sidecar cache: pip install pyarrow", file=sys.stderr)
+        return 1
+
+    failed = 0
+    for result in ingest(args.root, args.workers):
+        if 'error' in result:
+            failed += 1
+            print(f"FAILED  {result['file']}: {result['error']}")
+        else:
+            print(f"{result['source']:<8}{result['file']} "
+                  f"({result['sheets']} sheets, {result['seconds']:.2f}s)")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
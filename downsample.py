@@ -0,0 +1,88 @@
+"""Point reduction for long chart series in the Research Portal.
+
+Both methods pick a subset of the original points, returned as sorted
+positions into the series, so the points plotted are real observations:
+
+- ``lttb`` (Largest-Triangle-Three-Buckets) keeps the overall shape,
+  choosing from each bucket the point that forms the largest triangle
+  with its neighbours' picks.
+- ``minmax`` keeps the lowest and highest point of every bucket, so no
+  peak or trough is lost.
+
+The first and last points are always kept so the axis range is unchanged.
+"""
+import numpy as np
+import pandas as pd
+
+METHODS = {'LTTB': 'lttb', 'Min/Max per bucket': 'minmax'}
+
+def _numeric_x(x):
+    """Return x as float positions LTTB can measure areas with"""
+    x = pd.Series(x)
+    if pd.api.types.is_datetime64_any_dtype(x):
+        return x.astype('int64').to_numpy(dtype=float)
+    if pd.api.types.is_numeric_dtype(x) and not pd.api.types.is_bool_dtype(x):
+        return x.to_numpy(dtype=float)
+    # Text or categorical axes are evenly spaced
+    return np.arange(len(x), dtype=float)
+
+def lttb(x, y, n_out):
+    """Return positions of n_out points chosen by Largest-Triangle-Three-Buckets"""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = _numeric_x(x)
+    y = np.asarray(y, dtype=float)
+
+    # First and last points are always kept; the rest split into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    picks = np.empty(n_out, dtype=np.int64)
+    picks[0], picks[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_start, next_end = end, edges[bucket + 2]
+        else:
+            next_start, next_end = n - 1, n
+        next_x = x[next_start:next_end].mean()
+        next_y = y[next_start:next_end].mean()
+        area = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(area))
+        picks[bucket + 1] = previous
+    return picks
+
+def minmax(x, y, n_out):
+    """Return positions of the first and last points and each bucket's minimum and maximum"""
+    n = len(y)
+    buckets = (n_out - 2) // 2
+    if n_out >= n or buckets < 1:
+        return np.arange(n)
+    y = np.asarray(y, dtype=float)
+
+    size = -(-n // buckets)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    lows = offsets + np.argmin(np.where(np.isnan(padded), np.inf, padded), axis=1)
+    highs = offsets + np.argmax(np.where(np.isnan(padded), -np.inf, padded), axis=1)
+    picks = np.unique(np.concatenate([[0], lows, highs, [n - 1]]))
+    return picks[picks < n]
+
+def downsample(x, y, n_out, method='lttb'):
+    """Return sorted positions of at most n_out points of (x, y), keeping all when short.
+
+    Missing y values are dropped first, since they cannot be ranked.
+    """
+    y = np.asarray(y, dtype=float)
+    if len(y) <= n_out:
+        return np.arange(len(y))
+    present = np.flatnonzero(~np.isnan(y))
+    if len(present) <= n_out:
+        return present
+    picks = (lttb if method == 'lttb' else minmax)(np.asarray(x)[present], y[present], n_out)
+    return present[picks]
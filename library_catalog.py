@@ -0,0 +1,359 @@
+"""Persistent catalog of the Research Library's files.
+
+For every library file under a root folder, subfolders included, the
+catalog keeps its size, mtime and content hash, plus the sheet names and
+row counts of a workbook or the page count of a PDF. It is stored in
+SQLite next to the other caches, so after a restart only files that
+changed are read again.
+
+A watcher thread keeps the catalog current. It reacts to filesystem
+events through watchdog when that is installed, and otherwise rescans
+with ``stat`` only every ``RESEARCH_PORTAL_CATALOG_POLL_SECONDS``. With
+watchdog it still rescans every ``RESEARCH_PORTAL_CATALOG_RESCAN_SECONDS``
+to pick up events the observer dropped. Changed
+files are described on the same thread. Readers get an in-memory snapshot,
+so listing the library never touches the filesystem:
+
+    python library_catalog.py [--root .]
+
+brings the catalog up to date and prints it.
+"""
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+from data_loader import (
+    CACHE_DIR, SKIPPED_DIRS, Workbook, excel_engine, is_visible, library_extensions, walk_library
+)
+from pdf_library import page_count
+
+WATCHDOG_AVAILABLE = importlib.util.find_spec('watchdog') is not None
+
+CATALOG_PATH = CACHE_DIR / 'catalog.sqlite3'
+CATALOG_VERSION = 1
+POLL_SECONDS = float(os.environ.get('RESEARCH_PORTAL_CATALOG_POLL_SECONDS', '5'))
+RESCAN_SECONDS = float(os.environ.get('RESEARCH_PORTAL_CATALOG_RESCAN_SECONDS', '300'))
+
+# Bursts of events (a copy in progress, a folder moved in) are handled together
+EVENT_SETTLE_SECONDS = 0.5
+HASH_CHUNK_BYTES = 1024 * 1024
+
+def content_hash(path):
+    """Return the SHA-1 of a file's contents, read in chunks"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def describe_file(path):
+    """Return the hash and contents summary of one library file.
+
+    Workbooks report sheet -> row count (from sheet dimensions until a sheet
+    is parsed) and their total rows; PDFs report their page count.
+    """
+    details = {'sha1': content_hash(path), 'sheets': None, 'rows': None, 'pages': None, 'error': None}
+    try:
+        if excel_engine(path) is not None:
+            workbook = Workbook(path)
+            details['sheets'] = {name: sheet['rows'] or 0 for name, sheet in workbook.sheets.items()}
+            details['rows'] = sum(details['sheets'].values())
+            workbook.close()
+        elif Path(path).suffix.lower() == '.pdf':
+            details['pages'] = page_count(path)
+    except Exception as e:
+        details['error'] = str(e)
+    return details
+
+class LibraryCatalog:
+    """The library files under a root folder, kept current by a watcher thread.
+
+    ``files()`` and ``entry()`` read an in-memory snapshot. Entries carry
+    name, size, mtime (ns) and, once described, sha1, sheets, rows, pages
+    and error; fields not yet described are None.
+    """
+
+    def __init__(self, root='.'):
+        self.root = Path(root).resolve()
+        self.version = 0
+        self._entries = {}
+        self._undescribed = set()
+        self._pending = set()
+        self._rescan = False
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._observer = None
+        self._load()
+
+    def files(self):
+        """Return the relative paths of every library file, sorted"""
+        return sorted(self._entries)
+
+    def entry(self, name):
+        """Return the catalog entry for a relative path, or None"""
+        return self._entries.get(name)
+
+    def start(self):
+        """Scan once now, then keep the catalog current in the background"""
+        self.scan()
+        if self._thread is not None:
+            return
+        if WATCHDOG_AVAILABLE:
+            try:
+                self._observer = self._watch()
+            except Exception:
+                # Out of inotify watches, or an unsupported file system
+                self._observer = None
+        self._thread = threading.Thread(target=self._run, name='library-catalog', daemon=True)
+        self._thread.start()
+        # Describe what the first scan found
+        self._wake.set()
+
+    def stop(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer = None
+
+    def scan(self):
+        """Bring the file list up to date with one stat-only walk of the library"""
+        found = {name: stat for name, stat in walk_library(self.root)}
+        with self._lock:
+            entries = dict(self._entries)
+            for name in set(entries) - set(found):
+                self._remove(entries, name)
+            for name, stat in found.items():
+                self._update(entries, name, stat)
+            self._publish(entries)
+
+    def refresh(self):
+        """Describe every new or changed file now, waiting for the work to finish"""
+        self.scan()
+        self._describe_pending()
+
+    # ------------------------------------------------------------------
+    # Watching
+    # ------------------------------------------------------------------
+
+    def _watch(self):
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+
+        catalog = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.event_type in ('opened', 'closed_no_write'):
+                    return
+                catalog._notify(event)
+
+        observer = Observer()
+        observer.daemon = True
+        observer.schedule(Handler(), str(self.root), recursive=True)
+        observer.start()
+        return observer
+
+    def _notify(self, event):
+        """Queue the library paths an event touched; folder changes trigger a rescan"""
+        paths = [event.src_path, getattr(event, 'dest_path', '')]
+        queued = False
+        for path in filter(None, paths):
+            try:
+                parts = Path(os.fsdecode(path)).relative_to(self.root).parts
+            except ValueError:
+                continue
+            if not parts or any(not is_visible(part) for part in parts) or parts[0] in SKIPPED_DIRS:
+                continue
+            if event.is_directory:
+                if event.event_type in ('created', 'deleted', 'moved'):
+                    self._rescan = True
+                    queued = True
+            elif parts[-1].lower().endswith(tuple(library_extensions())):
+                with self._lock:
+                    self._pending.add('/'.join(parts))
+                queued = True
+        if queued:
+            self._wake.set()
+
+    def _run(self):
+        while True:
+            # Without watchdog every wake-up is a rescan; with it, a slow timed
+            # rescan catches events the observer dropped (e.g. a full queue)
+            woken = self._wake.wait(timeout=RESCAN_SECONDS if self._observer else POLL_SECONDS)
+            if woken:
+                time.sleep(EVENT_SETTLE_SECONDS)
+            self._wake.clear()
+            try:
+                if self._observer is None or self._rescan or not woken:
+                    self._rescan = False
+                    self._pending.clear()
+                    self.scan()
+                else:
+                    with self._lock:
+                        pending, self._pending = self._pending, set()
+                        entries = dict(self._entries)
+                        for name in pending:
+                            try:
+                                self._update(entries, name, os.stat(self.root / name))
+                            except OSError:
+                                self._remove(entries, name)
+                        self._publish(entries)
+                self._describe_pending(interruptible=True)
+            except Exception:
+                # Keep watching; the next event or poll retries
+                pass
+
+    # ------------------------------------------------------------------
+    # Entries
+    # ------------------------------------------------------------------
+
+    # Entries are replaced, never mutated, so readers can use a snapshot
+    # without locking; writers edit a copy and publish it in one step.
+
+    def _update(self, entries, name, stat):
+        """Record a file's size and mtime, queueing it to be described if it changed"""
+        current = entries.get(name)
+        if current is not None and (current['size'], current['mtime']) == (stat.st_size, stat.st_mtime_ns):
+            return
+        entries[name] = {
+            'name': name, 'size': stat.st_size, 'mtime': stat.st_mtime_ns,
+            'sha1': None, 'sheets': None, 'rows': None, 'pages': None, 'error': None,
+        }
+        self._undescribed.add(name)
+
+    def _remove(self, entries, name):
+        if entries.pop(name, None) is not None:
+            self._undescribed.discard(name)
+            self._delete_row(name)
+
+    def _publish(self, entries):
+        if entries != self._entries:
+            self._entries = entries
+            self.version += 1
+
+    def _describe_pending(self, interruptible=False):
+        """Hash and summarise undescribed files, newest first, saving each as it is done"""
+        while self._undescribed:
+            with self._lock:
+                entries = self._entries
+                batch = sorted(self._undescribed, key=lambda name: -entries[name]['mtime'])
+            for name in batch:
+                if interruptible and self._wake.is_set():
+                    return
+                entry = self._entries.get(name)
+                if name not in self._undescribed or entry is None:
+                    continue
+                try:
+                    details = describe_file(self.root / name)
+                except OSError:
+                    # Gone or unreadable; the next scan settles which
+                    with self._lock:
+                        self._undescribed.discard(name)
+                    continue
+                with self._lock:
+                    if self._entries.get(name) is not entry:
+                        # Changed again while it was being read, and queued again
+                        continue
+                    self._undescribed.discard(name)
+                    self._entries = {**self._entries, name: {**entry, **details}}
+                    self.version += 1
+                    self._save_row(self._entries[name])
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def _connect(self):
+        CATALOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(CATALOG_PATH, timeout=30)
+        if db.execute('PRAGMA user_version').fetchone()[0] != CATALOG_VERSION:
+            db.executescript(f"""
+                DROP TABLE IF EXISTS files;
+                CREATE TABLE files (
+                    root TEXT, name TEXT, size INTEGER, mtime INTEGER, sha1 TEXT,
+                    sheets TEXT, rows INTEGER, pages INTEGER, error TEXT,
+                    PRIMARY KEY (root, name)
+                );
+                PRAGMA user_version = {CATALOG_VERSION};
+            """)
+        return db
+
+    def _load(self):
+        """Read the entries saved for this root; only described files are saved"""
+        try:
+            db = self._connect()
+        except sqlite3.Error:
+            return
+        try:
+            rows = db.execute(
+                'SELECT name, size, mtime, sha1, sheets, rows, pages, error FROM files WHERE root = ?',
+                (str(self.root),)
+            ).fetchall()
+        finally:
+            db.close()
+        self._entries = {
+            name: {
+                'name': name, 'size': size, 'mtime': mtime, 'sha1': sha1,
+                'sheets': json.loads(sheets) if sheets else None,
+                'rows': rows, 'pages': pages, 'error': error,
+            }
+            for name, size, mtime, sha1, sheets, rows, pages, error in rows
+        }
+
+    def _execute(self, sql, parameters):
+        try:
+            db = self._connect()
+        except sqlite3.Error:
+            return
+        try:
+            with db:
+                db.execute(sql, parameters)
+        except sqlite3.Error:
+            pass
+        finally:
+            db.close()
+
+    def _save_row(self, entry):
+        self._execute(
+            'INSERT OR REPLACE INTO files (root, name, size, mtime, sha1, sheets, rows, pages, error) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (str(self.root), entry['name'], entry['size'], entry['mtime'], entry['sha1'],
+             json.dumps(entry['sheets']) if entry['sheets'] is not None else None,
+             entry['rows'], entry['pages'], entry['error'])
+        )
+
+    def _delete_row(self, name):
+        self._execute('DELETE FROM files WHERE root = ? AND name = ?', (str(self.root), name))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--root', default='.', help='Library directory to scan')
+    args = parser.parse_args(argv)
+
+    catalog = LibraryCatalog(args.root)
+    start = time.perf_counter()
+    catalog.refresh()
+    for name in catalog.files():
+        entry = catalog.entry(name)
+        if entry['sha1'] is None:
+            contents = 'could not be read'
+        elif entry['error']:
+            contents = f"error: {entry['error']}"
+        elif entry['sheets'] is not None:
+            contents = f"{len(entry['sheets'])} sheets, {entry['rows']:,} rows"
+        else:
+            contents = f"{entry['pages']} pages" if entry['pages'] is not None else ''
+        digest = entry['sha1'][:12] if entry['sha1'] else '-' * 12
+        print(f"{digest}  {entry['size'] / 1024 / 1024:8.2f} MB  {name}  {contents}")
+    print(f"{len(catalog.files())} files in {time.perf_counter() - start:.2f}s")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
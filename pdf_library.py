@@ -0,0 +1,508 @@
+"""PDF handling for the Research Portal.
+
+PDFs are served to the browser by URL rather than inlined into the page.
+``publish_pdf`` places a link (or copy) of each PDF under the app's
+``static/`` folder, which Streamlit serves at ``app/static/`` when
+``server.enableStaticServing`` is on. The static route answers HTTP range
+requests, so the browser's PDF viewer can fetch just the pages it shows.
+
+Page text is extracted once per version of a file and kept in the on-disk
+cache, one file per page. Pages not yet cached are extracted in the shared
+worker process pool and yielded as they finish; the app extracts the pages
+it shows right away and leaves the rest of the file to a background job.
+
+Pages can also be rasterized for browsers without a PDF viewer. Page
+images are rendered on demand at a chosen DPI, in the background for
+neighbouring pages, and kept under ``static/`` (so they are fetched by
+URL) within an LRU size limit.
+
+The text of every PDF in the library is also kept in a SQLite FTS5
+full-text index, refreshed only for files added, changed or removed since
+the last update. The app refreshes it on a background thread from the
+library catalog's listing; it can also be brought up to date from the
+command line:
+
+    python pdf_library.py index [--root .]
+"""
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from urllib.parse import quote
+
+from data_loader import (
+    CACHE_DIR, _replace_atomically, discard_parse_pool, file_signature, parse_pool, walk_library
+)
+
+PYPDF2_AVAILABLE = importlib.util.find_spec('PyPDF2') is not None
+PDF2IMAGE_AVAILABLE = importlib.util.find_spec('pdf2image') is not None
+
+PDF_CACHE_VERSION = 1
+EXTRACT_WORKERS = int(os.environ.get('RESEARCH_PORTAL_PARSE_WORKERS', '0')) or os.cpu_count() or 1
+
+# Pages are handed to workers in chunks so each opens the PDF once per chunk;
+# below PARALLEL_MIN_PAGES missing pages, extraction stays in-process.
+PAGES_PER_TASK = 8
+PARALLEL_MIN_PAGES = 48
+
+SEARCH_INDEX_PATH = CACHE_DIR / 'pdf' / 'search.sqlite3'
+SEARCH_INDEX_VERSION = 1
+
+# Snippet highlight markers, unlikely to occur in extracted text
+MATCH_START, MATCH_END = '\x02', '\x03'
+
+STATIC_DIR = Path(__file__).resolve().parent / 'static'
+PUBLISHED_PDF_DIR = STATIC_DIR / 'pdf'
+PAGE_IMAGE_DIR = STATIC_DIR / 'pdf-pages'
+
+# Rendered page images are evicted least recently viewed first beyond this size
+PAGE_IMAGE_CACHE_BYTES = int(float(os.environ.get('RESEARCH_PORTAL_PAGE_IMAGE_CACHE_MB', '512')) * 1024 * 1024)
+PAGE_IMAGE_WORKERS = 2
+
+# Streamlit refuses to serve app static files larger than this
+MAX_STATIC_BYTES = 200 * 1024 * 1024
+
+def publish_pdf(filename):
+    """Make a PDF available under the static folder and return its URL path.
+
+    Each version of a file gets its own directory, keyed by path hash, size
+    and mtime, so browsers never see stale cached bytes; older versions are
+    removed. Returns None when the file is too large for the static route.
+    """
+    path, size, mtime = file_signature(filename)
+    if size > MAX_STATIC_BYTES:
+        return None
+
+    key = hashlib.sha1(path.encode('utf-8')).hexdigest()[:16]
+    version = f"{key}-{size}-{mtime}"
+    target = PUBLISHED_PDF_DIR / version / Path(path).name
+    if not target.exists():
+        def write(tmp_path):
+            # A hard link costs no space; fall back to a copy across file systems
+            try:
+                os.link(path, tmp_path)
+            except OSError:
+                shutil.copyfile(path, tmp_path)
+        _replace_atomically(target, write)
+        for stale in PUBLISHED_PDF_DIR.glob(f"{key}-*"):
+            if stale.is_dir() and stale.name != version:
+                shutil.rmtree(stale, ignore_errors=True)
+
+    return f"app/static/pdf/{version}/{quote(target.name)}"
+
+def pdf_cache_dir(path, size, mtime):
+    """Return the cache directory for one version of a PDF"""
+    path_key = hashlib.sha1(str(path).encode('utf-8')).hexdigest()[:16]
+    return CACHE_DIR / 'pdf' / path_key / f"v{PDF_CACHE_VERSION}-{size}-{mtime}"
+
+def _page_file(entry, page):
+    return entry / 'text' / f"{page:05d}.txt"
+
+def _read_page(entry, page):
+    try:
+        return _page_file(entry, page).read_text(encoding='utf-8')
+    except OSError:
+        return None
+
+def _write_page(entry, page, text):
+    try:
+        _replace_atomically(_page_file(entry, page), lambda tmp: tmp.write_text(text, encoding='utf-8'))
+    except OSError:
+        pass
+
+def page_count(filename):
+    """Return the number of pages in a PDF, cached per version of the file"""
+    path, size, mtime = file_signature(filename)
+    entry = pdf_cache_dir(path, size, mtime)
+    try:
+        return json.loads((entry / 'meta.json').read_text(encoding='utf-8'))['pages']
+    except (OSError, ValueError, KeyError):
+        pass
+
+    if PYPDF2_AVAILABLE:
+        import PyPDF2
+
+        pages = len(PyPDF2.PdfReader(path).pages)
+    else:
+        from pdf2image import pdfinfo_from_path
+
+        pages = int(pdfinfo_from_path(path)['Pages'])
+    try:
+        _replace_atomically(entry / 'meta.json', lambda tmp: tmp.write_text(json.dumps({'pages': pages}), encoding='utf-8'))
+        for stale in entry.parent.iterdir():
+            if stale.is_dir() and stale != entry:
+                shutil.rmtree(stale, ignore_errors=True)
+    except OSError:
+        pass
+    return pages
+
+def _extract_pages(path, entry, pages):
+    """Extract and cache the text of pages (1-based), returning (page, text) pairs"""
+    import PyPDF2
+
+    reader = PyPDF2.PdfReader(path)
+    results = []
+    for page in pages:
+        try:
+            text = reader.pages[page - 1].extract_text() or ''
+        except Exception as e:
+            # One unreadable page should not lose the rest of the chunk
+            results.append((page, f"[Could not extract text: {e}]"))
+            continue
+        _write_page(entry, page, text)
+        results.append((page, text))
+    return results
+
+def extract_text(filename, pages=None, workers=None):
+    """Yield (page, text) for pages of a PDF (all by default), cached pages first.
+
+    The rest are extracted in chunks, in parallel when there are enough of
+    them, and yielded in completion order. Pages are 1-based and are
+    extracted in the order given, so callers can put the pages they show
+    first. A worker that is abandoned still caches what it extracts.
+    """
+    path, size, mtime = file_signature(filename)
+    entry = pdf_cache_dir(path, size, mtime)
+    if pages is None:
+        pages = range(1, page_count(filename) + 1)
+
+    missing = []
+    for page in pages:
+        text = _read_page(entry, page)
+        if text is None:
+            missing.append(page)
+        else:
+            yield page, text
+    if not missing:
+        return
+
+    workers = workers or EXTRACT_WORKERS
+    if workers > 1 and len(missing) >= PARALLEL_MIN_PAGES:
+        done = set()
+        executor = parse_pool()
+        try:
+            chunks = [missing[i:i + PAGES_PER_TASK] for i in range(0, len(missing), PAGES_PER_TASK)]
+            futures = [executor.submit(_extract_pages, path, entry, chunk) for chunk in chunks]
+            for future in as_completed(futures):
+                for page, text in future.result():
+                    done.add(page)
+                    yield page, text
+            return
+        except BrokenProcessPool:
+            discard_parse_pool(executor)
+        # Finish in-process, picking up pages workers cached before the pool broke
+        remaining = []
+        for page in missing:
+            if page in done:
+                continue
+            text = _read_page(entry, page)
+            if text is None:
+                remaining.append(page)
+            else:
+                yield page, text
+        missing = remaining
+
+    for i in range(0, len(missing), PAGES_PER_TASK):
+        yield from _extract_pages(path, entry, missing[i:i + PAGES_PER_TASK])
+
+def page_header(page):
+    """Return the banner separating pages in extracted text"""
+    return f"{'=' * 60}\nPAGE {page}\n{'=' * 60}\n\n"
+
+def document_text(filename):
+    """Return the text of every page, in page order, separated by page banners"""
+    texts = dict(extract_text(filename))
+    return ''.join(f"\n{page_header(page)}{texts[page]}\n" for page in sorted(texts))
+
+_text_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pdf-text')
+_text_jobs = {}
+_text_lock = threading.Lock()
+
+def cached_pages(filename):
+    """Return how many pages of a PDF have their text in the cache"""
+    path, size, mtime = file_signature(filename)
+    try:
+        return sum(1 for _ in (pdf_cache_dir(path, size, mtime) / 'text').glob('*.txt'))
+    except OSError:
+        return 0
+
+def _extract_all(filename):
+    """Extract and cache the text of every page, returning the page count"""
+    return sum(1 for _ in extract_text(filename))
+
+def start_text_extraction(filename):
+    """Extract the text of a whole PDF in the background, once per version of the file.
+
+    Returns the future of the extraction, or None when every page is cached.
+    """
+    path, size, mtime = file_signature(filename)
+    entry = pdf_cache_dir(path, size, mtime)
+    with _text_lock:
+        job = _text_jobs.get(entry)
+        if job is not None:
+            return job
+        if cached_pages(filename) >= page_count(filename):
+            return None
+        job = _text_pool.submit(_extract_all, filename)
+        _text_jobs[entry] = job
+        return job
+
+# ============================================================================
+# PAGE IMAGES
+# ============================================================================
+
+_image_pool = ThreadPoolExecutor(max_workers=PAGE_IMAGE_WORKERS, thread_name_prefix='pdf-page')
+_image_jobs = {}
+_image_lock = threading.Lock()
+
+def _page_image_file(filename, page, dpi):
+    """Return where the image of a page at dpi is kept, and its URL path"""
+    path, size, mtime = file_signature(filename)
+    version = f"{hashlib.sha1(path.encode('utf-8')).hexdigest()[:16]}-{size}-{mtime}"
+    return path, PAGE_IMAGE_DIR / version / f"{dpi}-{page:05d}.png", f"app/static/pdf-pages/{version}/{dpi}-{page:05d}.png"
+
+def _render_page(path, target, page, dpi):
+    """Rasterize one page to target, then trim the cache back under its size limit"""
+    if target.exists():
+        return target
+    from pdf2image import convert_from_path
+
+    images = convert_from_path(path, dpi=dpi, first_page=page, last_page=page)
+    _replace_atomically(target, lambda tmp: images[0].save(tmp, format='PNG'))
+    _trim_page_images()
+    return target
+
+def _trim_page_images():
+    """Delete the least recently viewed page images until the cache fits its limit"""
+    images = []
+    for image in PAGE_IMAGE_DIR.glob('*/*.png'):
+        try:
+            stat = image.stat()
+        except OSError:
+            continue
+        images.append((stat.st_mtime, stat.st_size, image))
+    total = sum(size for _, size, _ in images)
+    for _, size, image in sorted(images):
+        if total <= PAGE_IMAGE_CACHE_BYTES:
+            break
+        try:
+            image.unlink()
+            total -= size
+        except OSError:
+            pass
+
+def _submit_page(filename, page, dpi):
+    path, target, _ = _page_image_file(filename, page, dpi)
+    with _image_lock:
+        job = _image_jobs.get(target)
+        if job is None or job.done():
+            job = _image_pool.submit(_render_page, path, target, page, dpi)
+            _image_jobs[target] = job
+            job.add_done_callback(lambda _: _forget_job(target))
+        return job
+
+def _forget_job(target):
+    with _image_lock:
+        _image_jobs.pop(target, None)
+
+def page_image(filename, page, dpi=100):
+    """Return (image path, URL path) for a rendered page, rendering it if needed.
+
+    Viewing a cached image marks it recently used for the cache's LRU limit.
+    """
+    _, target, url = _page_image_file(filename, page, dpi)
+    if target.exists():
+        try:
+            os.utime(target)
+        except OSError:
+            pass
+    else:
+        _submit_page(filename, page, dpi).result()
+    return target, url
+
+def prefetch_page_images(filename, pages, dpi=100):
+    """Render pages in the background if they are not cached or already rendering"""
+    for page in pages:
+        _, target, _ = _page_image_file(filename, page, dpi)
+        if not target.exists():
+            _submit_page(filename, page, dpi)
+
+# ============================================================================
+# LIBRARY SEARCH INDEX
+# ============================================================================
+
+_index_lock = threading.Lock()
+
+def _connect_index():
+    """Open the search index, creating it (or rebuilding an outdated one) as needed"""
+    SEARCH_INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
+    db = sqlite3.connect(SEARCH_INDEX_PATH, timeout=30)
+    if db.execute('PRAGMA user_version').fetchone()[0] != SEARCH_INDEX_VERSION:
+        db.executescript(f"""
+            DROP TABLE IF EXISTS documents;
+            DROP TABLE IF EXISTS pages;
+            CREATE TABLE documents (path TEXT PRIMARY KEY, name TEXT, size INTEGER, mtime INTEGER, pages INTEGER);
+            CREATE VIRTUAL TABLE pages USING fts5(path UNINDEXED, name UNINDEXED, page UNINDEXED, text);
+            PRAGMA user_version = {SEARCH_INDEX_VERSION};
+        """)
+    return db
+
+def library_pdfs(root='.'):
+    """Return (path, size, mtime) for every PDF under root, read from disk"""
+    return [
+        (str((Path(root) / name).resolve()), stat.st_size, stat.st_mtime_ns)
+        for name, stat in walk_library(root, ['.pdf'])
+    ]
+
+def stale_pdfs(root='.', pdfs=None):
+    """Return (path, size, mtime) of library PDFs missing from or outdated in the index.
+
+    pdfs lists the library's PDFs as (path, size, mtime); by default root
+    is walked for them.
+    """
+    if pdfs is None:
+        pdfs = library_pdfs(root)
+    db = _connect_index()
+    try:
+        indexed = {path: (size, mtime) for path, size, mtime in db.execute('SELECT path, size, mtime FROM documents')}
+    finally:
+        db.close()
+    return [(path, size, mtime) for path, size, mtime in pdfs if indexed.get(path) != (size, mtime)]
+
+def update_search_index(root='.', progress=None, pdfs=None):
+    """Bring the index up to date with the PDFs under root.
+
+    Only new or changed files are (re)indexed, from the page text cache
+    where possible, and files no longer in the library are dropped. pdfs
+    is as for ``stale_pdfs``. progress, if given, is called as
+    progress(done, total, path). Returns (indexed files, removed files).
+    """
+    with _index_lock:
+        if pdfs is None:
+            pdfs = library_pdfs(root)
+        stale = stale_pdfs(root, pdfs)
+        present = {path for path, _, _ in pdfs}
+
+        db = _connect_index()
+        try:
+            indexed = 0
+            for number, (path, size, mtime) in enumerate(stale):
+                if progress:
+                    progress(number, len(stale), path)
+                try:
+                    texts = dict(extract_text(path))
+                except Exception:
+                    # Unreadable PDFs are retried on the next update
+                    continue
+                name = Path(path).name
+                with db:
+                    db.execute('DELETE FROM pages WHERE path = ?', (path,))
+                    db.executemany(
+                        'INSERT INTO pages (path, name, page, text) VALUES (?, ?, ?, ?)',
+                        [(path, name, page, text) for page, text in sorted(texts.items())]
+                    )
+                    db.execute(
+                        'INSERT OR REPLACE INTO documents (path, name, size, mtime, pages) VALUES (?, ?, ?, ?, ?)',
+                        (path, name, size, mtime, len(texts))
+                    )
+                indexed += 1
+
+            root_path = str(Path(root).resolve())
+            removed = [
+                path for (path,) in db.execute('SELECT path FROM documents')
+                if Path(path).is_relative_to(root_path) and path not in present
+            ]
+            with db:
+                for path in removed:
+                    db.execute('DELETE FROM pages WHERE path = ?', (path,))
+                    db.execute('DELETE FROM documents WHERE path = ?', (path,))
+        finally:
+            db.close()
+    return indexed, len(removed)
+
+_index_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pdf-index')
+_index_update = (None, None)
+_index_update_lock = threading.Lock()
+
+def refresh_search_index(root, pdfs, version):
+    """Update the index in the background for one version of the library listing.
+
+    Returns the future of the update for version, starting it unless one
+    was already started. An update still queued for an older version is
+    dropped. A failed update is not retried until the version changes.
+    """
+    global _index_update
+    with _index_update_lock:
+        key = (str(root), version)
+        previous_key, job = _index_update
+        if previous_key == key:
+            return job
+        if job is not None:
+            job.cancel()
+        job = _index_pool.submit(update_search_index, root, None, pdfs)
+        _index_update = (key, job)
+        return job
+
+def _match_expression(query):
+    """Turn free text into an FTS5 query: all words, the last one as a prefix.
+
+    A query in double quotes is matched as a phrase instead.
+    """
+    words = re.findall(r'\w+', query)
+    if not words:
+        return None
+    if query.strip().startswith('"') and query.strip().endswith('"') and len(query.strip()) > 1:
+        return '"' + ' '.join(words) + '"'
+    return ' '.join(f'"{word}"' for word in words[:-1]) + f' "{words[-1]}"*'
+
+def search_pdfs(query, limit=50):
+    """Return up to limit hits for query as dicts of path, name, page and snippet, best first.
+
+    Matched words in the snippet are wrapped in MATCH_START / MATCH_END.
+    """
+    expression = _match_expression(query)
+    if expression is None or not SEARCH_INDEX_PATH.exists():
+        return []
+    db = _connect_index()
+    try:
+        rows = db.execute(
+            "SELECT path, name, page, snippet(pages, 3, ?, ?, '…', 16) FROM pages "
+            "WHERE pages MATCH ? ORDER BY rank LIMIT ?",
+            (MATCH_START, MATCH_END, expression, limit)
+        ).fetchall()
+    finally:
+        db.close()
+    return [
+        {'path': path, 'name': name, 'page': int(page), 'snippet': ' '.join(snippet.split())}
+        for path, name, page, snippet in rows
+    ]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    index_parser = subparsers.add_parser('index', help='Bring the PDF search index up to date')
+    index_parser.add_argument('--root', default='.', help='Library directory to scan')
+    args = parser.parse_args(argv)
+
+    if not PYPDF2_AVAILABLE:
+        print("PyPDF2 is required to index PDFs: pip install PyPDF2", file=sys.stderr)
+        return 1
+
+    indexed, removed = update_search_index(
+        args.root,
+        progress=lambda done, total, path: print(f"[{done + 1}/{total}] {path}")
+    )
+    print(f"{indexed} indexed, {removed} removed")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
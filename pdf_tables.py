@@ -0,0 +1,303 @@
+"""Tables extracted from PDFs for the Research Portal data explorer.
+
+Each version of a PDF is scanned for tables once, on a background thread,
+and every table found is stored as an Arrow sheet in the PDF's on-disk
+cache. ``PdfTables`` then presents them like a ``Workbook``, one sheet per
+table, so the filter, search and chart pipeline works on them unchanged.
+
+Tables are read with pdfplumber when it is installed. Otherwise they are
+recovered from the cached page text: runs of lines that each end in the
+same number of numeric cells, with the line above as the header when it
+has enough words.
+"""
+import importlib.util
+import json
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from data_loader import (
+    COMPACT_DTYPES, PYARROW_AVAILABLE, _column_names, _replace_atomically, file_signature, prepare_sheet,
+    read_sidecar_sheet, write_sidecar_sheet
+)
+from pdf_library import PYPDF2_AVAILABLE, extract_text, pdf_cache_dir
+from sheet_index import SheetIndex
+
+PDFPLUMBER_AVAILABLE = importlib.util.find_spec('pdfplumber') is not None
+
+# Tables are only handed to the explorer through the Arrow cache
+TABLE_EXTRACTION_AVAILABLE = PYARROW_AVAILABLE and (PDFPLUMBER_AVAILABLE or PYPDF2_AVAILABLE)
+
+TABLES_VERSION = 1
+
+# A table recovered from plain text needs this many rows, so prose is not mistaken for one
+MIN_TEXT_ROWS = 3
+
+# One numeric cell: 1,02,314  -12.5  (300)  3.31%  (3%)  or a dash / NA for a blank
+NUMERIC_CELL = re.compile(r'^(?:\(?[-+–]?\d[\d,]*(?:\.\d+)?%?\)?|[-–—]|NA|N/A|nm|NM)$')
+BLANK_CELLS = frozenset(['', '-', '–', '—', 'NA', 'N/A', 'nm', 'NM'])
+
+def tables_dir(path, size, mtime):
+    """Return where the tables of one version of a PDF are cached"""
+    return pdf_cache_dir(path, size, mtime) / 'tables'
+
+def _read_metadata(entry):
+    try:
+        metadata = json.loads((entry / 'metadata.json').read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+    if metadata.get('version') != TABLES_VERSION or metadata.get('compact_dtypes') != COMPACT_DTYPES:
+        return None
+    return metadata
+
+def _number(cell):
+    """Return a numeric cell as a float, None for a blank, or the text unchanged"""
+    text = cell.strip().replace(',', '')
+    if text in BLANK_CELLS:
+        return None
+    negative = text.startswith('(') and text.endswith(')')
+    try:
+        value = float(text.strip('()').rstrip('%').replace('–', '-'))
+    except ValueError:
+        return cell
+    return -value if negative else value
+
+def table_frame(header, rows):
+    """Build a DataFrame from text cells, turning all-numeric columns into numbers.
+
+    Commas are dropped, bracketed values are negative, and columns whose
+    values all end in % are parsed as numbers with '(%)' added to the name.
+    """
+    width = max(len(header), *(len(row) for row in rows))
+    header = [(' '.join(str(name).split()) or None) if name is not None else None for name in header]
+    header += [None] * (width - len(header))
+    columns = {}
+    for number, name in enumerate(_column_names(header)):
+        cells = [' '.join(str(row[number]).split()) if number < len(row) and row[number] is not None else '' for row in rows]
+        values = [_number(cell) for cell in cells]
+        present = [cell for cell in cells if cell not in BLANK_CELLS]
+        if present and all(value is None or isinstance(value, float) for value in values):
+            if all(cell.endswith('%') for cell in present):
+                name = f"{name} (%)"
+            columns[name] = pd.Series(values, dtype='float64')
+        else:
+            columns[name] = pd.Series([cell or None for cell in cells], dtype=object)
+    return pd.DataFrame(columns)
+
+def _plumber_tables(path):
+    """Yield (page, header, rows, seconds) for the tables pdfplumber finds"""
+    import pdfplumber
+
+    with pdfplumber.open(path) as pdf:
+        for page_number, page in enumerate(pdf.pages, start=1):
+            start = time.perf_counter()
+            tables = page.extract_tables()
+            seconds = time.perf_counter() - start
+            for table in tables:
+                table = [row for row in table if any(cell not in (None, '') for cell in row)]
+                if len(table) > 2 and max(len(row) for row in table) > 1:
+                    yield page_number, table[0], table[1:], seconds / len(tables)
+
+def _split_row(line):
+    """Split a line into (label, numeric cells), or None if it ends in fewer than two"""
+    tokens = line.split()
+    cells = []
+    while tokens and NUMERIC_CELL.match(tokens[-1]):
+        cells.insert(0, tokens.pop())
+    if len(cells) < 2:
+        return None
+    return ' '.join(tokens), cells
+
+def _text_tables(filename):
+    """Yield (page, header, rows, seconds) for numeric tables recovered from page text"""
+    texts = dict(extract_text(filename))
+    for page in sorted(texts):
+        start = time.perf_counter()
+        lines = [line.strip() for line in texts[page].splitlines() if line.strip()]
+        found = []
+        i = 0
+        while i < len(lines):
+            row = _split_row(lines[i])
+            if row is None:
+                i += 1
+                continue
+            width = len(row[1])
+            run = [row]
+            j = i + 1
+            while j < len(lines):
+                row = _split_row(lines[j])
+                if row is None or len(row[1]) != width:
+                    break
+                run.append(row)
+                j += 1
+            if len(run) >= MIN_TEXT_ROWS:
+                # The line above names the columns when it has a word for each
+                words = lines[i - 1].split() if i > 0 and _split_row(lines[i - 1]) is None else []
+                if width <= len(words) <= width + 6:
+                    header = [' '.join(words[:-width]) or 'Item'] + words[-width:]
+                else:
+                    header = ['Item'] + [f"Column {n}" for n in range(1, width + 1)]
+                found.append((header, [[label or None] + cells for label, cells in run]))
+            i = j
+        seconds = time.perf_counter() - start
+        for header, rows in found:
+            yield page, header, rows, seconds / len(found)
+
+def _scan_tables(filename, path, entry):
+    """Find the tables in a PDF and write each as an Arrow sheet; returns (sheets, skipped)"""
+    sheets = {}
+    skipped = []
+    found = _plumber_tables(path) if PDFPLUMBER_AVAILABLE else _text_tables(filename)
+    per_page = {}
+    for page, header, rows, seconds in found:
+        per_page[page] = per_page.get(page, 0) + 1
+        sheet_name = f"Page {page} Table {per_page[page]}"
+        try:
+            df, info = prepare_sheet(table_frame(header, rows), seconds)
+            index = len(sheets)
+            write_sidecar_sheet(entry, index, df, info)
+        except Exception as e:
+            skipped.append(f"Could not load table '{sheet_name}': {str(e)}")
+            continue
+        sheets[sheet_name] = {
+            'index': index,
+            'page': page,
+            'rows': len(df),
+            'rows_estimated': False,
+            'columns': [str(column) for column in df.columns],
+        }
+    return sheets, skipped
+
+def _extract_and_cache(filename, path, entry):
+    """Scan a PDF for tables and return the metadata, also saved in its cache.
+
+    A scan that fails is saved with its error, so it is not repeated for
+    this version of the file unless a retry is asked for.
+    """
+    metadata = {
+        'version': TABLES_VERSION,
+        'compact_dtypes': COMPACT_DTYPES,
+        'method': 'pdfplumber' if PDFPLUMBER_AVAILABLE else 'text',
+        'sheets': {},
+        'skipped': [],
+    }
+    try:
+        metadata['sheets'], metadata['skipped'] = _scan_tables(filename, path, entry)
+    except Exception as e:
+        metadata['error'] = str(e) or type(e).__name__
+    try:
+        _replace_atomically(
+            entry / 'metadata.json',
+            lambda tmp: tmp.write_text(json.dumps(metadata), encoding='utf-8')
+        )
+        for stale in entry.parent.parent.iterdir():
+            if stale.is_dir() and stale != entry.parent:
+                shutil.rmtree(stale, ignore_errors=True)
+    except OSError:
+        # Still returned through the scan's future until the process restarts
+        pass
+    return metadata
+
+_table_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pdf-tables')
+_table_jobs = {}
+_table_lock = threading.Lock()
+
+def table_metadata(filename):
+    """Return the cached table metadata for a PDF, or None if it has not been scanned.
+
+    The metadata of a failed scan has an 'error' message and no sheets.
+    """
+    path, size, mtime = file_signature(filename)
+    return _read_metadata(tables_dir(path, size, mtime))
+
+def start_table_extraction(filename, retry=False):
+    """Scan a PDF for tables in the background unless it is cached or already scanned.
+
+    Returns the future for the scan, or None when the tables are cached. A
+    failed scan is only repeated when the file changes or retry is set.
+    """
+    path, size, mtime = file_signature(filename)
+    entry = tables_dir(path, size, mtime)
+    with _table_lock:
+        job = _table_jobs.get(entry)
+        if job is not None and not (retry and job.done()):
+            return job
+        metadata = _read_metadata(entry)
+        if metadata is not None and not (retry and metadata.get('error')):
+            return None
+        job = _table_pool.submit(_extract_and_cache, filename, path, entry)
+        _table_jobs[entry] = job
+        return job
+
+def extract_tables(filename):
+    """Return the table metadata for a PDF, waiting for the background scan if needed"""
+    job = start_table_extraction(filename)
+    return job.result() if job is not None else table_metadata(filename)
+
+class PdfTables:
+    """The tables of a PDF as a read-only Workbook of sheets, one per table.
+
+    Opening waits for the table scan if it has not finished; sheets are then
+    memory-mapped from the Arrow cache on first access.
+    """
+
+    def __init__(self, filename):
+        self.path, self.size, self.mtime = file_signature(filename)
+        metadata = extract_tables(filename)
+        if metadata.get('error'):
+            raise ValueError(metadata['error'])
+        self.sheets = metadata['sheets']
+        self.skipped = metadata['skipped']
+        self.timings = {}
+        self.sources = {}
+        self.compaction = {}
+        self._entry = tables_dir(self.path, self.size, self.mtime)
+        self._frames = {}
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    @property
+    def sheet_names(self):
+        return list(self.sheets)
+
+    def is_loaded(self, sheet_name):
+        return sheet_name in self._frames
+
+    def sheet(self, sheet_name):
+        """Return a table's DataFrame, reading it from the cache on first access"""
+        if sheet_name in self._frames:
+            return self._frames[sheet_name]
+        if sheet_name not in self.sheets:
+            raise KeyError(sheet_name)
+        with self._lock:
+            if sheet_name not in self._frames:
+                cached = read_sidecar_sheet(self._entry, self.sheets[sheet_name]['index'])
+                if cached is None:
+                    raise KeyError(f"Table '{sheet_name}' is missing from the cache")
+                df, info = cached
+                self.timings[sheet_name] = info.get('parse_seconds', 0.0)
+                if 'compaction' in info:
+                    self.compaction[sheet_name] = info['compaction']
+                self.sources[sheet_name] = 'sidecar'
+                self._frames[sheet_name] = df
+            return self._frames[sheet_name]
+
+    def index(self, sheet_name):
+        """Return the shared SheetIndex over a table"""
+        df = self.sheet(sheet_name)
+        index = self._indexes.get(sheet_name)
+        if index is None:
+            index = self._indexes.setdefault(sheet_name, SheetIndex(df))
+        return index
+
+    def load_all(self, workers=None):
+        """Read every table that has not been loaded yet"""
+        for sheet_name in self.sheet_names:
+            self.sheet(sheet_name)
+
+    def close(self):
+        """Tables hold no open files; kept for parity with Workbook"""
@@ -0,0 +1,215 @@
+"""On-demand CPU and memory profiling of one script run.
+
+``RunProfiler`` samples the stack of the thread running the script every
+``RESEARCH_PORTAL_PROFILE_INTERVAL_MS`` from a background thread, and
+traces allocations with tracemalloc over the same stretch. ``stop()``
+returns a ``ProfileReport`` with
+
+- the samples as collapsed stacks, one ``frame;frame;frame count`` line per
+  distinct stack, which flamegraph.pl and speedscope read;
+- a self-contained HTML flame graph of them;
+- the lines that allocated the most memory still held when it stopped.
+
+tracemalloc is process-wide, so only one run is profiled at a time, and a
+profile is stopped on its own after ``MAX_PROFILE_SECONDS``.
+"""
+import html
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import zlib
+from collections import Counter
+
+SAMPLE_INTERVAL = float(os.environ.get('RESEARCH_PORTAL_PROFILE_INTERVAL_MS', '5')) / 1000
+MAX_PROFILE_SECONDS = 120
+TRACEMALLOC_FRAMES = 10
+TOP_ALLOCATIONS = 25
+
+# Flame graph boxes narrower than this share of the samples are left out
+MIN_FLAME_SHARE = 0.002
+
+_active = threading.Lock()
+
+def frame_label(code):
+    """Return 'function (file:line)' for a code object, safe to join with ';'"""
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(';', ',')
+
+class ProfileReport:
+    """What a RunProfiler recorded: stack samples and allocation differences"""
+
+    def __init__(self, seconds, stacks, allocations, peak_bytes, interval):
+        self.seconds = seconds
+        self.stacks = stacks
+        self.allocations = allocations
+        self.peak_bytes = peak_bytes
+        self.interval = interval
+
+    @property
+    def samples(self):
+        return sum(self.stacks.values())
+
+    def collapsed(self):
+        """Return the samples as collapsed stacks, heaviest first"""
+        lines = [f"{stack} {count}" for stack, count in Counter(self.stacks).most_common()]
+        return '\n'.join(lines) + '\n'
+
+    def allocation_rows(self, limit=TOP_ALLOCATIONS):
+        """Return the top allocations as dicts: KB held, blocks, line, and the caller in this app"""
+        app_dir = os.path.dirname(os.path.abspath(__file__))
+        rows = []
+        for stat in self.allocations[:limit]:
+            frames = list(stat.traceback)
+            # Frames run from the oldest to the most recent
+            innermost = frames[-1]
+            caller = next((frame for frame in reversed(frames) if frame.filename.startswith(app_dir)), None)
+            rows.append({
+                'kb': stat.size_diff / 1024,
+                'blocks': stat.count_diff,
+                'line': f"{innermost.filename}:{innermost.lineno}",
+                'from': f"{os.path.basename(caller.filename)}:{caller.lineno}" if caller else '',
+            })
+        return rows
+
+    def allocations_text(self):
+        """Return the top allocations with their tracebacks as plain text"""
+        lines = [
+            f"Top {min(len(self.allocations), TOP_ALLOCATIONS)} allocations still held at the end of the run",
+            f"Peak traced memory: {self.peak_bytes / 1024 / 1024:.1f} MB",
+            '',
+        ]
+        for number, stat in enumerate(self.allocations[:TOP_ALLOCATIONS], start=1):
+            lines.append(f"#{number}: {stat.size_diff / 1024:+,.1f} KB in {stat.count_diff:+,} blocks")
+            lines.extend(stat.traceback.format(most_recent_first=True))
+            lines.append('')
+        return '\n'.join(lines)
+
+    def flamegraph_html(self, title='Profile'):
+        """Return a self-contained HTML flame graph of the samples, callers above callees"""
+        root = {'count': 0, 'children': {}}
+        for stack, count in self.stacks.items():
+            root['count'] += count
+            node = root
+            for name in stack.split(';'):
+                node = node['children'].setdefault(name, {'count': 0, 'children': {}})
+                node['count'] += count
+        total = root['count'] or 1
+        per_sample_ms = self.interval * 1000
+
+        def render(name, node, parent_count):
+            hue = zlib.crc32(name.encode('utf-8')) % 50
+            share = node['count'] / total
+            tip = f"{name}\n{node['count']:,} samples, {share:.1%}, ~{node['count'] * per_sample_ms:,.0f} ms"
+            children = ''.join(
+                render(child_name, child, node['count'])
+                for child_name, child in sorted(node['children'].items(), key=lambda item: -item[1]['count'])
+                if child['count'] / total >= MIN_FLAME_SHARE
+            )
+            return (
+                f"<div class='node' style='width:{node['count'] / parent_count * 100:.3f}%'>"
+                f"<div class='box' style='background:hsl({hue},85%,62%)' title='{html.escape(tip, quote=True)}'>"
+                f"{html.escape(name)}</div><div class='children'>{children}</div></div>"
+            )
+
+        body = ''.join(
+            render(name, node, total)
+            for name, node in sorted(root['children'].items(), key=lambda item: -item[1]['count'])
+            if node['count'] / total >= MIN_FLAME_SHARE
+        )
+        return f"""<!DOCTYPE html>
+<html><head><meta charset='utf-8'><title>{html.escape(title)}</title>
+<style>
+body {{ font-family: sans-serif; margin: 16px; }}
+.children {{ display: flex; }}
+.node {{ box-sizing: border-box; }}
+.box {{ height: 18px; font: 11px monospace; line-height: 18px; overflow: hidden; white-space: nowrap;
+        text-overflow: ellipsis; border: 1px solid #fff; padding: 0 3px; cursor: default; }}
+.box:hover {{ filter: brightness(0.85); }}
+</style></head><body>
+<h3>{html.escape(title)}</h3>
+<p>{self.samples:,} samples every {per_sample_ms:g} ms over {self.seconds:.2f} s ·
+peak traced memory {self.peak_bytes / 1024 / 1024:.1f} MB · hover a frame for details</p>
+<div class='children'>{body}</div>
+</body></html>
+"""
+
+class RunProfiler:
+    """Samples the stack of the thread that started it and traces its allocations"""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.report = None
+        self._stacks = Counter()
+        self._labels = {}
+        self._thread_id = None
+        self._sampler = None
+        self._stopping = threading.Event()
+        self._finish_lock = threading.Lock()
+        self._started_tracing = False
+        self._baseline = None
+        self._start = None
+
+    def start(self):
+        """Start profiling the calling thread; returns False if another run is being profiled"""
+        if not _active.acquire(blocking=False):
+            return False
+        self._thread_id = threading.get_ident()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._started_tracing = True
+        tracemalloc.reset_peak()
+        self._baseline = tracemalloc.take_snapshot()
+        self._start = time.perf_counter()
+        self._sampler = threading.Thread(target=self._sample, name='profiler', daemon=True)
+        self._sampler.start()
+        return True
+
+    def stop(self):
+        """Stop profiling and return the ProfileReport"""
+        self._stopping.set()
+        if self._sampler is not threading.current_thread():
+            self._sampler.join()
+        return self._finish()
+
+    def _sample(self):
+        deadline = time.perf_counter() + MAX_PROFILE_SECONDS
+        while not self._stopping.wait(self.interval):
+            if time.perf_counter() > deadline:
+                # Abandoned, e.g. the session closed mid-run; free tracemalloc for others
+                self.stop()
+                return
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                label = self._labels.get(code)
+                if label is None:
+                    label = self._labels[code] = frame_label(code)
+                stack.append(label)
+                frame = frame.f_back
+            if stack:
+                self._stacks[';'.join(reversed(stack))] += 1
+
+    def _finish(self):
+        with self._finish_lock:
+            if self.report is not None:
+                return self.report
+            seconds = time.perf_counter() - self._start
+            try:
+                snapshot = tracemalloc.take_snapshot()
+                peak = tracemalloc.get_traced_memory()[1]
+                if self._started_tracing:
+                    tracemalloc.stop()
+            finally:
+                _active.release()
+            ignored = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+            allocations = [
+                stat for stat in snapshot.filter_traces(ignored).compare_to(
+                    self._baseline.filter_traces(ignored), 'traceback'
+                )
+                if stat.size_diff > 0
+            ]
+            self.report = ProfileReport(seconds, dict(self._stacks), allocations, peak, self.interval)
+            return self.report
@@ -0,0 +1,237 @@
+"""Per-sheet lookup structures for the Research Portal data view.
+
+A ``SheetIndex`` is built over one loaded sheet and shared by every
+session viewing it. Its column indexes are built the first time a column
+is filtered on and reused until the sheet itself is reloaded.
+"""
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+class ColumnIndex:
+    """Inverted index from each distinct value of a column to its row positions"""
+
+    def __init__(self, series):
+        codes, uniques = pd.factorize(series, sort=False)
+        self.codes = codes
+        self.uniques = uniques
+        self.values = list(uniques.tolist())
+        self.code_of = {value: code for code, value in enumerate(self.values)}
+
+        # A stable sort groups equal codes while keeping row order, so each
+        # value's positions come out already sorted.
+        dtype = np.int32 if len(codes) < 2 ** 31 else np.int64
+        order = np.argsort(codes, kind='stable').astype(dtype)
+        counts = np.bincount(codes[codes >= 0], minlength=len(self.values))
+        missing = int((codes < 0).sum())
+        bounds = np.concatenate(([0], np.cumsum(counts))) + missing
+        self.positions = [order[bounds[i]:bounds[i + 1]] for i in range(len(self.values))]
+        self._catalog = None
+        self._text = None
+
+    @property
+    def text(self):
+        """Lower-cased text of each distinct value, rendered as ``astype(str)`` would"""
+        if self._text is None:
+            self._text = [text.lower() for text in pd.Series(self.uniques).astype(str)]
+        return self._text
+
+    def rows_for_codes(self, codes):
+        """Return the sorted positions of rows holding any of the given value codes"""
+        if not len(codes):
+            return np.empty(0, dtype=np.int64)
+        if len(codes) == 1:
+            return self.positions[codes[0]]
+        return np.sort(np.concatenate([self.positions[code] for code in codes]))
+
+    def rows(self, values):
+        """Return the sorted positions of rows holding any of values"""
+        # Positions of different values never overlap, so a sort is a union
+        return self.rows_for_codes([self.code_of[value] for value in values if value in self.code_of])
+
+    def catalog(self):
+        """Return the sorted distinct non-null values and their row counts.
+
+        Computed once per column and reused until the sheet is reloaded.
+        """
+        if self._catalog is None:
+            values = sorted(self.values)
+            self._catalog = (
+                values,
+                {value: len(self.positions[self.code_of[value]]) for value in values},
+            )
+        return self._catalog
+
+    def distinct(self, positions=None):
+        """Return the sorted distinct non-null values, optionally within a row set"""
+        return self.value_counts(positions)[0]
+
+    def value_counts(self, positions=None):
+        """Return sorted distinct values and a value -> row count map.
+
+        Without positions this is the cached catalog; with them, counts are
+        taken over those rows only and values absent from them are left out.
+        """
+        if positions is None:
+            return self.catalog()
+        codes = self.codes[positions]
+        counts = np.bincount(codes[codes >= 0], minlength=len(self.values))
+        present = {self.values[code]: int(counts[code]) for code in np.flatnonzero(counts)}
+        return sorted(present), present
+
+# column:value terms; quote either side to include spaces, e.g. "industry theme":energy
+SCOPED_TERM = re.compile(r'(?:"([^"]+)"|([^\s:"]+)):(?:"([^"]*)"|(\S+))')
+
+class SearchIndex:
+    """Trigram index over the distinct text values of every column of a sheet.
+
+    Searching works on distinct values rather than rows, narrowed by
+    trigram postings, and maps the values that contain the query back to
+    rows through their column indexes.
+    """
+
+    def __init__(self, sheet_index, columns):
+        self._sheet_index = sheet_index
+        self.columns = list(columns)
+        self._entry_column = []
+        self._entry_code = []
+        self._entry_text = []
+        postings = {}
+        for column_number, column in enumerate(self.columns):
+            for code, text in enumerate(sheet_index.column(column).text):
+                entry = len(self._entry_text)
+                self._entry_column.append(column_number)
+                self._entry_code.append(code)
+                self._entry_text.append(text)
+                for gram in {text[i:i + 3] for i in range(len(text) - 2)}:
+                    postings.setdefault(gram, []).append(entry)
+        self._postings = {gram: np.array(entries, dtype=np.int64) for gram, entries in postings.items()}
+        self._column_number = {str(column).lower(): i for i, column in enumerate(self.columns)}
+
+    def search(self, query):
+        """Return sorted positions of rows matching query, or None for an empty query.
+
+        Free text matches rows where any column contains it (case-insensitive);
+        each ``column:value`` term must match within that column. Terms whose
+        column is unknown are treated as free text.
+        """
+        scoped = []
+        free_text = query
+        for match in SCOPED_TERM.finditer(query):
+            column_name = (match.group(1) or match.group(2)).lower()
+            if column_name in self._column_number:
+                scoped.append((self._column_number[column_name], match.group(3) or match.group(4) or ''))
+                free_text = free_text.replace(match.group(0), ' ', 1)
+        free_text = free_text.strip()
+
+        row_sets = [self._match(value, column_number) for column_number, value in scoped if value]
+        if free_text:
+            row_sets.append(self._match(free_text))
+        if not row_sets:
+            return None
+        row_sets.sort(key=len)
+        positions = row_sets[0]
+        for other in row_sets[1:]:
+            positions = np.intersect1d(positions, other, assume_unique=True)
+        return positions
+
+    def _match(self, text, column_number=None):
+        """Return rows where a column (or the given one) contains text"""
+        text = text.lower()
+        if len(text) >= 3:
+            grams = {text[i:i + 3] for i in range(len(text) - 2)}
+            lists = [self._postings.get(gram) for gram in grams]
+            if any(entries is None for entries in lists):
+                return np.empty(0, dtype=np.int64)
+            lists.sort(key=len)
+            candidates = lists[0]
+            for entries in lists[1:]:
+                candidates = np.intersect1d(candidates, entries, assume_unique=True)
+        else:
+            candidates = range(len(self._entry_text))
+
+        codes_by_column = {}
+        for entry in candidates:
+            if column_number is not None and self._entry_column[entry] != column_number:
+                continue
+            if text in self._entry_text[entry]:
+                codes_by_column.setdefault(self._entry_column[entry], []).append(self._entry_code[entry])
+
+        row_sets = [
+            self._sheet_index.column(self.columns[number]).rows_for_codes(codes)
+            for number, codes in codes_by_column.items()
+        ]
+        if not row_sets:
+            return np.empty(0, dtype=np.int64)
+        if len(row_sets) == 1:
+            return row_sets[0]
+        return np.unique(np.concatenate(row_sets))
+
+class SheetIndex:
+    """Column indexes for one sheet, built lazily and safe to share between threads"""
+
+    def __init__(self, df):
+        self._df = df
+        self._columns = {}
+        self._search = None
+        self._lock = threading.Lock()
+
+    def column(self, column):
+        """Return the ColumnIndex for a column, building it on first use"""
+        index = self._columns.get(column)
+        if index is None:
+            with self._lock:
+                index = self._columns.get(column)
+                if index is None:
+                    index = ColumnIndex(self._df[column])
+                    self._columns[column] = index
+        return index
+
+    def rows(self, filters, within=None):
+        """Return sorted positions of rows matching every non-empty filter.
+
+        ``filters`` maps column to the values allowed in it; rows must match
+        one value in each column. Returns ``within`` (None meaning every row)
+        when no filter is set. Row sets are intersected smallest first.
+        """
+        row_sets = [
+            self.column(column).rows(values)
+            for column, values in filters.items() if values
+        ]
+        if within is not None:
+            row_sets.append(within)
+        if not row_sets:
+            return None
+        row_sets.sort(key=len)
+        positions = row_sets[0]
+        for other in row_sets[1:]:
+            if not len(positions):
+                break
+            positions = np.intersect1d(positions, other, assume_unique=True)
+        return positions
+
+    def search(self, query, within=None):
+        """Return sorted positions of rows matching a search query, within a row set.
+
+        The search index is built over every column on the first search.
+        Returns ``within`` unchanged for an empty query.
+        """
+        if self._search is None:
+            search_index = SearchIndex(self, self._df.columns)
+            with self._lock:
+                if self._search is None:
+                    self._search = search_index
+        positions = self._search.search(query)
+        if positions is None:
+            return within
+        if within is not None:
+            positions = np.intersect1d(positions, within, assume_unique=True)
+        return positions
+
+    def take(self, positions):
+        """Return the sheet restricted to positions (the whole sheet for None)"""
+        if positions is None:
+            return self._df
+        return self._df.take(positions)
@@ -0,0 +1,179 @@
+"""Stage timing for the Research Portal.
+
+``span`` times one stage of a rerun (a workbook load, a filter, a chart
+build) and records it with its tags, usually the file and sheet. Spans are
+
+- kept in memory for the admin panel: the most recent ones, and a window
+  of durations per stage for percentiles;
+- appended to a rotating JSONL log, one object per span;
+- summarised as Prometheus histograms, served as text on
+  ``RESEARCH_PORTAL_METRICS_PORT`` when it is set.
+
+This module imports nothing heavy, so it can be used before login.
+"""
+import json
+import logging
+import logging.handlers
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+
+SPAN_LOG_PATH = os.environ.get(
+    'RESEARCH_PORTAL_SPAN_LOG',
+    str(Path(os.environ.get('RESEARCH_PORTAL_CACHE_DIR', '.research_cache')) / 'spans.jsonl')
+)
+SPAN_LOG_BYTES = int(float(os.environ.get('RESEARCH_PORTAL_SPAN_LOG_MB', '10')) * 1024 * 1024)
+SPAN_LOG_BACKUPS = 5
+METRICS_PORT = int(os.environ.get('RESEARCH_PORTAL_METRICS_PORT', '0'))
+
+RECENT_SPANS = 500
+PERCENTILE_WINDOW = 1000
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def percentile(sorted_values, fraction):
+    """Return the nearest-rank percentile of already sorted values"""
+    if not sorted_values:
+        return None
+    count = len(sorted_values)
+    rank = max(0, min(count - 1, math.ceil(fraction * count) - 1))
+    return sorted_values[rank]
+
+class SpanRecorder:
+    """Collects finished spans from every session and thread of the process"""
+
+    def __init__(self, log_path=SPAN_LOG_PATH):
+        self._recent = deque(maxlen=RECENT_SPANS)
+        self._durations = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._log = self._open_log(log_path) if log_path else None
+
+    @staticmethod
+    def _open_log(log_path):
+        log = logging.getLogger('research_portal.spans')
+        log.propagate = False
+        log.setLevel(logging.INFO)
+        if not log.handlers:
+            try:
+                Path(log_path).parent.mkdir(parents=True, exist_ok=True)
+                handler = logging.handlers.RotatingFileHandler(
+                    log_path, maxBytes=SPAN_LOG_BYTES, backupCount=SPAN_LOG_BACKUPS, encoding='utf-8'
+                )
+            except OSError:
+                return None
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            log.addHandler(handler)
+        return log
+
+    def record(self, stage, seconds, tags, ok=True):
+        """Add one finished span"""
+        tags = {key: str(value) for key, value in tags.items() if value is not None}
+        entry = {'ts': time.time(), 'stage': stage, 'ms': round(seconds * 1000, 3), 'ok': ok, **tags}
+        label_key = (stage, tuple(sorted(tags.items())))
+        with self._lock:
+            self._recent.append(entry)
+            self._durations.setdefault(stage, deque(maxlen=PERCENTILE_WINDOW)).append(seconds)
+            histogram = self._histograms.get(label_key)
+            if histogram is None:
+                histogram = self._histograms[label_key] = {'buckets': [0] * len(BUCKETS), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    histogram['buckets'][i] += 1
+            histogram['sum'] += seconds
+            histogram['count'] += 1
+        if self._log is not None:
+            self._log.info(json.dumps(entry))
+
+    def recent(self, limit=50):
+        """Return the latest spans, newest first"""
+        with self._lock:
+            return list(self._recent)[-limit:][::-1]
+
+    def summary(self):
+        """Return per-stage count, last, p50, p90, p99 and max in ms over the recent window"""
+        with self._lock:
+            windows = {stage: list(durations) for stage, durations in self._durations.items()}
+        rows = []
+        for stage, durations in sorted(windows.items()):
+            ordered = sorted(durations)
+            rows.append({
+                'stage': stage,
+                'count': len(durations),
+                'last_ms': durations[-1] * 1000,
+                'p50_ms': percentile(ordered, 0.5) * 1000,
+                'p90_ms': percentile(ordered, 0.9) * 1000,
+                'p99_ms': percentile(ordered, 0.99) * 1000,
+                'max_ms': ordered[-1] * 1000,
+            })
+        return rows
+
+    def prometheus(self):
+        """Return every span histogram in the Prometheus text exposition format"""
+        name = 'research_portal_stage_seconds'
+        lines = [
+            f"# HELP {name} Time spent in each stage of a rerun.",
+            f"# TYPE {name} histogram",
+        ]
+        with self._lock:
+            histograms = {key: dict(value, buckets=list(value['buckets'])) for key, value in self._histograms.items()}
+        for (stage, tags), histogram in sorted(histograms.items()):
+            labels = ','.join(f'{key}="{_escape(value)}"' for key, value in (('stage', stage),) + tags)
+            for bound, count in zip(BUCKETS, histogram['buckets']):
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram["count"]}')
+            lines.append(f'{name}_sum{{{labels}}} {histogram["sum"]:.6f}')
+            lines.append(f'{name}_count{{{labels}}} {histogram["count"]}')
+        return '\n'.join(lines) + '\n'
+
+recorder = SpanRecorder()
+
+@contextmanager
+def span(stage, **tags):
+    """Time the enclosed block as one span of stage, tagged e.g. with file and sheet"""
+    start = time.perf_counter()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        recorder.record(stage, time.perf_counter() - start, tags, ok=ok)
+
+_metrics_server = None
+_metrics_lock = threading.Lock()
+
+def start_metrics_server(port=METRICS_PORT):
+    """Serve recorder.prometheus() at /metrics on port, once per process; returns the server"""
+    global _metrics_server
+    with _metrics_lock:
+        if _metrics_server is not None or not port:
+            return _metrics_server
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = recorder.prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        _metrics_server = ThreadingHTTPServer(('', port), MetricsHandler)
+        _metrics_server.daemon_threads = True
+        threading.Thread(target=_metrics_server.serve_forever, name='metrics', daemon=True).start()
+        return _metrics_server
@@ -0,0 +1,34 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# The app's modules live at the repository root rather than in a package
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import data_loader
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    """Point the sidecar cache at a temporary directory"""
+    directory = tmp_path / 'cache'
+    monkeypatch.setattr(data_loader, 'CACHE_DIR', directory)
+    return directory
+
+@pytest.fixture
+def make_workbook(tmp_path):
+    """Write an .xlsx from {sheet name: rows}, the first row being the header"""
+    import openpyxl
+
+    def make(sheets, name='book.xlsx'):
+        workbook = openpyxl.Workbook()
+        workbook.remove(workbook.active)
+        for sheet_name, rows in sheets.items():
+            worksheet = workbook.create_sheet(sheet_name)
+            for row in rows:
+                worksheet.append(row)
+        path = tmp_path / name
+        workbook.save(path)
+        return str(path)
+
+    return make
@@ -0,0 +1,125 @@
+from pathlib import Path
+
+import pytest
+
+st = pytest.importorskip('streamlit')
+from streamlit.testing.v1 import AppTest
+
+APP = str(Path(__file__).resolve().parent.parent / 'app.py')
+
+@pytest.fixture
+def library(tmp_path, monkeypatch, cache_dir, make_workbook):
+    """A library folder holding one workbook, used as the app's working directory"""
+    monkeypatch.setenv('RESEARCH_PORTAL_CACHE_DIR', str(cache_dir))
+    monkeypatch.chdir(tmp_path)
+    make_workbook({'Revenue': [['Company', 'Revenue'], ['Tata', 10], ['Infosys', 20]]})
+    # The library catalog and shared workbooks are cached per process
+    st.cache_resource.clear()
+    yield tmp_path
+    st.cache_resource.clear()
+
+def click(at, label):
+    next(button for button in at.button if label in button.label).click()
+    at.run()
+
+def explore(name):
+    """Run a new session that logs in and opens name in the data explorer"""
+    at = AppTest.from_file(APP, default_timeout=60)
+    at.run()
+    at.text_input(key='email_input').input('analyst@in.ey.com')
+    at.button[0].click()
+    at.run()
+    at.selectbox(key='file_selector').select(name)
+    at.run()
+    click(at, 'EXPLORE')
+    assert not at.exception
+    return at
+
+def view_data(at, sheet_name, filters):
+    """Choose filter columns for a sheet and open the data view"""
+    at.radio(key='filter_choice').set_value("Yes - configure custom filters")
+    at.run()
+    at.multiselect(key=f"filter_{sheet_name}").set_value(filters)
+    at.run()
+    click(at, 'VIEW DATA')
+    assert not at.exception
+    return at
+
+def shown(at):
+    """Return the rows drawn in the data table"""
+    return at.dataframe[0].value
+
+def metric(at, label):
+    return next(item.value for item in at.metric if item.label == label)
+
+def test_sessions_share_a_workbook_until_the_file_changes(library, make_workbook):
+    first = explore('book.xlsx').session_state.excel_data
+    second = explore('book.xlsx').session_state.excel_data
+
+    assert first is second
+
+    make_workbook({'Revenue': [['Company', 'Revenue'], ['Tata', 10], ['Infosys', 20], ['Wipro', 30]]})
+    changed = explore('book.xlsx').session_state.excel_data
+
+    assert changed is not first
+    assert changed.sheet('Revenue')['Company'].tolist() == ['Tata', 'Infosys', 'Wipro']
+
+@pytest.fixture
+def companies(library, make_workbook):
+    """120 companies, 40 in each of three sectors"""
+    sectors = ['IT', 'Banking', 'Steel']
+    rows = [[f"Company {i:03d}", sectors[i % 3], i] for i in range(120)]
+    make_workbook({'Data': [['Company', 'Sector', 'Revenue'], *rows]}, 'companies.xlsx')
+    return 'companies.xlsx'
+
+def test_filters_narrow_the_values_offered_by_later_filters(companies):
+    at = view_data(explore(companies), 'Data', ['Sector', 'Company'])
+    assert len(at.multiselect(key='active_filter_Data_Company').options) == 120
+
+    at.multiselect(key='active_filter_Data_Sector').set_value(['IT'])
+    at.run()
+
+    company = at.multiselect(key='active_filter_Data_Company')
+    assert len(company.options) == 40
+    assert company.options[0] == 'Company 000 (1)'
+    assert metric(at, 'Rows Displayed') == '40'
+
+    company.set_value(['Company 003', 'Company 004'])
+    at.run()
+
+    assert shown(at)['Company'].tolist() == ['Company 003']
+
+def test_scoped_search_within_filtered_rows(companies):
+    at = view_data(explore(companies), 'Data', ['Sector'])
+    at.multiselect(key='active_filter_Data_Sector').set_value(['Banking'])
+    at.run()
+
+    at.text_input(key='search_Data').input('company:"company 00"')
+    at.run()
+
+    assert at.info[0].value == 'Found 3 matching rows'
+    assert shown(at)['Company'].tolist() == ['Company 001', 'Company 004', 'Company 007']
+
+    at.text_input(key='search_Data').input('sector:it 00')
+    at.run()
+
+    assert shown(at)['Company'].tolist() == []
+
+def test_long_tables_send_one_page_of_rows(companies, monkeypatch):
+    monkeypatch.setenv('RESEARCH_PORTAL_PAGINATE_ROWS', '100')
+    at = view_data(explore(companies), 'Data', ['Sector'])
+    assert at.toggle(key='paginate_Data').value
+    assert len(shown(at)) == 100
+
+    at.number_input(key='page_Data').set_value(2)
+    at.run()
+
+    assert shown(at)['Company'].tolist()[0] == 'Company 100'
+    assert len(shown(at)) == 20
+
+    # Filtering leaves one page, so the table goes back to the first
+    at.multiselect(key='active_filter_Data_Sector').set_value(['IT'])
+    at.run()
+
+    assert at.number_input(key='page_Data').value == 1
+    assert len(shown(at)) == 40
@@ -0,0 +1,117 @@
+import threading
+import zipfile
+from types import SimpleNamespace
+
+import pytest
+
+from chart_export import FigureCache, ImageExporter, figure_key
+
+WORKBOOK = SimpleNamespace(path='/lib/book.xlsx', size=100, mtime=1)
+
+def key(workbook=WORKBOOK, filters=None, **settings):
+    chart = {
+        'time_col': 'Year', 'category_col': 'Company', 'value_cols': ['Revenue'], 'chart_type': 'Line Chart',
+        'selected_categories': ['Tata'], 'downsample_method': 'lttb', 'point_budget': 2400,
+    }
+    chart.update(settings)
+    return figure_key(workbook, 'Data', filters or {}, **chart)
+
+def test_figure_cache_evicts_the_least_recently_used():
+    cache = FigureCache(max_entries=2)
+    cache.put('a', 'figure a')
+    cache.put('b', 'figure b')
+    assert cache.get('a') == 'figure a'
+
+    cache.put('c', 'figure c')
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 'figure a'
+    assert cache.get('c') == 'figure c'
+
+def test_key_names_the_filters_regardless_of_order():
+    by_sector = key(filters={'Sector': ['IT'], 'Company': []})
+
+    assert by_sector == key(filters={'Sector': ['IT']})
+    assert by_sector != key()
+    assert by_sector != key(filters={'Sector': ['Banking']})
+    assert key(filters={'Sector': ['IT'], 'Region': ['North']}) == key(filters={'Region': ['North'], 'Sector': ['IT']})
+
+def test_key_changes_with_the_file_version():
+    assert key() == key(workbook=SimpleNamespace(path='/lib/book.xlsx', size=100, mtime=1))
+    assert key() != key(workbook=SimpleNamespace(path='/lib/book.xlsx', size=100, mtime=2))
+    assert key() != key(workbook=SimpleNamespace(path='/lib/book.xlsx', size=120, mtime=1))
+    assert key() != key(workbook=SimpleNamespace(path='/lib/other.xlsx', size=100, mtime=1))
+
+def test_key_changes_with_every_chart_setting():
+    assert key() != key(chart_type='Bar Chart')
+    assert key() != key(value_cols=['Revenue', 'Profit'])
+    assert key() != key(selected_categories=['Tata', 'Wipro'])
+    assert key() != key(downsample_method='minmax')
+    assert key() != key(point_budget=1200)
+    hash(key())
+
+class Figure:
+    """Stands in for a plotly figure, counting its renders"""
+
+    def __init__(self, name, release=None, fail=False):
+        self.name = name
+        self.renders = 0
+        self.release = release
+        self.fail = fail
+
+    def to_image(self, format):
+        self.renders += 1
+        if self.release is not None:
+            self.release.wait(5)
+        if self.fail:
+            raise RuntimeError('render failed')
+        return f"{self.name}.{format}".encode()
+
+@pytest.fixture
+def exporter():
+    exporter = ImageExporter(workers=2, max_entries=2)
+    yield exporter
+    exporter._executor.shutdown(wait=True)
+
+def test_renders_once_per_key_and_format(exporter):
+    fig = Figure('sales')
+
+    assert exporter.render('k', fig, 'png') == b'sales.png'
+    assert exporter.render('k', fig, 'png') == b'sales.png'
+    assert exporter.render('k', fig, 'svg') == b'sales.svg'
+    assert fig.renders == 2
+
+def test_failed_renders_are_retried(exporter):
+    fig = Figure('sales', fail=True)
+    with pytest.raises(RuntimeError):
+        exporter.render('k', fig, 'png')
+
+    fig.fail = False
+
+    assert exporter.render('k', fig, 'png') == b'sales.png'
+    assert fig.renders == 2
+
+def test_only_finished_renders_are_evicted(exporter):
+    release = threading.Event()
+    running = Figure('running', release=release)
+    job = exporter.submit('running', running, 'png')
+    first = Figure('a')
+    exporter.render('a', first, 'png')
+
+    exporter.render('b', Figure('b'), 'png')
+    exporter.render('c', Figure('c'), 'png')
+
+    assert exporter.submit('running', running, 'png') is job
+    release.set()
+    assert job.result(5) == b'running.png'
+    assert running.renders == 1
+    exporter.render('a', first, 'png')
+    assert first.renders == 2
+
+def test_render_zip_names_charts_in_order(exporter):
+    charts = [('k1', 'Revenue by year', Figure('one')), ('k2', 'Profit / margin', Figure('two'))]
+
+    archive = zipfile.ZipFile(exporter.render_zip(charts, 'svg'))
+
+    assert archive.namelist() == ['01_Revenue_by_year.svg', '02_Profit_margin.svg']
+    assert archive.read('02_Profit_margin.svg') == b'two.svg'
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+from data_loader import compact_dtypes
+
+def compact(values):
+    df, report = compact_dtypes(pd.DataFrame({'column': values}))
+    return df['column'], report
+
+def test_day_first_dates_parse_consistently():
+    dates, _ = compact(['13/07/2025', '05/07/2025', '21/07/2025', '01/08/2025'])
+
+    assert dates.tolist() == [
+        pd.Timestamp('2025-07-13'), pd.Timestamp('2025-07-05'),
+        pd.Timestamp('2025-07-21'), pd.Timestamp('2025-08-01'),
+    ]
+
+def test_day_first_settled_by_a_later_value():
+    dates, _ = compact(['05/07/2025', '13/07/2025', None])
+
+    assert dates.tolist()[:2] == [pd.Timestamp('2025-07-05'), pd.Timestamp('2025-07-13')]
+    assert pd.isna(dates.iloc[2])
+
+def test_ambiguous_dates_stay_text():
+    values = ['05/07/2025', '01/08/2025', '03/04/2025', '05/07/2025']
+    dates, report = compact(values)
+
+    assert not pd.api.types.is_datetime64_any_dtype(dates)
+    assert dates.astype(str).tolist() == values
+
+def test_mixed_date_formats_stay_text():
+    values = ['2025-07-13', '13/07/2025', '2025-07-21']
+    dates, _ = compact(values)
+
+    assert dates.astype(str).tolist() == values
+
+def test_iso_dates_parse():
+    dates, report = compact(['2025-07-13', '2025-01-02'])
+
+    assert dates.tolist() == [pd.Timestamp('2025-07-13'), pd.Timestamp('2025-01-02')]
+    assert 'column' in report['changes']
+
+def test_repetitive_text_becomes_category():
+    values = ['Banking', 'IT', 'Banking', 'IT'] * 50
+    sectors, _ = compact(values)
+
+    assert isinstance(sectors.dtype, pd.CategoricalDtype)
+    assert sectors.tolist() == values
+
+def test_numbers_shrink_without_changing_values():
+    df = pd.DataFrame({
+        'small': np.array([1, 2, 3], dtype='int64'),
+        'whole': [1.0, 2.0, 3.0],
+        'half': [0.5, 1.25, None],
+        'precise': [0.1, 0.2, 0.3],
+    })
+    original = df.copy()
+
+    df, report = compact_dtypes(df)
+
+    assert df['small'].dtype == np.int8
+    assert df['whole'].dtype == np.int8
+    assert df['half'].dtype == np.float32
+    assert df['precise'].dtype == np.float64
+    for column in original:
+        assert df[column].astype('float64').equals(original[column].astype('float64'))
+    assert report['memory_after'] < report['memory_before']
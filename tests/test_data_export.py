@@ -0,0 +1,99 @@
+import datetime
+import io
+
+import openpyxl
+import pandas as pd
+import pytest
+
+import data_export
+from data_export import csv_export, parquet_export, xlsx_export
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({
+        'Company': ['Tata', 'Infosys', 'Wipro', 'HCL', 'ITC'],
+        'Sector': pd.Categorical(['Auto', 'IT', 'IT', 'IT', 'FMCG']),
+        'Revenue': [1.5, 2.0, None, 4.25, 5.0],
+        'Listed': pd.to_datetime(['2001-01-02', '2002-03-04', None, '2004-05-06', '2005-06-07']),
+        'Opens': [datetime.time(9, 15), datetime.time(9, 30), None, datetime.time(10, 0), datetime.time(9, 15)],
+    })
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(data_export, 'CHUNK_ROWS', 2)
+
+def test_csv_matches_pandas(frame):
+    assert csv_export(frame).getvalue().decode('utf-8') == frame.to_csv(index=False)
+
+def test_parquet_round_trips_object_columns(frame):
+    pytest.importorskip('pyarrow')
+
+    result = pd.read_parquet(parquet_export(frame))
+
+    assert result['Opens'].tolist() == frame['Opens'].tolist()
+    assert result['Company'].tolist() == frame['Company'].tolist()
+    pd.testing.assert_series_equal(result['Revenue'], frame['Revenue'])
+    assert result['Listed'].tolist() == frame['Listed'].tolist()
+
+def test_parquet_types_column_empty_in_first_chunk():
+    pytest.importorskip('pyarrow')
+    df = pd.DataFrame({'Note': [None, None, None, 'late', None]}, dtype=object)
+
+    result = pd.read_parquet(parquet_export(df))
+
+    assert result['Note'].tolist()[3] == 'late'
+    assert result['Note'].isna().sum() == 4
+
+def test_xlsx_writes_every_sheet(frame):
+    frames = [('Raw Data', frame), ('Raw Data', frame.head(2))]
+
+    workbook = openpyxl.load_workbook(xlsx_export(frames))
+
+    assert workbook.sheetnames == ['Raw Data', 'Raw Data_2']
+    rows = list(workbook['Raw Data'].values)
+    assert rows[0] == tuple(frame.columns)
+    assert len(rows) == len(frame) + 1
+    assert rows[3][2] is None
+    assert rows[1][4] == datetime.time(9, 15)
+
+def test_csv_quotes_across_chunks():
+    df = pd.DataFrame({'Name': ['a, b', 'say "hi"', 'two\nlines', 'Société', None], 'n': range(5)})
+
+    text = csv_export(df).getvalue().decode('utf-8')
+
+    assert text == df.to_csv(index=False)
+    pd.testing.assert_frame_equal(pd.read_csv(io.StringIO(text)), df)
+
+def test_csv_of_no_rows_has_the_header():
+    assert csv_export(pd.DataFrame({'Company': [], 'Revenue': []})).getvalue() == b'Company,Revenue\n'
+
+def test_parquet_keeps_all_null_columns():
+    pytest.importorskip('pyarrow')
+    df = pd.DataFrame({'Company': ['Tata', 'Infosys', 'Wipro'], 'Empty': [None, None, None]})
+
+    result = pd.read_parquet(parquet_export(df))
+
+    assert list(result.columns) == ['Company', 'Empty']
+    assert len(result) == 3
+    assert result['Empty'].isna().all()
+
+def test_xlsx_round_trips_through_read_excel(frame):
+    df = frame.drop(columns=['Opens', 'Sector'])
+
+    result = pd.read_excel(xlsx_export([('Data', df)]), sheet_name='Data')
+
+    pd.testing.assert_frame_equal(result, df, check_dtype=False, check_datetimelike_compat=True)
+
+def test_xlsx_sheet_titles_and_cells_are_made_legal():
+    frames = (
+        (name, df) for name, df in [
+            ('Revenue / Profit [FY24]: quarterly view', pd.DataFrame({'Note': ['ok\x07', 'fine']})),
+            ('', pd.DataFrame({2024: [1, 2]})),
+        ]
+    )
+
+    workbook = openpyxl.load_workbook(xlsx_export(frames))
+
+    assert workbook.sheetnames == ['Revenue _ Profit _FY24__ quarte', 'Sheet']
+    assert [row[0] for row in workbook.worksheets[0].values] == ['Note', 'ok', 'fine']
+    assert next(workbook['Sheet'].values) == ('2024',)
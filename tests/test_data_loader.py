@@ -0,0 +1,46 @@
+import re
+import zipfile
+
+import pandas as pd
+import pytest
+
+from data_loader import Workbook
+
+ROWS = [
+    ['Company', 'Revenue', 'Profit'],
+    ['Tata', 10, 1],
+    ['Infosys', 20, 2],
+    ['Wipro', 30, 3],
+    ['HCL', 40, 4],
+]
+
+def rewrite_dimension(path, ref):
+    """Rewrite the <dimension> every worksheet of an .xlsx stores"""
+    with zipfile.ZipFile(path) as archive:
+        members = {name: archive.read(name) for name in archive.namelist()}
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members.items():
+            if name.startswith('xl/worksheets/'):
+                data = re.sub(rb'<dimension ref="[^"]*"', b'<dimension ref="' + ref.encode() + b'"', data)
+            archive.writestr(name, data)
+
+@pytest.mark.parametrize('ref', ['A1:A1', 'A1:C2', 'A1:C500'])
+def test_metadata_ignores_the_stored_dimension(cache_dir, make_workbook, ref):
+    path = make_workbook({'S': ROWS + [[None, None, None]] * 3})
+    rewrite_dimension(path, ref)
+    expected = pd.read_excel(path, sheet_name=None, engine='openpyxl')
+
+    workbook = Workbook(path)
+
+    assert workbook.skipped == []
+    assert workbook.sheet_names == list(expected)
+    assert workbook.sheets['S']['columns'] == list(expected['S'].columns)
+    assert workbook.sheets['S']['rows'] == len(expected['S']) == 4
+    assert len(workbook.sheet('S')) == 4
+
+def test_blank_rows_inside_the_data_are_counted(cache_dir, make_workbook):
+    path = make_workbook({'S': [ROWS[0], ROWS[1], [None, None, None], ROWS[2]]})
+
+    workbook = Workbook(path)
+
+    assert workbook.sheets['S']['rows'] == len(workbook.sheet('S')) == 3
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from downsample import METHODS, downsample
+
+@pytest.fixture
+def series():
+    x = np.arange(1000)
+    y = np.sin(x / 50.0)
+    y[300] = 5.0
+    y[700] = -5.0
+    return x, y
+
+@pytest.mark.parametrize('method', METHODS.values())
+def test_keeps_endpoints_and_extremes(series, method):
+    x, y = series
+
+    picks = downsample(x, y, 100, method)
+
+    assert len(picks) <= 100
+    assert picks[0] == 0 and picks[-1] == len(y) - 1
+    assert np.all(np.diff(picks) > 0)
+    assert {300, 700} <= set(picks.tolist())
+
+@pytest.mark.parametrize('method', METHODS.values())
+def test_short_series_is_kept_whole(method):
+    assert downsample([1, 2, 3], [3.0, 1.0, 2.0], 10, method).tolist() == [0, 1, 2]
+
+@pytest.mark.parametrize('method', METHODS.values())
+def test_missing_values_are_dropped(method):
+    y = np.array([1.0, np.nan, 2.0, np.nan, 3.0])
+
+    assert downsample(np.arange(5), y, 4, method).tolist() == [0, 2, 4]
+
+def test_lttb_accepts_dates_and_text(series):
+    _, y = series
+    dates = pd.date_range('2020-01-01', periods=len(y), freq='D')
+    labels = [f"row {i}" for i in range(len(y))]
+
+    by_date = downsample(dates, y, 50)
+    by_label = downsample(labels, y, 50)
+
+    assert by_date.tolist() == by_label.tolist()
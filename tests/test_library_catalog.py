@@ -0,0 +1,50 @@
+import threading
+import time
+
+import pytest
+
+import library_catalog
+from library_catalog import LibraryCatalog, main
+
+@pytest.fixture
+def library(tmp_path, monkeypatch):
+    monkeypatch.setattr(library_catalog, 'CATALOG_PATH', tmp_path / 'catalog.sqlite3')
+    root = tmp_path / 'library'
+    (root / 'reports').mkdir(parents=True)
+    (root / 'reports' / 'q1.pdf').write_bytes(b'%PDF-1.4')
+    (root / '.hidden.pdf').write_bytes(b'%PDF-1.4')
+    (root / 'notes.txt').write_text('not a library file')
+    return root
+
+def test_scan_lists_visible_library_files(library):
+    catalog = LibraryCatalog(library)
+    catalog.scan()
+
+    assert catalog.files() == ['reports/q1.pdf']
+    assert catalog.entry('reports/q1.pdf')['size'] == 8
+
+def test_cli_prints_files_that_could_not_be_read(library, monkeypatch, capsys):
+    def unreadable(path):
+        raise PermissionError(path)
+
+    monkeypatch.setattr(library_catalog, 'describe_file', unreadable)
+
+    assert main(['--root', str(library)]) == 0
+    output = capsys.readouterr().out
+    assert '------------' in output
+    assert 'reports/q1.pdf  could not be read' in output
+
+def test_watched_catalog_still_rescans(library, monkeypatch):
+    monkeypatch.setattr(library_catalog, 'RESCAN_SECONDS', 0.05)
+    catalog = LibraryCatalog(library)
+    catalog.scan()
+    # An observer that never reports anything, as when its event queue overflowed
+    catalog._observer = object()
+    threading.Thread(target=catalog._run, daemon=True).start()
+
+    (library / 'added.pdf').write_bytes(b'%PDF-1.4')
+    deadline = time.monotonic() + 5
+    while 'added.pdf' not in catalog.files() and time.monotonic() < deadline:
+        time.sleep(0.02)
+
+    assert 'added.pdf' in catalog.files()
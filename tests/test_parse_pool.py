@@ -0,0 +1,23 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import data_loader
+from data_loader import PARSE_WORKERS, discard_parse_pool, parse_pool
+
+def test_pool_is_shared_and_not_resized(monkeypatch):
+    monkeypatch.setattr(data_loader, '_parse_pool', None)
+    pool = parse_pool()
+
+    assert parse_pool() is pool
+    assert pool._max_workers == PARSE_WORKERS
+    pool.shutdown()
+
+def test_discard_keeps_a_pool_started_since(monkeypatch):
+    broken = ProcessPoolExecutor(max_workers=1)
+    fresh = ProcessPoolExecutor(max_workers=1)
+    monkeypatch.setattr(data_loader, '_parse_pool', fresh)
+
+    discard_parse_pool(broken)
+
+    assert parse_pool() is fresh
+    discard_parse_pool(fresh)
+    assert data_loader._parse_pool is None
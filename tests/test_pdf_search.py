@@ -0,0 +1,52 @@
+import threading
+
+import pytest
+
+import pdf_library
+from pdf_library import _match_expression, refresh_search_index, stale_pdfs
+
+@pytest.fixture
+def index_path(tmp_path, monkeypatch):
+    path = tmp_path / 'search.sqlite3'
+    monkeypatch.setattr(pdf_library, 'SEARCH_INDEX_PATH', path)
+    return path
+
+def test_stale_pdfs_compares_listing_with_index(index_path):
+    db = pdf_library._connect_index()
+    with db:
+        db.execute("INSERT INTO documents VALUES ('/lib/a.pdf', 'a.pdf', 10, 1, 2)")
+        db.execute("INSERT INTO documents VALUES ('/lib/b.pdf', 'b.pdf', 10, 1, 2)")
+    db.close()
+    pdfs = [('/lib/a.pdf', 10, 1), ('/lib/b.pdf', 10, 2), ('/lib/c.pdf', 5, 1)]
+
+    assert stale_pdfs('/lib', pdfs) == [('/lib/b.pdf', 10, 2), ('/lib/c.pdf', 5, 1)]
+
+def test_refresh_runs_once_per_version(monkeypatch):
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def update(root, progress, pdfs):
+        started.set()
+        release.wait(5)
+        calls.append(pdfs)
+
+    monkeypatch.setattr(pdf_library, 'update_search_index', update)
+    monkeypatch.setattr(pdf_library, '_index_update', (None, None))
+
+    first = refresh_search_index('/lib', ['v1'], 1)
+    started.wait(5)
+    queued = refresh_search_index('/lib', ['v2'], 2)
+    latest = refresh_search_index('/lib', ['v3'], 3)
+    assert refresh_search_index('/lib', ['v3 again'], 3) is latest
+    release.set()
+    first.result(5)
+    latest.result(5)
+
+    assert queued.cancelled()
+    assert calls == [['v1'], ['v3']]
+
+def test_match_expression():
+    assert _match_expression('net interest') == '"net" "interest"*'
+    assert _match_expression('"net interest"') == '"net interest"'
+    assert _match_expression('  ') is None
@@ -0,0 +1,68 @@
+import pytest
+
+pytest.importorskip('pyarrow')
+
+import pdf_library
+import pdf_tables
+from pdf_tables import _split_row, start_table_extraction, table_frame, table_metadata
+
+@pytest.fixture
+def pdf(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_library, 'CACHE_DIR', tmp_path / 'cache')
+    monkeypatch.setattr(pdf_tables, 'PDFPLUMBER_AVAILABLE', False)
+    monkeypatch.setattr(pdf_tables, '_table_jobs', {})
+    path = tmp_path / 'report.pdf'
+    path.write_bytes(b'%PDF-1.4')
+    return str(path)
+
+def test_table_frame_parses_numeric_columns():
+    df = table_frame(
+        ['Item', 'Q1', 'Share'],
+        [['Disbursements', '1,02,314', '12%'], ['Write-offs', '(300)', '-3%'], ['Other', '-', 'NA']],
+    )
+
+    assert list(df.columns) == ['Item', 'Q1', 'Share (%)']
+    assert df['Q1'].tolist()[:2] == [102314.0, -300.0]
+    assert df['Share (%)'].tolist()[:2] == [12.0, -3.0]
+    assert df['Q1'].isna().tolist() == [False, False, True]
+
+def test_split_row_needs_two_numeric_cells():
+    assert _split_row('Net interest income 1,234 5.6%') == ('Net interest income', ['1,234', '5.6%'])
+    assert _split_row('Revenue grew 12 percent') is None
+
+def test_failed_scan_is_recorded_not_repeated(pdf, monkeypatch):
+    calls = []
+
+    def broken(filename):
+        calls.append(filename)
+        raise RuntimeError('damaged xref table')
+        yield
+
+    monkeypatch.setattr(pdf_tables, '_text_tables', broken)
+
+    metadata = start_table_extraction(pdf).result()
+    again = start_table_extraction(pdf)
+
+    assert metadata['error'] == 'damaged xref table'
+    assert metadata['sheets'] == {}
+    assert again.result() is metadata
+    assert table_metadata(pdf)['error'] == 'damaged xref table'
+    assert len(calls) == 1
+
+def test_retry_rescans_a_failed_scan(pdf, monkeypatch):
+    failures = [OSError('file is locked')]
+
+    def scan(filename):
+        if failures:
+            raise failures.pop()
+        return iter(())
+
+    monkeypatch.setattr(pdf_tables, '_text_tables', scan)
+    assert start_table_extraction(pdf).result()['error'] == 'file is locked'
+
+    metadata = start_table_extraction(pdf, retry=True).result()
+
+    assert 'error' not in metadata
+    assert table_metadata(pdf) == metadata
+    # A successful scan is not repeated, even when asked to retry
+    assert start_table_extraction(pdf, retry=True) is None
@@ -0,0 +1,110 @@
+import pytest
+
+import data_loader
+import pdf_library
+from pdf_library import cached_pages, extract_text, start_text_extraction
+
+pytest.importorskip('PyPDF2')
+
+def write_pdf(path, pages):
+    """Write a PDF whose page n shows the text 'Page n'"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [" + b" ".join(f"{4 + 2 * i} 0 R".encode() for i in range(pages))
+        + b"] /Count " + str(pages).encode() + b" >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for page in range(1, pages + 1):
+        content = f"BT /F1 12 Tf 72 720 Td (Page {page}) Tj ET".encode()
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {5 + 2 * (page - 1)} 0 R "
+            f"/Resources << /Font << /F1 3 0 R >> >> >>".encode()
+        )
+        objects.append(b"<< /Length " + str(len(content)).encode() + b" >>\nstream\n" + content + b"\nendstream")
+    data = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(data))
+        data += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(data)
+    data += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    data += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    data += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    path.write_bytes(data)
+    return str(path)
+
+@pytest.fixture
+def pdf_cache(cache_dir, monkeypatch):
+    monkeypatch.setattr(pdf_library, 'CACHE_DIR', cache_dir)
+    return cache_dir
+
+@pytest.fixture
+def extractions(monkeypatch):
+    """Record the pages each in-process extraction is asked for"""
+    calls = []
+    extract_pages = pdf_library._extract_pages
+
+    def record(path, entry, pages):
+        calls.append(list(pages))
+        return extract_pages(path, entry, pages)
+
+    monkeypatch.setattr(pdf_library, '_extract_pages', record)
+    return calls
+
+def test_cached_pages_are_not_extracted_again(pdf_cache, tmp_path, extractions):
+    path = write_pdf(tmp_path / 'report.pdf', 5)
+
+    first = dict(extract_text(path, pages=[1, 2], workers=1))
+    second = dict(extract_text(path, pages=[1, 2, 3], workers=1))
+
+    assert first == {1: 'Page 1', 2: 'Page 2'}
+    assert second == {1: 'Page 1', 2: 'Page 2', 3: 'Page 3'}
+    assert extractions == [[1, 2], [3]]
+    assert cached_pages(path) == 3
+
+def test_changed_file_misses_the_cache(pdf_cache, tmp_path, extractions):
+    path = write_pdf(tmp_path / 'report.pdf', 3)
+    list(extract_text(path, workers=1))
+
+    write_pdf(tmp_path / 'report.pdf', 4)
+
+    assert cached_pages(path) == 0
+    assert dict(extract_text(path, workers=1))[4] == 'Page 4'
+    assert extractions == [[1, 2, 3], [1, 2, 3, 4]]
+
+def test_cached_pages_stream_first_then_the_rest_in_order(pdf_cache, tmp_path):
+    path = write_pdf(tmp_path / 'report.pdf', 6)
+    list(extract_text(path, pages=[5, 2], workers=1))
+
+    streamed = [page for page, _ in extract_text(path, pages=[1, 2, 3, 4, 5, 6], workers=1)]
+
+    assert streamed == [2, 5, 1, 3, 4, 6]
+
+def test_many_missing_pages_are_extracted_in_worker_processes(pdf_cache, tmp_path, monkeypatch):
+    pages = pdf_library.PARALLEL_MIN_PAGES + 2
+    path = write_pdf(tmp_path / 'report.pdf', pages)
+    pools = []
+
+    def pool():
+        pools.append(data_loader.parse_pool())
+        return pools[-1]
+
+    monkeypatch.setattr(pdf_library, 'parse_pool', pool)
+
+    texts = dict(extract_text(path, workers=2))
+
+    assert len(pools) == 1
+    assert texts == {page: f"Page {page}" for page in range(1, pages + 1)}
+    assert cached_pages(path) == pages
+
+def test_background_extraction_runs_once_per_version(pdf_cache, tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_library, '_text_jobs', {})
+    path = write_pdf(tmp_path / 'report.pdf', 12)
+
+    job = start_text_extraction(path)
+
+    assert start_text_extraction(path) is job
+    assert job.result(30) == 12
+    assert cached_pages(path) == 12
+    monkeypatch.setattr(pdf_library, '_text_jobs', {})
+    assert start_text_extraction(path) is None
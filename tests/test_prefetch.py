@@ -0,0 +1,82 @@
+import gc
+import threading
+
+import pytest
+
+from data_loader import PrefetchOwner, Workbook, WorkbookPrefetcher, file_signature
+
+SHEETS = {
+    'First': [['Company', 'Revenue'], ['Tata', 10]],
+    'Second': [['Company', 'Revenue'], ['Infosys', 20]],
+}
+
+@pytest.fixture
+def prefetcher():
+    prefetcher = WorkbookPrefetcher()
+    yield prefetcher
+    prefetcher._executor.shutdown(wait=True)
+
+def test_take_hands_over_only_the_first_sheet(cache_dir, make_workbook, prefetcher):
+    path = make_workbook(SHEETS)
+    owner = PrefetchOwner()
+
+    prefetcher.prefetch(path, owner)
+    prefetcher._executor.submit(lambda: None).result()
+    workbook = prefetcher.take(path)
+
+    assert workbook.is_loaded('First')
+    assert not workbook.is_loaded('Second')
+    assert prefetcher.pending() == []
+
+def test_release_drops_the_prefetch(cache_dir, make_workbook, prefetcher):
+    path = make_workbook(SHEETS)
+    owner = PrefetchOwner()
+
+    prefetcher.prefetch(path, owner)
+    prefetcher.release(owner)
+
+    assert prefetcher.pending() == []
+    assert prefetcher.take(path) is None
+
+def test_collected_owner_drops_the_prefetch(cache_dir, make_workbook, prefetcher):
+    path = make_workbook(SHEETS)
+    owner = PrefetchOwner()
+    prefetcher.prefetch(path, owner)
+    assert prefetcher.pending() == [file_signature(path)]
+
+    del owner
+    gc.collect()
+
+    assert prefetcher.pending() == []
+
+def test_picking_another_file_withdraws_the_first(cache_dir, make_workbook, prefetcher):
+    first = make_workbook(SHEETS, 'first.xlsx')
+    second = make_workbook(SHEETS, 'second.xlsx')
+    owner = PrefetchOwner()
+
+    prefetcher.prefetch(first, owner)
+    prefetcher.prefetch(second, owner)
+
+    assert prefetcher.pending() == [file_signature(second)]
+
+def test_open_workbook_is_not_prefetched(cache_dir, make_workbook, prefetcher):
+    path = make_workbook(SHEETS)
+    workbook = Workbook(path)
+    prefetcher.opened(workbook)
+
+    prefetcher.prefetch(path, PrefetchOwner())
+
+    assert prefetcher.pending() == []
+
+def test_take_does_not_wait_for_a_queued_prefetch(cache_dir, make_workbook, prefetcher):
+    path = make_workbook(SHEETS)
+    busy = threading.Event()
+    prefetcher._executor.submit(busy.wait, 5)
+
+    owner = PrefetchOwner()
+    prefetcher.prefetch(path, owner)
+    assert prefetcher.pending() == [file_signature(path)]
+
+    assert prefetcher.take(path) is None
+    assert prefetcher.pending() == []
+    busy.set()
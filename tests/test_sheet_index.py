@@ -0,0 +1,54 @@
+import pandas as pd
+
+from sheet_index import SheetIndex
+
+def sheet():
+    return SheetIndex(pd.DataFrame({
+        'Company': ['Tata Steel', 'Infosys', 'HDFC Bank', 'ICICI Bank', 'Wipro'],
+        'Industry Theme': ['Metals', 'IT', 'Banking', 'Banking', 'IT'],
+        'Revenue': [10, 20, None, 40, 20],
+    }))
+
+def test_search_matches_any_column_case_insensitively():
+    assert sheet().search('BANK').tolist() == [2, 3]
+    assert sheet().search('it').tolist() == [1, 4]
+
+def test_search_matches_numbers_as_displayed():
+    assert sheet().search('40').tolist() == [3]
+
+def test_scoped_terms_match_within_their_column():
+    index = sheet()
+
+    assert index.search('company:tata').tolist() == [0]
+    assert index.search('"industry theme":it').tolist() == [1, 4]
+    assert index.search('"industry theme":it wipro').tolist() == [4]
+
+def test_unknown_column_is_free_text():
+    assert sheet().search('sector:bank').tolist() == []
+
+def test_empty_query_returns_the_row_set():
+    index = sheet()
+
+    assert index.search('') is None
+    assert index.search('  ', within=[1, 2]) == [1, 2]
+
+def test_search_within_filtered_rows():
+    index = sheet()
+    positions = index.rows({'Industry Theme': ['Banking']})
+
+    assert index.search('icici', within=positions).tolist() == [3]
+    assert index.search('infosys', within=positions).tolist() == []
+
+def test_filters_intersect_and_take_rows():
+    index = sheet()
+
+    positions = index.rows({'Industry Theme': ['IT'], 'Revenue': [20]})
+
+    assert index.take(positions)['Company'].tolist() == ['Infosys', 'Wipro']
+    assert index.rows({'Company': []}) is None
+
+def test_value_counts_within_rows():
+    column = sheet().column('Revenue')
+
+    assert column.value_counts() == ([10.0, 20.0, 40.0], {10.0: 1, 20.0: 2, 40.0: 1})
+    assert column.value_counts([0, 1, 2]) == ([10.0, 20.0], {10.0: 1, 20.0: 1})
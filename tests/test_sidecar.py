@@ -0,0 +1,49 @@
+import pandas as pd
+import pytest
+
+import data_loader
+
+pytest.importorskip('pyarrow')
+
+from data_loader import Workbook, prepare_sheet, read_sidecar_sheet, sidecar_dir, write_sidecar_sheet
+
+def test_round_trip_keeps_values_and_info(cache_dir):
+    df, info = prepare_sheet(
+        pd.DataFrame({'Company': ['Tata', 'Infosys', None], 'Revenue': [1.5, 2.25, 3.0]}), 0.5
+    )
+    entry = sidecar_dir('/library/book.xlsx', 100, 1)
+    write_sidecar_sheet(entry, 0, df, info)
+
+    cached, cached_info = read_sidecar_sheet(entry, 0)
+
+    pd.testing.assert_frame_equal(cached, df)
+    assert cached_info == info
+
+def test_int_headers_match_cold_parse(cache_dir):
+    raw = pd.DataFrame([['Tata', 10, 12], ['Infosys', 20, 22]], columns=['Company', 2021, 2022])
+    parsed, info = prepare_sheet(raw, 0.1)
+    entry = sidecar_dir('/library/book.xlsx', 100, 1)
+    write_sidecar_sheet(entry, 0, parsed, info)
+
+    cached, _ = read_sidecar_sheet(entry, 0)
+
+    assert list(parsed.columns) == ['Company', '2021', '2022']
+    assert list(cached.columns) == list(parsed.columns)
+    pd.testing.assert_frame_equal(cached, parsed)
+
+def test_missing_sheet_reads_as_none(cache_dir):
+    assert read_sidecar_sheet(sidecar_dir('/library/book.xlsx', 100, 1), 3) is None
+
+def test_changing_compaction_rebuilds_sidecar(cache_dir, make_workbook, monkeypatch):
+    path = make_workbook({'Deals': [['Sector', 'Value']] + [['Banking', n] for n in range(40)]})
+    warm = Workbook(path)
+    warm.load_all(workers=1)
+    assert isinstance(warm.sheet('Deals')['Sector'].dtype, pd.CategoricalDtype)
+
+    monkeypatch.setattr(data_loader, 'COMPACT_DTYPES', False)
+    workbook = Workbook(path)
+    df = workbook.sheet('Deals')
+
+    assert workbook.sources['Deals'] == 'streamed'
+    assert not isinstance(df['Sector'].dtype, pd.CategoricalDtype)
+    assert df['Value'].dtype == 'int64'
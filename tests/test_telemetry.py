@@ -0,0 +1,44 @@
+import pytest
+
+from telemetry import SpanRecorder, percentile
+
+VALUES = list(range(1, 11))
+
+@pytest.mark.parametrize('fraction, expected', [
+    (0.0, 1),
+    (0.1, 1),
+    (0.5, 5),
+    (0.9, 9),
+    (0.99, 10),
+    (1.0, 10),
+])
+def test_nearest_rank_percentile(fraction, expected):
+    assert percentile(VALUES, fraction) == expected
+
+def test_percentile_of_small_windows():
+    assert percentile([], 0.5) is None
+    assert percentile([7], 0.99) == 7
+    assert percentile([1, 2], 0.5) == 1
+
+def test_summary_reports_percentiles_in_ms():
+    recorder = SpanRecorder(log_path=None)
+    for ms in VALUES:
+        recorder.record('filter', ms / 1000, {'file': 'book.xlsx'})
+
+    row, = recorder.summary()
+
+    assert row['count'] == 10
+    assert row['p50_ms'] == pytest.approx(5)
+    assert row['p90_ms'] == pytest.approx(9)
+    assert row['max_ms'] == pytest.approx(10)
+
+def test_prometheus_buckets_are_cumulative():
+    recorder = SpanRecorder(log_path=None)
+    recorder.record('filter', 0.02, {'file': 'book.xlsx'})
+    recorder.record('filter', 3, {'file': 'book.xlsx'})
+
+    text = recorder.prometheus()
+
+    assert 'research_portal_stage_seconds_bucket{stage="filter",file="book.xlsx",le="0.025"} 1' in text
+    assert 'research_portal_stage_seconds_bucket{stage="filter",file="book.xlsx",le="5"} 2' in text
+    assert 'research_portal_stage_seconds_count{stage="filter",file="book.xlsx"} 2' in text
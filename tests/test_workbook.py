@@ -0,0 +1,66 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+import data_loader
+from data_loader import Workbook, parse_workbook, stream_workbook
+
+HEADER = ['Company', 2021, 2022]
+ROWS = [['Tata', 10, 12], ['Infosys', 20, 22], ['Wipro', 30, 32]]
+
+@pytest.fixture(params=['cold', 'sidecar'])
+def workbook_path(request, cache_dir, make_workbook, monkeypatch):
+    """A workbook with int headers, read either without a cache or from a warm sidecar"""
+    path = make_workbook({'Revenue': [HEADER, *ROWS]})
+    if request.param == 'cold':
+        monkeypatch.setattr(data_loader, 'PYARROW_AVAILABLE', False)
+    else:
+        pytest.importorskip('pyarrow')
+        Workbook(path).load_all(workers=1)
+    return path
+
+def test_metadata_frame_and_index_share_labels(workbook_path):
+    workbook = Workbook(workbook_path)
+    metadata_columns = workbook.sheets['Revenue']['columns']
+
+    df = workbook.sheet('Revenue')
+
+    assert metadata_columns == ['Company', '2021', '2022']
+    assert list(df.columns) == metadata_columns
+    assert workbook.index('Revenue').column('2021').value_counts()[1] == {10: 1, 20: 1, 30: 1}
+
+def test_filter_chosen_from_metadata_before_load(workbook_path):
+    workbook = Workbook(workbook_path)
+    column = workbook.sheets['Revenue']['columns'][1]
+
+    positions = workbook.index('Revenue').rows({column: [20]})
+
+    assert workbook.index('Revenue').take(positions)['Company'].tolist() == ['Infosys']
+
+def test_streamed_headers_are_unique_strings(make_workbook):
+    path = make_workbook({'Sheet': [[2021, '2021', None], [1, 2, 3]]})
+
+    df = stream_workbook(path).data['Sheet']
+
+    assert list(df.columns) == ['2021', '2021.1', 'Unnamed: 2']
+
+def test_streamed_frames_match_read_excel(make_workbook):
+    path = make_workbook({
+        'Data': [
+            ['Company', 'Revenue', 'Note', 'Filed'],
+            ['Tata', 10, 'NA', datetime(2021, 3, 31)],
+            [None, None, None, None],
+            ['Wipro', None, 'N/A', datetime(2022, 3, 31)],
+            ['Infosys', 2.5, 'ok', None],
+            [None, None, None, None],
+        ],
+        'Empty': [],
+    })
+
+    streamed = stream_workbook(path)
+    parsed = parse_workbook(path)
+
+    assert streamed.skipped == parsed.skipped == ["Sheet 'Empty' is empty"]
+    pd.testing.assert_frame_equal(streamed.data['Data'], parsed.data['Data'])
+    assert len(streamed.data['Data']) == 4